@@ -18,6 +18,8 @@ sys.path.append("..")
 
 from pygame.locals import *
 
+from shared.sequence import make_rng, shuffle_max_run
+
 
 pygame.init()
 
@@ -293,15 +295,17 @@ def saveParams():
 
 # RANDOMIZATION FUNCTIONS ---------------------------------------------------------------------------------------------
 
-def pseudorandomize(array):
-    random.shuffle(array)
+def pseudorandomize(array, max_run=2, seed=None):
+    """
+    Shuffle `array` in place so no value repeats more than `max_run` times in
+    a row, and return it. Every valid order is equally likely -- the same
+    distribution as reshuffling until the rule holds (what the old loop meant
+    to do) -- but built directly, so it never loops. Pass `seed` for a
+    reproducible order.
+    """
+    rng = make_rng(seed) if seed is not None else random
+    array[:] = shuffle_max_run(array, max_run, rng)
     new_array = array
-    i = 3
-    while i <= len(new_array) - 1:
-        if new_array[i] == new_array[i - 1] and new_array[i - 2]:
-            random.shuffle(new_array)
-            i = 3
-        i += 1
     return new_array
 
 def shuffle_array(array):
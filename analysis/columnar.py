@@ -0,0 +1,289 @@
+# analysis/columnar.py
+import os
+import csv
+import json
+import glob
+from datetime import datetime
+
+# Typed, columnar copy of the trio data as a Parquet dataset, partitioned
+# by pair, with the pair's sessions compacted into one file:
+#
+#   <PARQUET_DIR>/pair=<leader>-<follower>/trios.parquet   (sorted by session, trial)
+#
+# Stimulus labels, choices, names and sides are dictionary-encoded; numbers
+# are stored as ints/floats instead of text. Scans read only the requested
+# columns of only the pairs asked for; a session filter is applied on the
+# (sorted) session column. Sessions are 28 rows, so one file per session would
+# make opening files dominate every scan -- slower than reparsing the CSVs.
+#
+# Needs pyarrow (imported on first use, so the game can import this module
+# without it). export_csvs() converts/compacts existing CSVs (a manifest of
+# CSV size + mtime skips pairs whose CSVs are unchanged); with PARQUET_EXPORT
+# on, main.py rewrites the pair's file whenever one of its session CSVs is closed.
+PARQUET_EXPORT = False
+PARQUET_DIR = None   # None -> <project root>/trios_parquet
+PART_FILE = "trios.parquet"
+MANIFEST = "_manifest.json"
+
+_CAT   = ("stimuli_type", "leader_side", "leader", "follower",
+          "km_paired_choice", "km_leader_choice", "km_follower_choice",
+          "jbt_leader_stimuli", "jbt_follower_stimuli")
+_INT   = ("session", "block", "trial", "km_leader_choice_time", "km_follower_choice_time",
+          "jbt_leader_choice", "jbt_leader_choice_time",
+          "jbt_follower_choice", "jbt_follower_choice_time", "dropped_frames")
+_FLOAT = ("frame_p50_ms", "frame_p99_ms")
+
+
+def _pa():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.compute as pc
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+    return pa, pq, pc
+
+
+def parquet_dir():
+    return PARQUET_DIR or os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "trios_parquet"))
+
+
+def schema():
+    """Arrow schema of a pair file (the pair itself comes from the directory name)."""
+    pa, _, _ = _pa()
+    cat = pa.dictionary(pa.int32(), pa.string())
+    fields = [("date", pa.date32()), ("time", pa.time32("s"))]
+    fields += [(name, cat) for name in ("stimuli_type", "leader_side", "leader", "follower")]
+    fields += [("session", pa.int16()), ("block", pa.int8()), ("trial", pa.int16())]
+    fields += [
+        ("km_paired_choice", cat),
+        ("km_leader_choice", cat),
+        ("km_leader_choice_time", pa.int32()),
+        ("km_follower_choice", cat),
+        ("km_follower_choice_time", pa.int32()),
+        ("jbt_leader_stimuli", cat),
+        ("jbt_leader_choice", pa.int8()),
+        ("jbt_leader_choice_time", pa.int32()),
+        ("jbt_follower_stimuli", cat),
+        ("jbt_follower_choice", pa.int8()),
+        ("jbt_follower_choice_time", pa.int32()),
+        ("frame_p50_ms", pa.float32()),
+        ("frame_p99_ms", pa.float32()),
+        ("dropped_frames", pa.int32()),
+    ]
+    return pa.schema(fields)
+
+
+# ---------- CSV -> table ----------
+def _num(v, cast):
+    return cast(float(v)) if v not in ("", None) else None
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        rows = [r for r in reader if r]
+    return header or [], rows
+
+
+def _table_from_rows(header, rows):
+    """CSV header + text rows -> Arrow table with schema() ("pair" dropped)."""
+    pa, _, _ = _pa()
+    pos = {name: i for i, name in enumerate(header)}
+
+    def col(name):
+        j = pos.get(name)
+        return [r[j] if j is not None and j < len(r) else "" for r in rows]
+
+    arrays = {
+        "date": [datetime.strptime(v, "%Y-%m-%d").date() if v else None for v in col("date")],
+        "time": [datetime.strptime(v, "%H:%M:%S").time() if v else None for v in col("time")],
+    }
+    for name in _CAT:
+        arrays[name] = col(name)
+    for name in _INT:
+        arrays[name] = [_num(v, int) for v in col(name)]
+    for name in _FLOAT:
+        arrays[name] = [_num(v, float) for v in col(name)]
+    sch = schema()
+    cols = []
+    for field in sch:
+        if pa.types.is_dictionary(field.type):
+            cols.append(pa.array(arrays[field.name], type=pa.string()).dictionary_encode().cast(field.type))
+        else:
+            cols.append(pa.array(arrays[field.name], type=field.type))
+    return pa.Table.from_arrays(cols, schema=sch)
+
+
+def _pair_of(csv_path):
+    """Pair and session from KM-JBT_<pair>_S<n>.csv."""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    pair, sess = stem[len("KM-JBT_"):].rsplit("_S", 1)
+    return pair, int(sess)
+
+
+def _pair_csvs(csv_dir, pair):
+    paths = glob.glob(os.path.join(glob.escape(csv_dir), f"KM-JBT_{glob.escape(pair)}_S*.csv"))
+    return sorted(paths, key=lambda p: _pair_of(p)[1])
+
+
+def export_pair(csv_dir, pair, out_dir=None):
+    """Rewrite one pair's file from all of its session CSVs (atomic replace). Returns its path."""
+    pa, pq, _ = _pa()
+    parts = []
+    for path in _pair_csvs(csv_dir, pair):
+        header, rows = _read_csv(path)
+        if rows:
+            parts.append(_table_from_rows(header, rows))
+    if not parts:
+        return None
+    table = pa.concat_tables(parts).unify_dictionaries().combine_chunks()
+    part_dir = os.path.join(out_dir or parquet_dir(), f"pair={pair}")
+    os.makedirs(part_dir, exist_ok=True)
+    path = os.path.join(part_dir, PART_FILE)
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _signature(paths):
+    sig = []
+    for p in paths:
+        st = os.stat(p)
+        sig.append(f"{os.path.basename(p)}|{st.st_size}|{st.st_mtime_ns}")
+    return sig
+
+
+def export_csvs(csv_dir, out_dir=None, force=False):
+    """
+    Convert every pair with KM-JBT_<pair>_S<n>.csv files under `csv_dir` whose
+    CSVs changed since the last export (all of them with force=True).
+    Returns (pairs written, pairs unchanged).
+    """
+    out_dir = out_dir or parquet_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {} if force else _read_manifest(out_dir)
+    pairs = sorted({_pair_of(p)[0] for p in glob.glob(os.path.join(glob.escape(csv_dir), "KM-JBT_*_S*.csv"))})
+    done = skipped = 0
+    for pair in pairs:
+        sig = _signature(_pair_csvs(csv_dir, pair))
+        if manifest.get(pair) == sig:
+            skipped += 1
+            continue
+        if export_pair(csv_dir, pair, out_dir):
+            manifest[pair] = sig
+            done += 1
+    _write_manifest(out_dir, manifest)
+    return done, skipped
+
+
+def export_session(state):
+    """main.py hook: refresh the pair's file after one of its session CSVs was closed/exported."""
+    if not PARQUET_EXPORT:
+        return None
+    from shared.csv_logger import _csv_path_for_state
+    csv_path = _csv_path_for_state(state)
+    pair = f"{state['config']['leader']}-{state['config']['follower']}"
+    try:
+        path = export_pair(os.path.dirname(csv_path), pair)
+    except (RuntimeError, OSError, ValueError) as e:
+        print("[PARQUET] export error:", e)
+        return None
+    if path:
+        out_dir = os.path.dirname(os.path.dirname(path))
+        manifest = _read_manifest(out_dir)
+        manifest[pair] = _signature(_pair_csvs(os.path.dirname(csv_path), pair))
+        _write_manifest(out_dir, manifest)
+    return path
+
+
+# ---------- scans ----------
+def list_pairs(out_dir=None):
+    """Pairs present in the Parquet dataset."""
+    out_dir = out_dir or parquet_dir()
+    try:
+        names = os.listdir(out_dir)
+    except OSError:
+        return []
+    return sorted(n[len("pair="):] for n in names
+                  if n.startswith("pair=") and os.path.exists(os.path.join(out_dir, n, PART_FILE)))
+
+
+def scan(columns=None, pairs=None, sessions=None, out_dir=None):
+    """
+    Arrow table with only `columns` (None = all) plus "pair", optionally
+    restricted to some pairs (other files are not opened) and sessions.
+    """
+    pa, pq, pc = _pa()
+    out_dir = out_dir or parquet_dir()
+    wanted = list_pairs(out_dir) if pairs is None else sorted(set(pairs) & set(list_pairs(out_dir)))
+    read_cols = None
+    if columns is not None:
+        read_cols = [c for c in columns if c != "pair"]
+        if sessions is not None and "session" not in read_cols:
+            read_cols.append("session")
+    tables = []
+    for pair in wanted:
+        # one small file per pair: a plain single-threaded read beats dataset discovery
+        t = pq.ParquetFile(os.path.join(out_dir, f"pair={pair}", PART_FILE)).read(
+            columns=read_cols, use_threads=False)
+        if sessions is not None:
+            t = t.filter(pc.is_in(t.column("session"), value_set=pa.array(sessions, pa.int16())))
+        tables.append(t)
+    if not tables:
+        return pa.table({})
+    table = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+    counts = [t.num_rows for t in tables]
+    pair_idx = pa.array([i for i, n in enumerate(counts) for _ in range(n)], pa.int32())
+    table = table.append_column("pair", pa.DictionaryArray.from_arrays(pair_idx, pa.array(wanted)))
+    if columns is not None:
+        table = table.select(list(columns) if "pair" in columns else list(columns) + ["pair"])
+    return table
+
+
+def load_dataset(columns=None, pairs=None, sessions=None, out_dir=None):
+    """
+    scan() as an analysis.dataset.Dataset (dictionary columns become codes +
+    sorted vocabulary, nulls become -1 / nan), so analysis.metrics runs on it.
+    """
+    import numpy as np
+    import pyarrow as pa
+    from analysis.dataset import Dataset, SCHEMA
+
+    table = scan(columns, pairs, sessions, out_dir)
+    cols, cats = {}, {}
+    for name in table.column_names:
+        arr = table.column(name).combine_chunks()
+        if pa.types.is_dictionary(arr.type) or SCHEMA.get(name) == "cat":
+            if not pa.types.is_dictionary(arr.type):
+                arr = arr.cast(pa.string()).dictionary_encode()
+            vocab = np.asarray(arr.dictionary.to_pylist(), dtype=str)
+            codes = arr.indices.to_numpy(zero_copy_only=False)
+            # Dataset vocabularies are sorted (np.unique order): re-code
+            cats[name], remap = np.unique(vocab, return_inverse=True)
+            cols[name] = remap.reshape(-1).astype(np.int32)[codes]
+        elif pa.types.is_floating(arr.type):
+            cols[name] = arr.to_numpy(zero_copy_only=False).astype(np.float64)
+        else:
+            cols[name] = arr.fill_null(-1).to_numpy().astype(np.int32)
+    ds = Dataset(cols, cats, [])
+    ds.n = table.num_rows
+    return ds
@@ -0,0 +1,156 @@
+# analysis/dataset.py
+import os
+import csv
+import glob
+import time
+
+import numpy as np
+
+# All session CSVs (KM-JBT_<leader>-<follower>_S<n>.csv) in one columnar
+# dataset: one NumPy array per CSV column, parsed with fixed types, plus a
+# binary cache (<data dir>/.kmjbt_dataset.npz) that is reused for as long as
+# the set of CSVs and their sizes/mtimes is unchanged.
+CSV_GLOB   = "KM-JBT_*_S*.csv"
+CACHE_NAME = ".kmjbt_dataset.npz"
+CACHE_VERSION = 1
+
+# column -> kind: "cat" = small string vocabulary stored as int32 codes into
+# Dataset.cats[column]; "int" = int32 (blank -> -1); "float" = float64 (blank -> nan)
+SCHEMA = {
+    "date": "cat", "time": "cat", "stimuli_type": "cat", "pair": "cat", "leader_side": "cat",
+    "leader": "cat", "follower": "cat",
+    "session": "int", "block": "int", "trial": "int",
+    "km_paired_choice": "cat", "km_leader_choice": "cat", "km_leader_choice_time": "int",
+    "km_follower_choice": "cat", "km_follower_choice_time": "int",
+    "jbt_leader_stimuli": "cat", "jbt_leader_choice": "int", "jbt_leader_choice_time": "int",
+    "jbt_follower_stimuli": "cat", "jbt_follower_choice": "int", "jbt_follower_choice_time": "int",
+    "frame_p50_ms": "float", "frame_p99_ms": "float", "dropped_frames": "int",
+}
+
+
+def default_data_dir():
+    """Where the game writes its CSVs (the project root)."""
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class Dataset:
+    """
+    Columnar view of every trio row.
+
+    cols[name]  -> ndarray (n,) per SCHEMA column, plus "file" (int32 index into files)
+    cats[name]  -> ndarray of labels for a "cat" column; cols[name] holds codes into it
+    files       -> CSV file names, in load order
+    """
+    def __init__(self, cols, cats, files):
+        self.cols = cols
+        self.cats = cats
+        self.files = files
+        self.n = len(cols["session"]) if "session" in cols else 0
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+    def code(self, name, label):
+        """Code of `label` in categorical column `name` (-1 if it never occurs)."""
+        hit = np.flatnonzero(self.cats[name] == label)
+        return int(hit[0]) if hit.size else -1
+
+    def labels(self, name):
+        """Decoded labels of a categorical column (n,)."""
+        return self.cats[name][self.cols[name]]
+
+
+# ---------- parsing ----------
+def _parse_files(paths):
+    raw = {name: [] for name in SCHEMA}
+    file_idx = []
+    for i, path in enumerate(paths):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                continue
+            pos = {name: header.index(name) for name in SCHEMA if name in header}
+            rows = [r for r in reader if r]
+        for name, values in raw.items():
+            j = pos.get(name)
+            if j is None:
+                values.extend([""] * len(rows))
+            else:
+                values.extend(r[j] if j < len(r) else "" for r in rows)
+        file_idx.extend([i] * len(rows))
+
+    cols, cats = {}, {}
+    for name, kind in SCHEMA.items():
+        arr = np.asarray(raw[name], dtype=str) if raw[name] else np.zeros(0, dtype="U1")
+        if kind == "cat":
+            cats[name], codes = np.unique(arr, return_inverse=True)
+            cols[name] = codes.astype(np.int32).reshape(-1)
+        else:
+            blank = arr == ""
+            filled = np.where(blank, "0", arr)
+            if kind == "int":
+                vals = filled.astype(np.float64).astype(np.int32)
+                vals[blank] = -1
+            else:
+                vals = filled.astype(np.float64)
+                vals[blank] = np.nan
+            cols[name] = vals
+    cols["file"] = np.asarray(file_idx, dtype=np.int32)
+    return cols, cats
+
+
+# ---------- cache ----------
+def _signature(paths):
+    sig = []
+    for p in paths:
+        st = os.stat(p)
+        sig.append(f"{os.path.basename(p)}|{st.st_size}|{st.st_mtime_ns}")
+    return np.asarray(sig, dtype=str)
+
+
+def _read_cache(cache_path, sig):
+    try:
+        with np.load(cache_path, allow_pickle=False) as z:
+            if int(z["_version"]) != CACHE_VERSION or not np.array_equal(z["_signature"], sig):
+                return None
+            cols = {k[2:]: z[k] for k in z.files if k.startswith("c:")}
+            cats = {k[2:]: z[k] for k in z.files if k.startswith("v:")}
+    except (OSError, ValueError, KeyError):
+        return None
+    return cols, cats
+
+
+def _write_cache(cache_path, sig, cols, cats):
+    arrays = {"_version": np.asarray(CACHE_VERSION), "_signature": sig}
+    arrays.update({"c:" + k: v for k, v in cols.items()})
+    arrays.update({"v:" + k: v for k, v in cats.items()})
+    tmp = cache_path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"[ANALYSIS] could not write cache: {e}")
+
+
+def load_dataset(data_dir=None, use_cache=True, verbose=False):
+    """Load every session CSV under `data_dir` (default: the game's CSV folder)."""
+    t0 = time.perf_counter()
+    data_dir = data_dir or default_data_dir()
+    paths = sorted(glob.glob(os.path.join(data_dir, CSV_GLOB)))
+    sig = _signature(paths)
+    cache_path = os.path.join(data_dir, CACHE_NAME)
+
+    loaded = _read_cache(cache_path, sig) if use_cache else None
+    source = "cache"
+    if loaded is None:
+        source = "csv"
+        loaded = _parse_files(paths)
+        if use_cache and paths:
+            _write_cache(cache_path, sig, *loaded)
+    ds = Dataset(loaded[0], loaded[1], [os.path.basename(p) for p in paths])
+    if verbose:
+        print(f"[ANALYSIS] {ds.n} trios from {len(paths)} CSVs ({source}) "
+              f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return ds
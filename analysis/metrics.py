@@ -0,0 +1,216 @@
+# analysis/metrics.py
+import numpy as np
+
+# Vectorised summaries over a Dataset (analysis/dataset.py). Every function
+# takes `by`, a tuple of grouping columns ("pair", "leader", "follower",
+# "stimuli_type", "session", "block", ...), and returns
+#   (groups, values)
+# where groups is a dict column -> (G,) array of the group keys (decoded labels
+# for categorical columns) and values is an array with G rows. No Python loop
+# runs over rows or groups.
+
+KM_JOINT = ("KK", "KM", "MK", "MM")
+# PROFILES labels from the most to the least rewarded-looking stimulus
+JBT_LABELS = ("S+", "NP", "INT", "NN", "S-")
+PROBE_LABELS = ("NP", "INT", "NN")
+RT_QUANTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+# bias_index needs go(S+) - go(S-) of at least this much; a near-zero span
+# would turn sampling noise into huge or infinite indices
+BIAS_MIN_SPAN = 0.10
+
+
+# ---------- grouping ----------
+def _group(keys):
+    """keys: list of (n,) int arrays -> (unique key rows (G, k), inverse (n,))."""
+    if not keys:
+        raise ValueError("group by at least one column")
+    # mixed-radix packing into one int64 key, so np.unique runs on a flat array
+    keys = [np.asarray(k, dtype=np.int64) for k in keys]
+    lows = [int(k.min()) if k.size else 0 for k in keys]
+    sizes = [int(k.max()) - lo + 1 if k.size else 1 for k, lo in zip(keys, lows)]
+    packed = np.zeros(len(keys[0]), dtype=np.int64)
+    for k, lo, size in zip(keys, lows, sizes):
+        packed = packed * size + (k - lo)
+    uniq_packed, inv = np.unique(packed, return_inverse=True)
+    uniq = np.empty((len(uniq_packed), len(keys)), dtype=np.int64)
+    rest = uniq_packed
+    for j in range(len(keys) - 1, -1, -1):
+        rest, uniq[:, j] = np.divmod(rest, sizes[j])
+        uniq[:, j] += lows[j]
+    return uniq, inv.reshape(-1)
+
+
+def _key_columns(ds, by, rows=None, extra=None):
+    """Group key arrays for `by` (optionally restricted to `rows`); `extra` adds precomputed keys."""
+    keys = []
+    for name in by:
+        if extra is not None and name in extra:
+            keys.append(extra[name])
+        else:
+            col = ds.cols[name]
+            keys.append(col if rows is None else col[rows])
+    return keys
+
+
+def _decode(ds, by, uniq, extra_cats=None):
+    groups = {}
+    for j, name in enumerate(by):
+        codes = uniq[:, j]
+        cats = (extra_cats or {}).get(name, ds.cats.get(name))
+        groups[name] = cats[codes] if cats is not None else codes
+    return groups
+
+
+# ---------- KM ----------
+def km_joint_matrix(ds, by=("pair",)):
+    """
+    Joint KM choice counts per group: values (G, 4) in KM_JOINT order
+    (leader choice first). Rows with a missing/unknown choice are skipped.
+    """
+    k_lead = ds.code("km_leader_choice", "K")
+    m_lead = ds.code("km_leader_choice", "M")
+    k_foll = ds.code("km_follower_choice", "K")
+    m_foll = ds.code("km_follower_choice", "M")
+    lead = ds.cols["km_leader_choice"]
+    foll = ds.cols["km_follower_choice"]
+    ok = ((lead == k_lead) | (lead == m_lead)) & ((foll == k_foll) | (foll == m_foll))
+    joint = 2 * (lead[ok] == m_lead) + (foll[ok] == m_foll)
+
+    uniq, inv = _group(_key_columns(ds, by, ok))
+    counts = np.bincount(inv * 4 + joint, minlength=len(uniq) * 4).reshape(len(uniq), 4)
+    return _decode(ds, by, uniq), counts
+
+
+def km_joint_rates(ds, by=("pair",)):
+    """km_joint_matrix normalised to proportions per group."""
+    groups, counts = km_joint_matrix(ds, by)
+    total = counts.sum(axis=1, keepdims=True)
+    return groups, np.divide(counts, total, out=np.full(counts.shape, np.nan), where=total > 0)
+
+
+# ---------- JBT ----------
+def _jbt_trials(ds):
+    """
+    Leader and follower JBT trials stacked into one table:
+    (rows (2n,) into ds, subject codes, label index into JBT_LABELS, go 0/1, rt ms).
+    Subjects are coded over the union of leader and follower names.
+    """
+    n = ds.n
+    rows = np.concatenate([np.arange(n), np.arange(n)])
+    # code subjects over the (small) union of leader and follower names
+    subj_names = np.union1d(ds.cats["leader"], ds.cats["follower"])
+    subj = np.concatenate([np.searchsorted(subj_names, ds.cats["leader"])[ds.cols["leader"]],
+                           np.searchsorted(subj_names, ds.cats["follower"])[ds.cols["follower"]]])
+    lookup = np.asarray(JBT_LABELS)
+    label_idx = []
+    for col in ("jbt_leader_stimuli", "jbt_follower_stimuli"):
+        cats = ds.cats[col]
+        # category -> position in JBT_LABELS (-1 for anything else)
+        pos = np.array([int(np.flatnonzero(lookup == c)[0]) if c in JBT_LABELS else -1 for c in cats],
+                       dtype=np.int64)
+        label_idx.append(pos[ds.cols[col]] if cats.size else np.zeros(n, dtype=np.int64))
+    label = np.concatenate(label_idx)
+    go = np.concatenate([ds.cols["jbt_leader_choice"], ds.cols["jbt_follower_choice"]])
+    rt = np.concatenate([ds.cols["jbt_leader_choice_time"], ds.cols["jbt_follower_choice_time"]])
+    role = np.concatenate([np.zeros(n, dtype=np.int64), np.ones(n, dtype=np.int64)])
+    return rows, subj_names, subj.astype(np.int64), label, go, rt, role
+
+
+def jbt_go_rates(ds, by=("subject",)):
+    """
+    Go rate per group and stimulus label: values (G, len(JBT_LABELS)),
+    nan where a label was never shown. `by` may use "subject" (the animal
+    doing the JBT trial) and "role" (0 = leader, 1 = follower) besides the
+    dataset columns.
+    """
+    rows, subj_names, subj, label, go, _, role = _jbt_trials(ds)
+    ok = (label >= 0) & (go >= 0)
+    extra = {"subject": subj[ok], "role": role[ok]}
+    uniq, inv = _group(_key_columns(ds, by, rows[ok], extra))
+    L = len(JBT_LABELS)
+    idx = inv * L + label[ok]
+    shown = np.bincount(idx, minlength=len(uniq) * L).reshape(len(uniq), L)
+    gone = np.bincount(idx, weights=go[ok], minlength=len(uniq) * L).reshape(len(uniq), L)
+    rates = np.divide(gone, shown, out=np.full(shown.shape, np.nan), where=shown > 0)
+    return _decode(ds, by, uniq, {"subject": subj_names, "role": np.array(["leader", "follower"])}), rates
+
+
+def bias_index(go_rates, min_span=BIAS_MIN_SPAN):
+    """
+    Judgement-bias index per probe (values (G, len(PROBE_LABELS))):
+        (go(probe) - go(S-)) / (go(S+) - go(S-))
+    0 = treated like S-, 1 = like S+. nan where the group does not
+    discriminate: go(S+) - go(S-) below `min_span` (including S- gone to
+    more often than S+), or either rate missing. Never inf.
+    """
+    col = {lbl: i for i, lbl in enumerate(JBT_LABELS)}
+    pos = go_rates[:, [col["S+"]]]
+    neg = go_rates[:, [col["S-"]]]
+    probes = go_rates[:, [col[lbl] for lbl in PROBE_LABELS]]
+    span = pos - neg
+    ok = np.isfinite(span) & (span >= max(float(min_span), 1e-12))
+    return np.divide(probes - neg, span, out=np.full(probes.shape, np.nan),
+                     where=np.broadcast_to(ok, probes.shape))
+
+
+# ---------- RT ----------
+def _group_quantiles(inv, values, n_groups, qs):
+    """Linear-interpolated quantiles of `values` per group -> (G, len(qs)), nan for empty groups."""
+    order = np.lexsort((values, inv))
+    v = values[order].astype(np.float64)
+    counts = np.bincount(inv, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    qs = np.asarray(qs, dtype=np.float64)
+    pos = (counts[:, None] - 1) * qs[None, :]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(counts[:, None] - 1, 0))
+    frac = pos - lo
+    base = starts[:, None]
+    empty = counts == 0
+    safe = np.where(empty[:, None], 0, base + lo), np.where(empty[:, None], 0, base + hi)
+    out = v[safe[0]] * (1 - frac) + v[safe[1]] * frac if v.size else np.zeros(pos.shape)
+    out[empty] = np.nan
+    return out, counts
+
+
+def rt_distribution(ds, measure="km_leader", by=("pair", "session", "block"), qs=RT_QUANTILES,
+                    bins=None):
+    """
+    RT distribution per group for one measure:
+      "km_leader" / "km_follower"  KM choice times (ms)
+      "jbt_go"                     JBT RTs of go responses only (ms)
+    Returns (groups, {"n", "mean", "quantiles" (G, len(qs)), "hist" (G, len(bins)-1) if bins}).
+    """
+    if measure in ("km_leader", "km_follower"):
+        rt = ds.cols[f"{measure}_choice_time"]
+        ok = rt >= 0
+        keys = _key_columns(ds, by, ok)
+        rt = rt[ok]
+        extra_cats = None
+    elif measure == "jbt_go":
+        rows, subj_names, subj, label, go, rt, role = _jbt_trials(ds)
+        ok = (go == 1) & (rt >= 0)
+        keys = _key_columns(ds, by, rows[ok], {"subject": subj[ok], "role": role[ok],
+                                               "label": label[ok]})
+        rt = rt[ok]
+        extra_cats = {"subject": subj_names, "role": np.array(["leader", "follower"]),
+                      "label": np.asarray(JBT_LABELS)}
+    else:
+        raise ValueError(f"unknown RT measure {measure!r}")
+
+    uniq, inv = _group(keys)
+    G = len(uniq)
+    quant, counts = _group_quantiles(inv, rt, G, qs)
+    sums = np.bincount(inv, weights=rt, minlength=G)
+    stats = {
+        "n": counts,
+        "mean": np.divide(sums, counts, out=np.full(G, np.nan), where=counts > 0),
+        "quantiles": quant,
+    }
+    if bins is not None:
+        bins = np.asarray(bins)
+        b = np.clip(np.searchsorted(bins, rt, side="right") - 1, 0, len(bins) - 2)
+        inside = (rt >= bins[0]) & (rt <= bins[-1])
+        nb = len(bins) - 1
+        stats["hist"] = np.bincount(inv[inside] * nb + b[inside], minlength=G * nb).reshape(G, nb)
+    return _decode(ds, by, uniq, extra_cats), stats
@@ -0,0 +1,100 @@
+# analyze.py
+"""
+Full-dataset report over every KM-JBT_<pair>_S<n>.csv (needs NumPy).
+
+Loads all session CSVs into columns once (reusing the binary cache when
+nothing changed) and prints KM joint-choice matrices, JBT go rates and
+judgement-bias indices, and RT quantiles.
+
+    python analyze.py                     # CSVs in the project root
+    python analyze.py --dir out/ --by pair,session
+    python analyze.py --export-parquet    # convert/compact CSVs -> trios_parquet/
+    python analyze.py --parquet           # report from the Parquet dataset instead
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from analysis.dataset import load_dataset, default_data_dir
+from analysis import metrics, columnar
+
+
+def _fmt(v):
+    if isinstance(v, (float, np.floating)):
+        return "   -" if np.isnan(v) else f"{v:5.2f}"
+    return str(v)
+
+
+def _print_table(title, groups, header, rows):
+    keys = list(groups)
+    print(f"\n== {title} ==")
+    print("  ".join(keys + list(header)))
+    for i in range(len(rows)):
+        print("  ".join([str(groups[k][i]) for k in keys] + [_fmt(v) for v in rows[i]]))
+
+
+def report(ds, by=("pair",)):
+    """Every summary for the dataset grouped by `by` -> dict of (groups, values)."""
+    jbt_by = tuple("subject" if b in ("leader", "follower") else b for b in by)
+    km_groups, km_counts = metrics.km_joint_matrix(ds, by)
+    go_groups, go = metrics.jbt_go_rates(ds, ("subject",) + tuple(b for b in jbt_by if b != "subject"))
+    return {
+        "km_joint": (km_groups, km_counts),
+        "jbt_go": (go_groups, go),
+        "bias": (go_groups, metrics.bias_index(go)),
+        "rt_km_leader": metrics.rt_distribution(ds, "km_leader", by),
+        "rt_km_follower": metrics.rt_distribution(ds, "km_follower", by),
+        "rt_jbt_go": metrics.rt_distribution(ds, "jbt_go", ("subject",)),
+    }
+
+
+def _parse_args(argv):
+    ap = argparse.ArgumentParser(description="KM-JBT multi-session analysis")
+    ap.add_argument("--dir", default=None, help="folder with the session CSVs (default: project root)")
+    ap.add_argument("--by", default="pair", help="comma-separated grouping columns (pair,session,block,...)")
+    ap.add_argument("--no-cache", action="store_true", help="re-parse the CSVs, ignore the binary cache")
+    ap.add_argument("--export-parquet", action="store_true",
+                    help="convert new/changed CSVs into the partitioned Parquet dataset, then exit")
+    ap.add_argument("--parquet", nargs="?", const="", default=None, metavar="DIR",
+                    help="read the Parquet dataset (default: trios_parquet/) instead of the CSVs")
+    ap.add_argument("-q", "--quiet", action="store_true", help="timings only")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    by = tuple(b.strip() for b in args.by.split(",") if b.strip())
+    t0 = time.perf_counter()
+    if args.export_parquet:
+        done, skipped = columnar.export_csvs(args.dir or default_data_dir(), args.parquet or None,
+                                             force=args.no_cache)
+        print(f"[PARQUET] {done} pairs written, {skipped} unchanged "
+              f"in {(time.perf_counter() - t0) * 1000:.0f} ms -> {args.parquet or columnar.parquet_dir()}")
+        sys.exit(0)
+    if args.parquet is not None:
+        ds = columnar.load_dataset(out_dir=args.parquet or None)
+        print(f"[ANALYSIS] {ds.n} trios from Parquet in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    else:
+        ds = load_dataset(args.dir, use_cache=not args.no_cache, verbose=True)
+    if not ds.n:
+        print("[ANALYSIS] no session CSVs found")
+        sys.exit(1)
+    t1 = time.perf_counter()
+    out = report(ds, by)
+    t2 = time.perf_counter()
+
+    if not args.quiet:
+        _print_table("KM joint choices", out["km_joint"][0], metrics.KM_JOINT, out["km_joint"][1])
+        _print_table("JBT go rate", out["jbt_go"][0], metrics.JBT_LABELS, out["jbt_go"][1])
+        _print_table(f"Judgement bias (0 = like S-, 1 = like S+; - = S+/S- go rates "
+                     f"less than {metrics.BIAS_MIN_SPAN:.2f} apart)", out["bias"][0],
+                     metrics.PROBE_LABELS, out["bias"][1])
+        q_names = [f"p{int(q * 100)}" for q in metrics.RT_QUANTILES]
+        for key in ("rt_km_leader", "rt_km_follower", "rt_jbt_go"):
+            groups, stats = out[key]
+            rows = np.column_stack([stats["n"], stats["mean"], stats["quantiles"]])
+            _print_table(f"RT ms ({key[3:]})", groups, ["n", "mean"] + q_names,
+                         [[int(r[0])] + [f"{v:.0f}" for v in r[1:]] for r in rows])
+    print(f"\n[ANALYSIS] load {(t1 - t0) * 1000:.0f} ms, report {(t2 - t1) * 1000:.0f} ms")
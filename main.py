@@ -1,24 +1,32 @@
 # main.py
 import sys
+import time
+_T_PROCESS = time.perf_counter()   # startup budget is measured from here
+
 import pygame
 from datetime import datetime
-from shared.csv_logger import append_trio_row, reconcile_csv_with_state
+from shared.csv_logger import (
+    append_trio_row, build_trio_row, reconcile_csv_with_state, close_trial_writer,
+    read_session_rows, CSV_HEADER,
+)
+from shared import store as db_store
+from shared.schedule import ensure_schedule
+from shared.pellets import shutdown as shutdown_pellets
+from shared.frame_probe import FrameProbe
+from shared import trajectory, replay, input_sampler, live_stats
+from shared.startup import StartupTimer, Preloader
+from shared.sounds import get_bank
+from shared.devices import handle_event as handle_device_event
+from analysis import columnar
 
 
 from scenes.launch import LaunchScene
 from shared.persistence import (
-    load_all_states,
     save_state,
+    compact_state,
     archive_or_delete_if_complete,
 )
-from scenes.km_game import run as run_km
-from scenes.jbt_game import run as run_jbt
-
-
-pygame.init()
-screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-pygame.display.set_caption("KM + JBT")
-clock = pygame.time.Clock()
+# the game scenes are imported lazily (run_trio / Preloader), not at startup
 
 
 def _advance_progress_after_trio(state):
@@ -71,22 +79,18 @@ def _roll_to_next_session_if_complete(state):
         state["status"] = "complete"
 
 
-def main():
-    load_all_states()
-
-    # Tolerant to both return shapes: (outcome, state) OR just state
-    scene = LaunchScene(screen, clock)
-    _out = scene.run()
-    if isinstance(_out, tuple) and len(_out) == 2:
-        outcome, state = _out
-    else:
-        outcome, state = ("launch", _out)  # assume old API
-    if outcome == "quit" or state is None:
-        pygame.quit(); sys.exit(0)
-
+def reconcile_progress(state):
+    """
+    Reconcile JSON progress with the CSV on disk before running trios.
+    Returns False if there is nothing left to run for this pair.
+    """
     # Reconcile JSON progress with what’s already in the CSV for this pair/session.
     prog = state["progress"]
-    csv_done = reconcile_csv_with_state(state)
+    if db_store.get_store() is not None:
+        # database mode: progress and trio rows are committed together, nothing to reconcile
+        csv_done = int(prog.get("completed_trios", 0))
+    else:
+        csv_done = reconcile_csv_with_state(state)
     mem_done = int(prog.get("completed_trios", 0))
 
     if csv_done != mem_done:
@@ -100,7 +104,17 @@ def main():
         prog["trio_index"]  = min(next_trio, 7)
         prog["block_index"] = min(next_block, 4)
         prog["stage"]       = "KM"
-    
+
+    # live counters only disagree with the trio rows after a crash (or for a
+    # state from before they existed): recount this session once from its rows
+    if live_stats.LIVE_STATS and live_stats.session_trios(state) != prog["completed_trios"]:
+        if db_store.get_store() is not None:
+            header, rows = CSV_HEADER, db_store.get_store().session_rows(
+                state["uid"], prog.get("session_index", 1))
+        else:
+            header, rows = read_session_rows(state)
+        live_stats.rebuild_session(state, rows[:prog["completed_trios"]], header)
+
     # After reconciliation:
     if prog["completed_trios"] >= 28:
         prog["trio_index"] = 7
@@ -108,60 +122,165 @@ def main():
         state["status"] = "complete"
         # Immediately roll or finish so you don't try to run another trio:
         _roll_to_next_session_if_complete(state)
-        save_state(state)
+        compact_state(state)   # new session starts from a fresh snapshot
         if state.get("status") == "complete":
             archive_or_delete_if_complete(state, delete=True)
-            pygame.quit(); sys.exit(0)
-
-
-    running = True
-    while running:
-        # Also allow closing via window X
-        for ev in pygame.event.get():
-            if ev.type == pygame.QUIT:
-                running = False
-        pygame.event.clear()
-
-        # 1) KM — capture when KM starts for CSV date/time columns
-        km_start_dt = datetime.now()
-        km_out = run_km(screen, clock, state)
-        if km_out is None:
-            break
-
-        # 2) JBT (leader)
-        jbt_lead = run_jbt(screen, clock, state, player="leader")
-        if jbt_lead is None:
-            break
-
-        # 3) JBT (follower)
-        jbt_follow = run_jbt(screen, clock, state, player="follower")
-        if jbt_follow is None:
-            break
-
-        # 3.5) Log one CSV row for this completed trio
+            return False
+
+    # whole-session trial schedule (compiled once per session, looked up by the scenes)
+    ensure_schedule(state)
+    return True
+
+
+def run_trio(screen, clock, state):
+    """
+    KM + JBT leader + JBT follower. Returns
+    (km_start_dt, km_out, jbt_lead, jbt_follow, frame_stats) or None if aborted.
+    """
+    from scenes.km_game import run as run_km
+    from scenes.jbt_game import run as run_jbt
+
+    # one frame-timing probe per trio (shared by all three scenes)
+    probe = FrameProbe()
+    # cursor trajectories for the trio (None unless TRAJECTORY_RECORDING)
+    traj = trajectory.begin_trio()
+
+    # 1) KM — capture when KM starts for CSV date/time columns
+    km_start_dt = datetime.now()
+    km_out = run_km(screen, clock, state, probe=probe, traj=traj)
+    if km_out is None:
+        return None
+
+    # 2) JBT (leader)
+    jbt_lead = run_jbt(screen, clock, state, player="leader", probe=probe, traj=traj)
+    if jbt_lead is None:
+        return None
+
+    # 3) JBT (follower)
+    jbt_follow = run_jbt(screen, clock, state, player="follower", probe=probe, traj=traj)
+    if jbt_follow is None:
+        return None
+
+    return km_start_dt, km_out, jbt_lead, jbt_follow, probe.summary()
+
+
+def record_trio(state, trio):
+    """CSV row + progress advance + save for one completed trio. Returns False once the pair is finished."""
+    km_start_dt, km_out, jbt_lead, jbt_follow, frame_stats = trio
+    store = db_store.get_store()
+    trajectory.flush_trio(state)   # keyed by (session, trial) like the row below
+    if replay.RECORDER is not None:
+        replay.note_trio(km_start_dt, build_trio_row(state, km_start_dt, km_out, jbt_lead,
+                                                     jbt_follow, frame_stats))
+
+    if store is not None:
+        # database mode: the trio row and the advanced progress go in ONE commit
+        row = build_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow, frame_stats)
+        # counted before progress advances; lands in the same commit as the row
+        live_stats.update(state, km_out, jbt_lead, jbt_follow)
+        _advance_progress_after_trio(state)
+        store.record_trio(state, row)
+    else:
+        # Log one CSV row for this completed trio
         try:
-            csv_path = append_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow)
+            csv_path = append_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow,
+                                       frame_stats=frame_stats)
+            # count the trio only once its row is on disk, so the counters never
+            # run ahead of the CSV that reconcile_progress checks them against
+            live_stats.update(state, km_out, jbt_lead, jbt_follow)
             # Optional debug:
             # print(f"[CSV] wrote: {csv_path}")
         except Exception as e:
             # Don't crash the session on CSV errors; surface to console for now
             print("CSV log error:", e)
 
-        # 4) Advance/save
+        # Advance/save
         _advance_progress_after_trio(state)
         save_state(state)
 
-        # If a full session (28 trios) is done, roll or finish
+    # If a full session (28 trios) is done, roll or finish
+    if state.get("status") == "complete":
+        # the finished session's CSV is closed + indexed; the next row opens the new one
+        close_trial_writer()
+        if store is not None:
+            store.export_csv(state)   # classic per-session CSV, exported from the database
+        columnar.export_session(state)   # opt-in typed Parquet copy (PARQUET_EXPORT)
+        _roll_to_next_session_if_complete(state)
+        if state.get("status") != "complete":
+            ensure_schedule(state)   # compile the new session's trials up front
+        compact_state(state)   # new session starts from a fresh snapshot
+
         if state.get("status") == "complete":
-            _roll_to_next_session_if_complete(state)
-            save_state(state)
+            archive_or_delete_if_complete(state, delete=True)
+            return False
+    return True
+
+
+def main():
+    timer = StartupTimer(_T_PROCESS)
+    timer.mark("imports")
+    # only what the launcher needs; audio + joysticks come up on first use
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    pygame.display.set_caption("KM + JBT")
+    clock = pygame.time.Clock()
+    timer.mark("display")
+
+    if db_store.SQLITE_STORE:
+        db_store.enable()
+
+    # scenes, sounds and stimulus surfaces load while the form is filled in
+    preloader = Preloader(screen)
+    def _launcher_shown():
+        timer.report("launcher ready")
+        preloader.start()
 
-            if state.get("status") == "complete":
-                archive_or_delete_if_complete(state, delete=True)
+    # Tolerant to both return shapes: (outcome, state) OR just state
+    scene = LaunchScene(screen, clock, on_first_frame=_launcher_shown, on_frame=preloader.step)
+    timer.mark("launcher built")
+    _out = scene.run()
+    preloader.wait()   # finish what idle frames did not (also on quit: join the worker)
+    if isinstance(_out, tuple) and len(_out) == 2:
+        outcome, state = _out
+    else:
+        outcome, state = ("launch", _out)  # assume old API
+    if outcome == "quit" or state is None:
+        pygame.quit(); sys.exit(0)
+
+    if not reconcile_progress(state):
+        pygame.quit(); sys.exit(0)
+    # opt-in input recording (replay.py reproduces the run headless)
+    replay.start_recording(state, screen.get_size(), input_sampler.SAMPLER_THREADED)
+
+    running = True
+    while running:
+        # Also allow closing via window X
+        for ev in pygame.event.get():
+            handle_device_event(ev)   # keep hotplug state current between trios
+            if ev.type == pygame.QUIT:
                 running = False
+        pygame.event.clear()
+
+        trio = run_trio(screen, clock, state)
+        if trio is None:
+            break
+        if not record_trio(state, trio):
+            running = False
 
         clock.tick(60)
 
+    replay.stop_recording()
+    # flush, index and close the session CSV (rows are fsynced per trio already)
+    close_trial_writer()
+    if db_store.get_store() is not None:
+        db_store.get_store().export_csv(state)   # partial session, so the CSV is current
+        db_store.disable()
+    columnar.export_session(state)
+    if get_bank().sounds:
+        get_bank().report()   # load source/time per sound + worst play() latency
+    # let any queued pellets finish before tearing down
+    shutdown_pellets()
     pygame.quit()
     sys.exit(0)
 
@@ -0,0 +1,77 @@
+# replay.py
+"""
+Replay an input recording (shared/replay.py) headless and check it.
+
+Feeds the recorded clock reads, events, key and joystick values back through
+the same seams into main.run_trio (run_km / run_jbt), rebuilds every trio's
+CSV row and compares it with the row written during the recorded run. Nothing
+is saved. The timing line doubles as a benchmark of the trial loops.
+
+    python replay.py recordings/<uid>_<stamp>.kmrec
+"""
+import sys
+import time
+import argparse
+from datetime import datetime
+
+from shared import headless
+
+
+def replay(path, verbose=False):
+    """Replay one recording. Returns (trios replayed, trios whose row matched)."""
+    from shared.replay import load_recording, Replayer, row_matches
+    header, arrays = load_recording(path)
+    screen, clock, _ = headless.setup(size=tuple(header["size"]))
+
+    # scenes + bookkeeping are imported after setup so they see the dummy display
+    import main
+    from shared.csv_logger import build_trio_row
+
+    player = Replayer(header, arrays)
+    player.install()
+    state = header["state"]
+
+    replayed = matched = 0
+    t0 = time.perf_counter()
+    for i, (km_iso, row) in enumerate(header["trios"], 1):
+        trio = main.run_trio(screen, clock, state)
+        if trio is None:
+            print(f"[REPLAY] trio {i} aborted (recording diverged)")
+            break
+        replayed += 1
+        _, km_out, jbt_lead, jbt_follow, frame_stats = trio
+        new_row = build_trio_row(state, datetime.fromisoformat(km_iso), km_out, jbt_lead,
+                                 jbt_follow, frame_stats)
+        if row_matches(row, new_row):
+            matched += 1
+        else:
+            print(f"[REPLAY] trio {i}: row differs\n  recorded: {row}\n  replayed: {new_row}")
+        if verbose:
+            print(f"[REPLAY] trio {i}: {new_row[10:21]}")
+
+        # same progress bookkeeping as main.record_trio, without writing anything
+        main._advance_progress_after_trio(state)
+        if state.get("status") == "complete":
+            main._roll_to_next_session_if_complete(state)
+            if state.get("status") != "complete":
+                main.ensure_schedule(state)
+    wall = time.perf_counter() - t0
+
+    span = (player.tape[-1] - player.tape[0]) if len(player.tape) > 1 else 0.0
+    print(f"[REPLAY] {matched}/{replayed} rows match ({len(header['trios'])} recorded); "
+          f"{span:.1f} s recorded in {wall:.2f} s wall ({span / max(wall, 1e-9):.0f}x)"
+          + ("; clock tape ran out" if player.diverged else ""))
+    return replayed, matched
+
+
+def _parse_args(argv):
+    ap = argparse.ArgumentParser(description="Headless replay of a KM + JBT input recording")
+    ap.add_argument("recording", help=".kmrec file written with INPUT_RECORDING (or simulate.py --record)")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print each replayed trio")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    n, ok = replay(args.recording, verbose=args.verbose)
+    sys.exit(0 if n and ok == n else 1)
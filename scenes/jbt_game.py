@@ -1,35 +1,25 @@
 # scenes/jbt_game.py
-import os
-import time
 import random
 import pygame
 from pygame.locals import *
 
-# ---------- optional joystick init ----------
-pygame.joystick.init()
-for i in range(pygame.joystick.get_count()):
-    try:
-        js = pygame.joystick.Joystick(i)
-        js.init()
-    except Exception:
-        pass
+from shared.pellets import dispense
+from shared.phases import PhaseMachine
+from shared.atlas import get_atlas
+from shared.render import SplitScreenRenderer
+from shared.input_sampler import InputSampler, Cursor
+from shared.frame_probe import FrameProbe
+from shared import inputs, devices, live_stats
+from shared.schedule import jbt_label
 
 # ---------- hardware pellet (JBT-style exe call) ----------
-pelletPath = ['c:/pellet1.exe', 'c:/pellet2.exe']  # 0 = left, 1 = right
-
 def pellet(side: int, num: int = 1):
     """
-    Dispense [num] pellets via pellet#.exe (mirrors the working JBT code pattern).
+    Queue [num] pellets on the background dispenser (returns immediately).
     side = 0 for Left; side = 1 for Right.
-    Waits 500ms between pellets.
+    The dispenser keeps the 500ms spacing between pellets on its own thread.
     """
-    for _ in range(num):
-        exe = pelletPath[side]
-        if os.path.isfile(exe):
-            os.system(exe)
-        else:
-            print(f"[PELLET] Missing {exe} — would dispense for side={side}")
-        pygame.time.delay(500)
+    return dispense(side, num)
 
 
 # --- tuning knobs ---
@@ -42,6 +32,8 @@ STIM_SCALE   = 0.75        # smaller stimulus
 CURSOR_SPEED_PER_W = 0.005 # cursor speed factor
 JOYSTICK_DEADZONE  = 0.20  # horizontal axis deadzone
 
+MAX_STIM_SEC = 5.0         # stimulus visible up to 5s
+
 # ---------- profiles (easy to extend) ----------
 PROFILES = {
     "Dark S+": {
@@ -60,10 +52,33 @@ PROFILES = {
     },
 }
 
+def _swatch_painter(label):
+    """Atlas painter for one stimulus label; `profile` is the PROFILES key."""
+    def paint(surface, rect, profile):
+        colors = PROFILES.get(profile, PROFILES["Dark S+"])
+        surface.fill(colors.get(label, colors["S+"]))
+    return paint
+
+# each PROFILES swatch is rendered once per size into the shared atlas
+_SWATCH_LABELS = sorted({lbl for colors in PROFILES.values() for lbl in colors} | {"S+", "S-", "NP", "NN", "INT"})
+for _lbl in _SWATCH_LABELS:
+    get_atlas().register(_lbl, _swatch_painter(_lbl))
+
+def preload_steps(screen):
+    """Main-thread preload as small steps: every profile's swatches for this display."""
+    atlas = get_atlas()
+    atlas.sync_mode(screen)
+    size = _stim_size(screen.get_height())
+    return [lambda lbl=lbl, p=p: atlas.get(lbl, size, p) for p in PROFILES for lbl in _SWATCH_LABELS]
+
 # ---------- helpers ----------
 def _clamp(v, lo, hi):
     return max(lo, min(hi, v))
 
+def _stim_size(screen_h):
+    scale = screen_h / 600.0
+    return int(STIM_BASE[0] * scale * STIM_SCALE), int(STIM_BASE[1] * scale * STIM_SCALE)
+
 def _half_rects(screen_w, screen_h, mid_thickness=12):
     mid_x = screen_w // 2
     left  = pygame.Rect(0, 0, mid_x, screen_h)
@@ -71,23 +86,21 @@ def _half_rects(screen_w, screen_h, mid_thickness=12):
     mid   = pygame.Rect(mid_x - mid_thickness // 2, 0, mid_thickness, screen_h)
     return left, right, mid
 
-def _move_horizontal(keys, joystick, left_key, right_key, speed):
+def _move_horizontal(keys, joy_side, left_key, right_key, speed=1.0):
+    """Horizontal unit direction from keys/joystick scaled by `speed` (float)."""
     dx = 0
     if keys[left_key]:
         dx -= 1
     if keys[right_key]:
         dx += 1
-    if joystick and joystick.get_init():
-        try:
-            ax_x = joystick.get_axis(0)
-        except Exception:
-            ax_x = 0.0
+    if joy_side is not None:
+        ax_x = inputs.frame_axis(joy_side, 0)   # this frame's input snapshot
         if abs(ax_x) > JOYSTICK_DEADZONE:
             dx += ax_x
     if dx:
         mag = max(1e-6, abs(dx))
         dx = dx / mag
-    return int(dx * speed)
+    return dx * speed
 
 def _is_splus(label):
     return (label or "").upper() == "S+"
@@ -98,52 +111,74 @@ def _is_sminus(label):
 def _is_ambiguous(label):
     return (label or "").upper() in ("NP", "NN", "INT")
 
-# ---- per-SIDE, block-balanced stimulus decks (left/right halves) ----
-_BLOCK_TEMPLATE = ["S+","S+","S-","S-","NP","NN","INT"]
-
-def _init_jbt_side_decks(state):
+def _outcome(stim_label, collided, trial_dur_sec):
     """
-    Ensures state['progress']['jbt_decks_sides'] exists with keys 'left' and 'right',
-    each holding a list that functions as a per-side deck.
+    Outcome logic: returns (pellets, iti_sec) for one JBT trial.
+    trial_dur_sec is the time from stimulus onset to touch (capped at 5 s).
     """
-    p = state.setdefault("progress", {})
-    decks = p.setdefault("jbt_decks_sides", {})
-    decks.setdefault("left", [])
-    decks.setdefault("right", [])
-    return decks
+    label_up = (stim_label or "").upper()
+    is_splus  = _is_splus(label_up)
+    is_sminus = _is_sminus(label_up)
 
-def _refill_and_shuffle(deck):
-    deck[:] = list(_BLOCK_TEMPLATE)
-    random.shuffle(deck)
+    # Defaults: 2 s ITI, no pellets
+    pellets = 0
+    iti_sec = 2.0
 
-def _next_label_for_side(state, side_key):
-    """
-    side_key: 'left' or 'right'
-    Returns next label from that side's 7-trial block (refilling when empty).
-    """
-    decks = _init_jbt_side_decks(state)
-    deck = decks[side_key]
-    if not deck:
-        _refill_and_shuffle(deck)
-    return deck.pop().upper()
+    if is_splus:
+        if collided:
+            # Correct Go (S+ selected): 80% VRR
+            # 80% chance -> 2 pellets
+            # 20% chance -> 0 pellets
+            if random.random() < 0.8:
+                pellets = 2
+            else:
+                pellets = 0
+            iti_sec = 2.0
+        else:
+            # Incorrect Go (S+ ignored): no pellets, 2 s ITI
+            pellets = 0
+            iti_sec = 2.0
+
+    elif is_sminus:
+        if collided:
+            # Incorrect No-Go (S– selected):
+            # ITI = 7 s – time to complete trial (from stim onset to touch),
+            # clamped at 0 so total trial time ≈ 7 s.
+            pellets = 0
+            iti_sec = max(0.0, 7.0 - trial_dur_sec)
+        else:
+            # Correct No-Go (S– ignored):
+            # They sit out the full 5 s stim, then get a 2 s ITI (total 7 s).
+            pellets = 0
+            iti_sec = 2.0
+
+    else:
+        # Ambiguous (NP / NN / INT):
+        # Ambiguous selected/ignored: no buzzer, no reward, 2 s ITI
+        pellets = 0
+        iti_sec = 2.0
+
+    return pellets, iti_sec
 
 # =============== JBT Scene ===============
-def run(screen, clock, state, player, stimulus_label=None):
+def run(screen, clock, state, player, stimulus_label=None, probe=None, traj=None):
     """
     Run one JBT trial for `player` ('leader' | 'follower').
 
     Stimulus selection (PER SIDE):
       - If `stimulus_label` is provided, it could be used to override (not used here).
-      - Otherwise, the active side pulls from its own 7-trial block:
-        2 S+, 2 S-, 1 NP, 1 NN, 1 INT (random order).
-        Sides ('left' and 'right') are tracked independently across the session.
+      - Otherwise, the label is looked up in the session schedule: each side has
+        its own 7-trial blocks of 2 S+, 2 S-, 1 NP, 1 NN, 1 INT (random order),
+        compiled for all 28 trios when the session starts (shared/schedule.py).
 
-    Visuals/flow:
+    Visuals/flow (one non-blocking frame loop: start -> stim -> ITI):
       - Screen split like KM. Only the ACTIVE half has blue background; the other is white.
       - START bar: solid BLUE (0,0,255), thick BLACK border, square corners, 150x75@800x600 scaling.
       - Cursor spawns mid-right of active half; movement is HORIZONTAL ONLY.
       - Touch START -> it disappears; stimulus appears middle-far-right (square corners).
       - Stimulus visible up to 5s.
+      - ITI is a deadline inside the same loop (events keep pumping); its length
+        is exact on the monotonic clock and overlaps pellet delivery.
 
     Contingencies (no sounds at all):
 
@@ -161,7 +196,14 @@ def run(screen, clock, state, player, stimulus_label=None):
       For Ambiguous (NP, NN, INT):
         - Selected or ignored: 0 pellets, 2 s ITI.
 
-    Returns a dict or None on abort.
+    Returns a dict (player, stimulus, collided, rt_ms, pellets, iti_ms, phases)
+    or None on abort.
+
+    probe: optional FrameProbe (main passes one per trio); frames are
+    recorded under "jbt_<player>:<phase>".
+
+    traj: optional TrajectoryRecorder (main passes one per trio when
+    recording is on); cursor samples are labelled with the same phase tags.
     """
     W, H = screen.get_size()
     scale = H / 600.0  # keeps “classic 800x600” proportions
@@ -193,18 +235,17 @@ def run(screen, clock, state, player, stimulus_label=None):
     )
     side_key = "left" if active_half == left_rect else "right"
 
-    # joysticks
-    js_left  = pygame.joystick.Joystick(0) if pygame.joystick.get_count() > 0 else None
-    js_right = pygame.joystick.Joystick(1) if pygame.joystick.get_count() > 1 else None
+    # joystick for the active half (0 -> left, 1 -> right), from the shared device manager
+    devices.init_joysticks()
     use_wasd = (active_half == left_rect)
-    js = js_left if use_wasd else js_right
+    joy_side = 0 if use_wasd else 1
     key_left, key_right = (K_a, K_d) if use_wasd else (K_LEFT, K_RIGHT)
 
     # cursor
     CURSOR_COLOR = (255,0,0)
     R = max(8, int(min(W, H) * 0.02))
     speed = max(3, int(W * CURSOR_SPEED_PER_W))
-    cursor_pos = [active_half.x + int(active_half.width * 0.75), active_half.centery]
+
 
     # START bar — square corners, thick black border
     start_w = int(START_BASE[0] * scale * START_SCALE)
@@ -214,182 +255,165 @@ def run(screen, clock, state, player, stimulus_label=None):
     start_border_w = max(6, int(6 * scale))
 
     # STIM — square corners
-    stim_w = int(STIM_BASE[0] * scale * STIM_SCALE)
-    stim_h = int(STIM_BASE[1] * scale * STIM_SCALE)
+    stim_w, stim_h = _stim_size(H)
     stim_rect = pygame.Rect(0, 0, stim_w, stim_h)
     stim_rect.center = (active_half.x + int(active_half.width * 0.80), active_half.centery)
 
-    # profile color
+    # cursor integrated off the render loop, so rt_ms is the exact crossing time
+    # (from the per-frame input snapshot taken after the event pump)
+    def read_input():
+        return _move_horizontal(inputs.frame_keys(), joy_side, key_left, key_right), 0.0
+    sampler = InputSampler()
+    cursor = sampler.add(Cursor(
+        read_input,
+        speed * 60,   # legacy px/frame at 60 fps -> px/s
+        (active_half.left + R, active_half.centery, active_half.right - R - 1, active_half.centery),
+        (active_half.x + int(active_half.width * 0.75), active_half.centery),
+        horizontal=True,
+        side=side_key,
+    ))
+    cursor.set_targets([("start", start_rect)])
+
+    # profile color (swatches come pre-rendered from the atlas)
     profile_name = state["config"].get("stimuli", "Dark S+")
-    profile = PROFILES.get(profile_name, PROFILES["Dark S+"])
+    if profile_name not in PROFILES:
+        profile_name = "Dark S+"
+    atlas = get_atlas()
+    atlas.sync_mode(screen)
+    atlas.warm(_SWATCH_LABELS, stim_rect.size, profile_name)
 
-    # choose label: ALWAYS use per-side deck
-    stim_label = _next_label_for_side(state, side_key)
+    # label for this side and trio from the session schedule
+    stim_label = jbt_label(state, side_key)
 
-    stim_color = profile.get(stim_label, profile["S+"])
+    stim_design = stim_label if stim_label in _SWATCH_LABELS else "S+"
 
     # which dispenser corresponds to THIS player (leader/follower controls own dispenser)
     dispense_side = leader_disp if player == "leader" else follower_disp
 
     # -------- draw helpers --------
-    def draw_base_only_active():
+    def draw_base_only_active(surface):
         """Other half stays white; only ACTIVE half is blue; show divider + borders."""
-        screen.fill(WHITE)
-        pygame.draw.rect(screen, BLUE_BG, active_half)
-        pygame.draw.rect(screen, BLACK, mid_rect)
-        pygame.draw.rect(screen, BLACK, left_rect, 2)
-        pygame.draw.rect(screen, BLACK, right_rect, 2)
-
-    def draw_start_phase():
-        draw_base_only_active()
-        pygame.draw.rect(screen, START_FILL, start_rect)             # fill
-        pygame.draw.rect(screen, BLACK, start_rect, start_border_w)  # thick black border
-        pygame.draw.circle(screen, CURSOR_COLOR, cursor_pos, R)
-        pygame.display.flip()
-
-    def draw_stim_phase():
-        draw_base_only_active()
-        pygame.draw.rect(screen, stim_color, stim_rect)
-        pygame.draw.circle(screen, CURSOR_COLOR, cursor_pos, R)
-        pygame.display.flip()
-
-    def clear_active_half():
-        draw_base_only_active()
-        pygame.display.flip()
-
-    # ----------------- Phase 1: Start (horizontal-only) -----------------
-    start_touched = False
-    while not start_touched:
-        for ev in pygame.event.get():
-            if ev.type == QUIT:
-                return None
-            if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q):
-                return None
-
-        keys = pygame.key.get_pressed()
-        dx = _move_horizontal(keys, js, key_left, key_right, speed)
-        cursor_pos[0] = _clamp(
-            cursor_pos[0] + dx,
-            active_half.left + R,
-            active_half.right - R - 1
-        )
-
-        draw_start_phase()
-
-        if start_rect.collidepoint(cursor_pos):
-            start_touched = True
-
-        clock.tick(60)
-
-    # after start: go to stim
-    stim_onset = time.perf_counter()
-
-    # ----------------- Phase 2: Stimulus (max 5s) -----------------
-    max_stim_sec = 5.0
+        surface.fill(WHITE)
+        pygame.draw.rect(surface, BLUE_BG, active_half)
+        pygame.draw.rect(surface, BLACK, mid_rect)
+        pygame.draw.rect(surface, BLACK, left_rect, 2)
+        pygame.draw.rect(surface, BLACK, right_rect, 2)
+
+    def draw_phase_static(surface):
+        """Start bar / stimulus for the current phase (baked into the scene layer)."""
+        if phase.name == "start":
+            pygame.draw.rect(surface, START_FILL, start_rect)             # fill
+            pygame.draw.rect(surface, BLACK, start_rect, start_border_w)  # thick black border
+        elif phase.name == "stim":
+            atlas.blit(surface, stim_design, stim_rect, profile_name)
+
+    # static background painted once; only the cursor is redrawn per frame
+    renderer = SplitScreenRenderer(screen, draw_base_only_active)
 
     # fields for CSV logging
-    selected = False
     collided = False           # did they ever touch the stimulus?
     rt_ms = 0                  # ms from stimulus onset to touch (or 5000 if no touch)
-    trial_dur_sec = max_stim_sec  # total “trial time” we’ll use for S- ITI logic
-
-    while not selected:
-        for ev in pygame.event.get():
-            if ev.type == QUIT:
-                return None
-            if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q):
-                return None
-
-        keys = pygame.key.get_pressed()
-        dx = _move_horizontal(keys, js, key_left, key_right, speed)
-        cursor_pos[0] = _clamp(
-            cursor_pos[0] + dx,
-            active_half.left + R,
-            active_half.right - R - 1
-        )
-
-        draw_stim_phase()
-
-        now = time.perf_counter()
-        elapsed = now - stim_onset
-
-        # selection
-        if stim_rect.collidepoint(cursor_pos):
-            selected = True
-            collided = True
-            rt_ms = int(elapsed * 1000)
-            trial_dur_sec = min(max_stim_sec, elapsed)
-
-            # Immediately hide BOTH stimulus and cursor
-            clear_active_half()
-            break
-
-        # timeout (no selection within 5s)
-        if elapsed >= max_stim_sec:
-            selected = True
-            collided = False
-            rt_ms = int(max_stim_sec * 1000)
-            trial_dur_sec = max_stim_sec
-
-            clear_active_half()
-            break
-
-        clock.tick(60)
-
-    # ----------------- Outcome logic: pellets + ITI -----------------
-    label_up = (stim_label or "").upper()
-    is_splus  = _is_splus(label_up)
-    is_sminus = _is_sminus(label_up)
-    is_ambig  = _is_ambiguous(label_up)
-
-    # Defaults: 2 s ITI, no pellets
     pellets = 0
-    iti_sec = 2.0
+    iti_sec = 0.0
 
-    if is_splus:
-        if collided:
-            # Correct Go (S+ selected): 80% VRR
-            # 80% chance -> 2 pellets
-            # 20% chance -> 0 pellets
-            if random.random() < 0.8:
-                pellets = 2
-            else:
-                pellets = 0
-            iti_sec = 2.0
-        else:
-            # Incorrect Go (S+ ignored): no pellets, 2 s ITI
-            pellets = 0
-            iti_sec = 2.0
-
-    elif is_sminus:
-        if collided:
-            # Incorrect No-Go (S– selected):
-            # ITI = 7 s – time to complete trial (from stim onset to touch),
-            # clamped at 0 so total trial time ≈ 7 s.
-            pellets = 0
-            iti_sec = max(0.0, 7.0 - trial_dur_sec)
-        else:
-            # Correct No-Go (S– ignored):
-            # They sit out the full 5 s stim, then get a 2 s ITI (total 7 s).
-            pellets = 0
-            iti_sec = 2.0
+    # ----------------- one frame loop: start -> stim -> iti -----------------
+    # The outcome (pellets + ITI length) is decided the moment the stimulus
+    # window ends; the ITI is a deadline on the same monotonic clock, so it is
+    # exact and runs alongside pellet delivery instead of after it.
+    phase = PhaseMachine()
+    phase.enter("start")
+    drawn_phase = None
 
-    else:
-        # Ambiguous (NP / NN / INT):
-        # Ambiguous selected/ignored: no buzzer, no reward, 2 s ITI
-        pellets = 0
-        iti_sec = 2.0
+    # frame timing (shared across the trio when main passes one in)
+    if probe is None:
+        probe = FrameProbe()
+    tag = f"jbt_{player}"
 
-    # Dispense pellets, if any (no sounds)
-    if pellets > 0:
-        pellet(side=dispense_side, num=pellets)
+    if traj is not None:
+        traj.attach(sampler, phase, tag)
 
-    # ITI
-    pygame.time.delay(int(iti_sec * 1000))
+    sampler.start()
+    try:
+        while True:
+            probe.frame_start()
+            for ev in inputs.events():
+                if ev.type == QUIT:
+                    return None
+                if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q):
+                    return None
+                if ev.type == KEYDOWN and ev.key == K_F1:
+                    live_stats.toggle_overlay()   # experimenter panel
+                atlas.handle_event(ev)
+                renderer.handle_event(ev)
+
+            inputs.snapshot()   # keys/axes for this frame's samples
+            sampler.sync()
+
+            # ---- update ----
+            if phase.name == "start":
+                if cursor.hit:
+                    # after start: go to stim (max 5s)
+                    cursor.set_targets([("stim", stim_rect)])
+                    phase.enter("stim", duration=MAX_STIM_SEC)
+
+            elif phase.name == "stim":
+                hit = cursor.hit
+                if hit:
+                    elapsed = max(0.0, hit[1] / 1e9 - phase.t_enter)
+                else:
+                    elapsed = phase.elapsed
+                touched = hit is not None and elapsed < MAX_STIM_SEC
+
+                if touched or elapsed >= MAX_STIM_SEC:
+                    cursor.freeze()
+                    if touched:
+                        # selection
+                        collided = True
+                        rt_ms = int(elapsed * 1000)
+                        trial_dur_sec = min(MAX_STIM_SEC, elapsed)
+                    else:
+                        # timeout (no selection within 5s)
+                        collided = False
+                        rt_ms = int(MAX_STIM_SEC * 1000)
+                        trial_dur_sec = MAX_STIM_SEC
+
+                    pellets, iti_sec = _outcome(stim_label, collided, trial_dur_sec)
+
+                    # Dispense pellets, if any (no sounds) — queued, so the ITI runs alongside delivery
+                    if pellets > 0:
+                        pellet(side=dispense_side, num=pellets)
+
+                    # Immediately hide BOTH stimulus and cursor for the ITI
+                    phase.enter("iti", duration=iti_sec)
+
+            if phase.name == "iti" and phase.expired():
+                phase.finish()
+                break
+
+            # ---- draw ----
+            if phase.name != drawn_phase:
+                renderer.set_scene(draw_phase_static)
+                drawn_phase = phase.name
+            renderer.begin()
+            if phase.name in ("start", "stim"):
+                renderer.circle(CURSOR_COLOR, cursor.xy(), R)
+            if live_stats.overlay_visible():
+                renderer.blit(live_stats.overlay_surface(state, H), (0, 0))
+            probe.mark_draw()
+            renderer.present()
+            probe.mark_flip()
+
+            clock.tick(60)
+            probe.frame_end(f"{tag}:{drawn_phase}")
+    finally:
+        sampler.stop()
 
     return {
         "player": player,
         "stimulus": stim_label,
         "collided": collided,   # bool
         "rt_ms": rt_ms,         # int milliseconds to stimulus (not start button)
+        "pellets": pellets,
+        "iti_ms": int(round(iti_sec * 1000)),
+        "phases": phase.timeline_ms(),
     }
@@ -1,37 +1,25 @@
 # scenes/km_game.py
-import os
-import time
-import random
 import pygame
 import math
 from pygame.locals import *
 
-# ---------- optional joystick init ----------
-pygame.joystick.init()
-for i in range(pygame.joystick.get_count()):
-    try:
-        js = pygame.joystick.Joystick(i)
-        js.init()
-    except Exception:
-        pass
+from shared.pellets import dispense
+from shared.phases import PhaseMachine
+from shared.atlas import get_atlas
+from shared.render import SplitScreenRenderer
+from shared.input_sampler import InputSampler, Cursor
+from shared.frame_probe import FrameProbe
+from shared import inputs, devices, live_stats, sounds
+from shared.schedule import km_layout
 
 # ---------- hardware pellet (JBT-style) ----------
-pelletPath = ['c:/pellet1.exe', 'c:/pellet2.exe']  # 0 = left, 1 = right
-
 def pellet(side: int, num: int = 1):
     """
-    Dispense [num] pellets via pellet#.exe (mirrors JBT code).
+    Queue [num] pellets on the background dispenser (returns immediately).
     side = 0 for Left; side = 1 for Right.
-    Waits 500ms between pellets.
+    The dispenser keeps the 500ms spacing between pellets on its own thread.
     """
-    for _ in range(num):
-        exe = pelletPath[side]
-        if os.path.isfile(exe):
-            os.system(exe)
-        else:
-            # dev-friendly fallback, same spirit as JBT
-            print(f"Pellet for side={side} (missing: {exe})")
-        pygame.time.delay(500)
+    return dispense(side, num)
 
 
 # --- tuning knobs (match jbt_game.py where relevant) ---
@@ -44,31 +32,34 @@ START_SCALE  = 0.70        # smaller start bar (1.0 = original)
 START_FILL   = (0, 0, 255) # solid blue
 START_BORDER = 6           # base border scale (multiplied by H/600 later)
 
-# ---------- sounds (cached) ----------
-_SOUNDS = None
+# phase timing (seconds)
+CHOICE_TIMEOUT_SEC = 30.0  # leader/follower each get 30s to choose, else abort
+CHOICE_ITI_SEC     = 0.5   # pause between a choice and the partner's payout
+PAYOUT_CADENCE_SEC = 1.0   # one pellet per second during payout
+PAYOUT_FLASH_SEC   = 0.25  # overlay flash at the start of each pellet second
+FEEDBACK_SEC       = 2.0   # both choices shown after all pellets
+
+# ---------- sounds (pre-decoded PCM bank, see shared/sounds.py) ----------
+_SOUND_FILES = {
+    "start":  "start_chime.wav",
+    "select": "select.mp3",
+    "pellet": "pellet_ding.mp3",
+}
+
 def _load_sounds():
     """
-    Loads and caches the start/select/pellet sounds from assets/.
-    Safe to call repeatedly.
+    The start/select/pellet sounds from the shared PCM bank (decoded once,
+    cached on disk). Safe to call repeatedly.
     """
-    global _SOUNDS
-    if _SOUNDS is not None:
-        return _SOUNDS
-    pygame.mixer.init()
-    base = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets")
-    start_chime = pygame.mixer.Sound(os.path.join(base, "start_chime.wav"))
-    select_snd  = pygame.mixer.Sound(os.path.join(base, "select.mp3"))
-    pellet_snd  = pygame.mixer.Sound(os.path.join(base, "pellet_ding.mp3"))
-    _SOUNDS = {
-        "start": start_chime,
-        "select": select_snd,
-        "pellet": pellet_snd,
-    }
-    return _SOUNDS
+    return sounds.load_bank(_SOUND_FILES)
 
 # ---------- helpers ----------
 def _clamp(v, lo, hi): return max(lo, min(hi, v))
 
+def _box_size(screen_w):
+    side = max(90, int(screen_w*0.10))
+    return side, side
+
 def _half_rects(screen_w, screen_h, mid_thickness=12):
     mid_x = screen_w // 2
     left  = pygame.Rect(0, 0, mid_x, screen_h)
@@ -76,23 +67,40 @@ def _half_rects(screen_w, screen_h, mid_thickness=12):
     mid   = pygame.Rect(mid_x - mid_thickness // 2, 0, mid_thickness, screen_h)
     return left, right, mid
 
-def _move_from_input(keys, joystick, up, down, left, right, speed):
+def _move_from_input(keys, joy_side, up, down, left, right, speed=1.0):
+    """Unit direction from keys/joystick scaled by `speed` (floats; speed=1 -> direction only)."""
     dx = dy = 0
     if keys[up]: dy -= 1
     if keys[down]: dy += 1
     if keys[left]: dx -= 1
     if keys[right]: dx += 1
-    if joystick and joystick.get_init():
-        try:
-            ax_x = joystick.get_axis(0); ax_y = joystick.get_axis(1)
-        except Exception:
-            ax_x = ax_y = 0.0
+    if joy_side is not None:
+        # axis values from this frame's input snapshot (event-driven, no polling)
+        ax_x = inputs.frame_axis(joy_side, 0); ax_y = inputs.frame_axis(joy_side, 1)
         if abs(ax_x) > JOYSTICK_DEADZONE: dx += ax_x
         if abs(ax_y) > JOYSTICK_DEADZONE: dy += ax_y
     if dx or dy:
         mag = max(1e-6, (dx*dx + dy*dy) ** 0.5)
         dx /= mag; dy /= mag
-    return int(dx * speed), int(dy * speed)
+    return dx * speed, dy * speed
+
+LEFT_KEYS  = (K_w, K_s, K_a, K_d)
+RIGHT_KEYS = (K_UP, K_DOWN, K_LEFT, K_RIGHT)
+
+def _make_cursor(half, joy_side, keyset, speed, R, pos, side):
+    """
+    Cursor for one half, integrated by the input sampler thread from the
+    per-frame input snapshot (inputs.snapshot() in the frame loop).
+    `speed` is the legacy pixels-per-frame at 60 fps; the sampler works in px/s.
+    """
+    def read():
+        return _move_from_input(inputs.frame_keys(), joy_side, *keyset)
+    bounds = (half.left+R, half.top+R, half.right-R-1, half.bottom-R-1)
+    return Cursor(read, speed * 60, bounds, pos, side=side)
+
+def _hit_elapsed(hit, t_phase):
+    """Seconds from phase start to the sampled crossing time of `hit` = (name, t_ns)."""
+    return max(0.0, hit[1] / 1e9 - t_phase)
 
 def _choice_to_pellets(choice): return 4 if choice == "K" else 1
 
@@ -153,51 +161,67 @@ def _draw_M_box(surface, rect):
     pygame.draw.circle(surface, YELLOW_CIRCLE, (cx, cy), r)
 
 
+def _paint_K(surface, rect, profile=None):
+    _draw_K_box(surface, rect)
+
+def _paint_M(surface, rect, profile=None):
+    _draw_M_box(surface, rect)
+
+def _paint_flash(surface, rect, profile=None):
+    surface.fill((255, 255, 255, 200))   # payout blink overlay
+
+# K/M boxes are rendered once per size into the shared atlas and blitted per frame
+get_atlas().register("K", _paint_K)
+get_atlas().register("M", _paint_M)
+get_atlas().register("flash", _paint_flash)
+
+
+def prefetch(fmt):
+    """Off-thread part of the preload: read the sounds' cached PCM (file I/O only)."""
+    sounds.prefetch_bank(_SOUND_FILES, fmt)
+
+
+def preload_steps(screen):
+    """
+    Main-thread preload as small steps (startup.Preloader runs a few per idle
+    launcher frame): build the sounds and render the K/M boxes for this display.
+    """
+    atlas = get_atlas()
+    atlas.sync_mode(screen)
+    size = _box_size(screen.get_width())
+    steps = [lambda d=d: atlas.get(d, size) for d in ("K", "M", "flash")]
+    steps += [lambda n=n, f=f: sounds.load_bank({n: f}) for n, f in _SOUND_FILES.items()]
+    return steps
+
+
 # ---- START bar draw (JBT style) ----
 def _draw_start_bar(surface, rect, border_px):
     BLACK = (0, 0, 0)
     pygame.draw.rect(surface, START_FILL, rect)                    # fill
     pygame.draw.rect(surface, BLACK, rect, border_px)              # thick black border (square corners)
 
-# ---- Pseudorandomization of K/M left-right per half ----
-def _pick_km_layout(history_list):
-    """
-    history_list: list of previous assignments for this half, each 'K_left' or 'M_left'
-    Rule: do not allow the same assignment more than 2 times consecutively.
-    Returns: 'K_left' or 'M_left', and updates history_list in-place.
-    """
-    # candidates
-    candidates = ["K_left", "M_left"]
-    # block >2 in a row
-    if len(history_list) >= 2 and history_list[-1] == history_list[-2]:
-        blocked = history_list[-1]
-        candidates = [c for c in candidates if c != blocked]
-
-    choice = random.choice(candidates)
-    history_list.append(choice)
-    # cap history length
-    if len(history_list) > 12:
-        del history_list[:len(history_list) - 12]
-    return choice
-
-
-def _ensure_km_histories(state, left_key, right_key):
-    p = state.setdefault("progress", {})
-    if left_key not in p:
-        p[left_key] = []
-    if right_key not in p:
-        p[right_key] = []
-
 # =============== KM Scene ===============
-def run(screen, clock, state):
+def run(screen, clock, state, probe=None, traj=None):
     """
-    KM trial scene. Returns dict with:
+    KM trial scene, run as a phase state machine inside ONE frame loop
+    (start -> leader choice -> follower payout -> follower choice ->
+    leader payout -> feedback). Nothing blocks: ITIs and pellet cadence are
+    deadlines, so events keep pumping and ESC/QUIT work in every phase.
+
+    Returns dict with:
       leader_side: "L"/"R"
       leader_choice: "K"/"M"
       follower_choice: "K"/"M"
       leader_choice_time: float seconds
       follower_choice_time: float seconds
+      phases: [{phase, start_ms, dur_ms}] timeline of the trial
     or None if aborted (e.g., timeout or ESC).
+
+    probe: optional FrameProbe (main passes one per trio); frames are
+    recorded under "km:<phase>".
+
+    traj: optional TrajectoryRecorder (main passes one per trio when
+    recording is on); cursor samples are labelled with the same phase tags.
     """
     W, H = screen.get_size()
     scale = H / 600.0
@@ -210,7 +234,7 @@ def run(screen, clock, state):
     FONT = pygame.font.SysFont("Calibri", max(18, int(H*0.025)))
     BIG  = pygame.font.SysFont("Calibri", max(28, int(H*0.06)), bold=True)
 
-    sounds = _load_sounds()
+    bank = _load_sounds()
 
     # leader side per UI state (stored in launch)
     left_name  = state["config"].get("left_name", state["config"]["leader"])
@@ -222,8 +246,6 @@ def run(screen, clock, state):
 
     # cursors
     R = max(8, int(min(W, H) * 0.02))
-    left_pos  = [left_rect.centerx,  H//2]
-    right_pos = [right_rect.centerx, H//2]
     lower_y = int(H*0.70)
 
     # START bar (JBT style)
@@ -233,7 +255,7 @@ def run(screen, clock, state):
     start_border_w = max(6, int(START_BORDER * scale))
 
     # K/M boxes
-    box_w = max(90, int(W*0.10)); box_h = max(90, int(W*0.10))
+    box_w, box_h = _box_size(W)
     def choice_rects(for_left_half: bool):
         if for_left_half:
             cxL = left_rect.x + left_rect.width//4
@@ -251,11 +273,9 @@ def run(screen, clock, state):
     lead_Lspot, lead_Rspot = choice_rects(leader_is_left)
     foll_Lspot, foll_Rspot = choice_rects(not leader_is_left)
 
-    # pseudorandomize K/M placement per half
-    # histories are tracked per-side so each half respects the "no > 2 in a row" rule independently
-    _ensure_km_histories(state, "km_history_leader_half", "km_history_follower_half")
-    lead_layout = _pick_km_layout(state["progress"]["km_history_leader_half"])     # 'K_left' or 'M_left'
-    foll_layout = _pick_km_layout(state["progress"]["km_history_follower_half"])   # 'K_left' or 'M_left'
+    # K/M placement per half comes from the session schedule (compiled at session start)
+    lead_layout = km_layout(state, "leader")     # 'K_left' or 'M_left'
+    foll_layout = km_layout(state, "follower")   # 'K_left' or 'M_left'
 
     # for leader half
     if lead_layout == "K_left":
@@ -268,307 +288,233 @@ def run(screen, clock, state):
     else:
         rK_follow, rM_follow = foll_Rspot, foll_Lspot
 
-    # joysticks (0 -> left, 1 -> right)
-    js_left  = pygame.joystick.Joystick(0) if pygame.joystick.get_count()>0 else None
-    js_right = pygame.joystick.Joystick(1) if pygame.joystick.get_count()>1 else None
+    # joysticks (0 -> left, 1 -> right), read from the shared device manager
+    devices.init_joysticks()
     speed = max(3, int(W * CURSOR_SPEED_PER_W))
 
-    def draw_base():
-        screen.fill(BG)
-        pygame.draw.rect(screen, BLACK, mid_rect)
-        pygame.draw.rect(screen, BLACK, left_rect, 2)
-        pygame.draw.rect(screen, BLACK, right_rect, 2)
+    def draw_base(surface):
+        surface.fill(BG)
+        pygame.draw.rect(surface, BLACK, mid_rect)
+        pygame.draw.rect(surface, BLACK, left_rect, 2)
+        pygame.draw.rect(surface, BLACK, right_rect, 2)
+
+    # stimulus surfaces: rendered once for this resolution, blitted from cache
+    atlas = get_atlas()
+    atlas.sync_mode(screen)
+    atlas.warm(("K", "M", "flash"), (box_w, box_h))
+
+    def draw_box(surface, choice, rect):
+        atlas.blit(surface, choice, rect)
+
+    # static background painted once; only cursors/flash are redrawn per frame
+    renderer = SplitScreenRenderer(screen, draw_base)
+
+    def draw_phase_static(surface):
+        """Everything that stays put for the current phase (baked into the scene layer)."""
+        if phase.name == "start":
+            _draw_start_bar(surface, start_rect, start_border_w)  # no text, square corners
+        elif phase.name == "leader":
+            draw_box(surface, "K", rK_lead)
+            draw_box(surface, "M", rM_lead)
+        else:
+            # after leader selects: show ONLY their chosen box (kept visible from here on)
+            draw_box(surface, leader_choice, chosen_leader_rect)
+            if phase.name == "follower":
+                draw_box(surface, "K", rK_follow)
+                draw_box(surface, "M", rM_follow)
+            elif follower_choice:
+                draw_box(surface, follower_choice, chosen_follower_rect)
+
+    # cursors are integrated off the render loop (SAMPLE_HZ), so choice times
+    # are the exact crossing time into the box, not the next rendered frame
+    sampler = InputSampler()
+    left_cur  = sampler.add(_make_cursor(left_rect,  0, LEFT_KEYS,  speed, R, (left_rect.centerx,  H//2), "left"))
+    right_cur = sampler.add(_make_cursor(right_rect, 1, RIGHT_KEYS, speed, R, (right_rect.centerx, H//2), "right"))
+    start_targets = [("start", start_rect)]
+    left_cur.set_targets(start_targets, stop_on_hit=False)
+    right_cur.set_targets(start_targets, stop_on_hit=False)
+
+    # which half/cursor belongs to the leader and the follower
+    if leader_is_left:
+        lead_cur, lead_half = left_cur,  left_rect
+        foll_cur, foll_half = right_cur, right_rect
+    else:
+        lead_cur, lead_half = right_cur, right_rect
+        foll_cur, foll_half = left_cur,  left_rect
 
-    # ------------------ START phase (JBT-style bar) ------------------
-    left_ready = right_ready = False
-    t_first_touch = None
-    played_start_chime = False
-
-    left_pos  = [left_rect.centerx,  H//2]
-    right_pos = [right_rect.centerx, H//2]
-
-    while True:
-        for ev in pygame.event.get():
-            if ev.type == QUIT: return None
-            if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q): return None
-
-        keys = pygame.key.get_pressed()
-        dx, dy = _move_from_input(keys, js_left, K_w, K_s, K_a, K_d, speed)
-        left_pos[0] = _clamp(left_pos[0]+dx, left_rect.left+R, left_rect.right-R-1)
-        left_pos[1] = _clamp(left_pos[1]+dy, left_rect.top +R, left_rect.bottom-R-1)
-        dx, dy = _move_from_input(keys, js_right, K_UP, K_DOWN, K_LEFT, K_RIGHT, speed)
-        right_pos[0] = _clamp(right_pos[0]+dx, right_rect.left+R, right_rect.right-R-1)
-        right_pos[1] = _clamp(right_pos[1]+dy, right_rect.top +R, right_rect.bottom-R-1)
-
-        draw_base()
-        _draw_start_bar(screen, start_rect, start_border_w)  # no text, square corners
-        pygame.draw.circle(screen, CURSOR_COLOR, left_pos,  R)
-        pygame.draw.circle(screen, CURSOR_COLOR, right_pos, R)
-        pygame.display.flip()
-
-        if not played_start_chime:
-            sounds["start"].play()
-            played_start_chime = True
-
-        if not left_ready and start_rect.collidepoint(left_pos):
-            left_ready = True
-            if t_first_touch is None: t_first_touch = time.perf_counter()
-        if not right_ready and start_rect.collidepoint(right_pos):
-            right_ready = True
-            if t_first_touch is None: t_first_touch = time.perf_counter()
-
-        if t_first_touch and not (left_ready and right_ready):
-            if time.perf_counter() - t_first_touch > 2.0:
-                left_ready = right_ready = False
-                t_first_touch = None
-                left_pos  = [left_rect.centerx,  H//2]
-                right_pos = [right_rect.centerx, H//2]
-
-        if left_ready and right_ready:
-            break
-
-        clock.tick(60)
-
-    # ------------------ Leader phase (30s) ------------------
-    leader_choice = follower_choice = None
-    leader_time = follower_time = None
+    follower_disp = 1 if leader_is_left else 0
+    leader_disp   = 0 if leader_is_left else 1
 
+    # choices / RTs
+    leader_choice = follower_choice = None
     leader_time = follower_time = None
     leader_time_ms = follower_time_ms = 0
+    chosen_leader_rect = chosen_follower_rect = None
 
+    # START bookkeeping
+    left_ready = right_ready = False
+    t_first_touch = None
 
-    left_pos  = [left_rect.centerx,  lower_y]
-    right_pos = [right_rect.centerx, lower_y]
-
-
-    t0 = time.perf_counter()
-    while True:
-        for ev in pygame.event.get():
-            if ev.type == QUIT: return None
-            if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q): return None
-
-        keys = pygame.key.get_pressed()
-        if leader_is_left:
-            dx, dy = _move_from_input(keys, js_left, K_w, K_s, K_a, K_d, speed)
-            left_pos[0] = _clamp(left_pos[0]+dx, left_rect.left+R, left_rect.right-R-1)
-            left_pos[1] = _clamp(left_pos[1]+dy, left_rect.top +R, left_rect.bottom-R-1)
-        else:
-            dx, dy = _move_from_input(keys, js_right, K_UP, K_DOWN, K_LEFT, K_RIGHT, speed)
-            right_pos[0] = _clamp(right_pos[0]+dx, right_rect.left+R, right_rect.right-R-1)
-            right_pos[1] = _clamp(right_pos[1]+dy, right_rect.top +R, right_rect.bottom-R-1)
-
-        elapsed = time.perf_counter() - t0
-        if elapsed > 30.0: return None
-
-        draw_base()
-        # draw leader choices with new designs
-        _draw_K_box(screen, rK_lead)
-        _draw_M_box(screen, rM_lead)
-
-        # show ONLY leader cursor pre-choice
-        if leader_is_left:
-            pygame.draw.circle(screen, CURSOR_COLOR, left_pos,  R)
-        else:
-            pygame.draw.circle(screen, CURSOR_COLOR, right_pos, R)
-
-        active_pos = left_pos if leader_is_left else right_pos
-        if rK_lead.collidepoint(active_pos):
-            leader_choice = "K"
-            leader_time = elapsed
-            leader_time_ms = int(elapsed * 1000)
-            sounds["select"].play()
-            break
-        if rM_lead.collidepoint(active_pos):
-            leader_choice = "M"
-            leader_time = elapsed
-            leader_time_ms = int(elapsed * 1000)
-            sounds["select"].play()
-            break
-
-        pygame.display.flip()
-        clock.tick(60)
-
-    # After leader selects: show ONLY their chosen box, hide everything else.
-    chosen_leader_rect = rK_lead if leader_choice == "K" else rM_lead
-    def _draw_leader_choice_only():
-        draw_base()
-        if leader_choice == "K":
-            _draw_K_box(screen, chosen_leader_rect)
-        else:
-            _draw_M_box(screen, chosen_leader_rect)
-        pygame.display.flip()
-
-    _draw_leader_choice_only()
-
-    # ---- 0.5s ITI before follower receives reward ----
-    pygame.time.delay(500)
-
-    # ---------- Follower receives pellets FIRST ----------
-    pellets_to_follower = _choice_to_pellets(leader_choice)
-    follower_disp = 1 if leader_is_left else 0
+    # payout bookkeeping (one pellet per PAYOUT_CADENCE_SEC, flash first)
+    payout = {"rect": None, "num": 0, "side": 0, "fired": 0}
 
-    # Flicker = overlay on leader's chosen box while giving follower pellets (1s spacing)
-    overlay_leader = pygame.Surface(chosen_leader_rect.size, pygame.SRCALPHA)
-    overlay_leader.fill((255,255,255,200))
+    def begin_payout(name, rect, num, side):
+        payout.update(rect=rect, num=num, side=side, fired=0)
+        phase.enter(name, duration=num * PAYOUT_CADENCE_SEC)
 
-    def _blink_and_dispense(rect_to_blink, num_pellets, dispense_side, draw_baseline_fn, overlay_surface):
+    def step_payout():
         """
         Each pellet is a 1.0s cadence:
-        - show baseline
-        - overlay flash for 0.25s
-        - clear overlay (back to baseline immediately)
-        - dispense pellet + ding
-        - wait remaining 0.75s
-
-        draw_baseline_fn: function that draws the proper baseline for the current context
-                        (e.g., _draw_leader_choice_only or _draw_follower_choice_only).
+        - overlay flash for the first 0.25s
+        - then clear overlay, dispense pellet + ding
+        - rest of the second on baseline
+        Returns True while the overlay should be visible.
         """
-        for _ in range(num_pellets):
-            # 1) baseline
-            draw_baseline_fn()
-            pygame.display.flip()
-
-            # 2) show overlay for ~0.25s
-            draw_baseline_fn()
-            screen.blit(overlay_surface, rect_to_blink.topleft)
-            pygame.display.flip()
-            pygame.time.delay(250)
-
-            # 3) clear overlay immediately (back to baseline)
-            draw_baseline_fn()
-            pygame.display.flip()
-
-            # 4) dispense + ding (JBT-style pellet call)
-            pellet(side=dispense_side, num=1)
-            if "pellet" in sounds:
-                sounds["pellet"].play()
-
-            # 5) remainder of cadence
-            # pellet() already waits 500ms; we keep a small extra delay so the total stays ~1s per pellet
-            pygame.time.delay(250)
-
-
-
-    _blink_and_dispense(
-    rect_to_blink=chosen_leader_rect,
-    num_pellets=pellets_to_follower,
-    dispense_side=follower_disp,
-    draw_baseline_fn=_draw_leader_choice_only,
-    overlay_surface=overlay_leader
-    )
-
-
-    # ------------------ Follower phase (30s) ------------------
-    if leader_is_left:
-        right_pos = [right_rect.centerx, lower_y]
-    else:
-        left_pos  = [left_rect.centerx,  lower_y]
-
-    t1 = time.perf_counter()
-    while True:
-        for ev in pygame.event.get():
-            if ev.type == QUIT: return None
-            if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q): return None
-
-        keys = pygame.key.get_pressed()
-        if leader_is_left:
-            dx, dy = _move_from_input(keys, js_right, K_UP, K_DOWN, K_LEFT, K_RIGHT, speed)
-            right_pos[0] = _clamp(right_pos[0]+dx, right_rect.left+R, right_rect.right-R-1)
-            right_pos[1] = _clamp(right_pos[1]+dy, right_rect.top +R, right_rect.bottom-R-1)
-        else:
-            dx, dy = _move_from_input(keys, js_left, K_w, K_s, K_a, K_d, speed)
-            left_pos[0] = _clamp(left_pos[0]+dx, left_rect.left+R, left_rect.right-R-1)
-            left_pos[1] = _clamp(left_pos[1]+dy, left_rect.top +R, left_rect.bottom-R-1)
-
-        elapsed = time.perf_counter() - t1
-        if elapsed > 30.0: return None
-
-        draw_base()
-        # show leader's chosen box (context), but no cursors on leader side
-        if leader_choice == "K":
-            _draw_K_box(screen, chosen_leader_rect)
-        else:
-            _draw_M_box(screen, chosen_leader_rect)
-        # follower options
-        _draw_K_box(screen, rK_follow)
-        _draw_M_box(screen, rM_follow)
-
-        # ONLY follower cursor visible pre-choice
-        if leader_is_left:
-            pygame.draw.circle(screen, CURSOR_COLOR, right_pos, R)
-        else:
-            pygame.draw.circle(screen, CURSOR_COLOR, left_pos,  R)
-
-        active_pos = right_pos if leader_is_left else left_pos
-        if rK_follow.collidepoint(active_pos):
-            follower_choice = "K"
-            follower_time = elapsed
-            follower_time_ms = int(elapsed * 1000)
-            sounds["select"].play()
-            break
-        if rM_follow.collidepoint(active_pos):
-            follower_choice = "M"
-            follower_time = elapsed
-            follower_time_ms = int(elapsed * 1000)
-            sounds["select"].play()
-            break
-
-        pygame.display.flip()
-        clock.tick(60)
-
-    # After follower selects: show ONLY their chosen box, hide everything else.
-    chosen_follower_rect = rK_follow if follower_choice=="K" else rM_follow
-    def _draw_follower_choice_only():
-        draw_base()
-        # ALWAYS keep the leader's choice visible
-        if leader_choice == "K":
-            _draw_K_box(screen, chosen_leader_rect)
-        else:
-            _draw_M_box(screen, chosen_leader_rect)
-
-        # Then draw the follower's chosen box
-        if follower_choice == "K":
-            _draw_K_box(screen, chosen_follower_rect)
-        else:
-            _draw_M_box(screen, chosen_follower_rect)
-
-        pygame.display.flip()
-
-    _draw_follower_choice_only()
-    # 0.5s ITI, then leader receives pellets (1s spacing), blink follower choice
-    pygame.time.delay(500)
-
-    pellets_to_leader = _choice_to_pellets(follower_choice)
-    leader_disp = 0 if leader_is_left else 1
-
-    overlay_follower = pygame.Surface(chosen_follower_rect.size, pygame.SRCALPHA)
-    overlay_follower.fill((255,255,255,200))
-
-    _blink_and_dispense(
-    rect_to_blink=chosen_follower_rect,
-    num_pellets=pellets_to_leader,
-    dispense_side=leader_disp,
-    draw_baseline_fn=_draw_follower_choice_only,
-    overlay_surface=overlay_follower
-    )
-
-
-    # After all pellets, show **both** choices for 2s
-    def draw_both_choices():
-        draw_base()
-        if leader_choice == "K": _draw_K_box(screen, chosen_leader_rect)
-        else:                    _draw_M_box(screen, chosen_leader_rect)
-        if follower_choice == "K": _draw_K_box(screen, chosen_follower_rect)
-        else:                       _draw_M_box(screen, chosen_follower_rect)
-        pygame.display.flip()
-
-    draw_both_choices()
-    pygame.time.delay(2000)
-
-    # Short ITI after the choices are presented (uncomment if needed again);
-    # pygame.time.delay(2000)
-
-    paired = f"{leader_choice}{follower_choice}"
+        k = int(phase.elapsed // PAYOUT_CADENCE_SEC)
+        into = phase.elapsed - k * PAYOUT_CADENCE_SEC
+        if k >= payout["num"]:
+            return False
+        if into >= PAYOUT_FLASH_SEC and payout["fired"] <= k:
+            pellet(side=payout["side"], num=1)
+            bank.play("pellet")
+            payout["fired"] = k + 1
+        return into < PAYOUT_FLASH_SEC
+
+    # ------------------ one frame loop, phase by phase ------------------
+    # start -> leader -> leader_iti -> follower_payout -> follower
+    #       -> follower_iti -> leader_payout -> feedback -> done
+    phase = PhaseMachine()
+    phase.enter("start")
+    drawn_phase = None
+    bank.play("start")
+
+    # frame timing (shared across the trio when main passes one in)
+    if probe is None:
+        probe = FrameProbe()
+    tag = "km"
+
+    if traj is not None:
+        traj.attach(sampler, phase, tag)
+
+    sampler.start()
+    try:
+        while True:
+            probe.frame_start()
+            for ev in inputs.events():
+                if ev.type == QUIT: return None
+                if ev.type == KEYDOWN and ev.key in (K_ESCAPE, K_q): return None
+                if ev.type == KEYDOWN and ev.key == K_F1:
+                    live_stats.toggle_overlay()   # experimenter panel
+                atlas.handle_event(ev)
+                renderer.handle_event(ev)
+
+            inputs.snapshot()   # keys/axes for this frame's samples
+            sampler.sync()
+            flash = False
+
+            # ---- update ----
+            if phase.name == "start":
+                if not left_ready and left_cur.hit:
+                    left_ready = True
+                    if t_first_touch is None: t_first_touch = phase.now()
+                if not right_ready and right_cur.hit:
+                    right_ready = True
+                    if t_first_touch is None: t_first_touch = phase.now()
+
+                if t_first_touch and not (left_ready and right_ready):
+                    if phase.now() - t_first_touch > 2.0:
+                        left_ready = right_ready = False
+                        t_first_touch = None
+                        left_cur.reset((left_rect.centerx,  H//2))
+                        right_cur.reset((right_rect.centerx, H//2))
+
+                if left_ready and right_ready:
+                    foll_cur.reset((foll_half.centerx, lower_y), active=False)
+                    lead_cur.reset((lead_half.centerx, lower_y))
+                    lead_cur.set_targets([("K", rK_lead), ("M", rM_lead)])
+                    phase.enter("leader", duration=CHOICE_TIMEOUT_SEC)
+
+            elif phase.name == "leader":
+                hit = lead_cur.hit
+                if hit:
+                    leader_choice = hit[0]
+                    elapsed = _hit_elapsed(hit, phase.t_enter)
+                    lead_cur.freeze()
+                    leader_time = elapsed
+                    leader_time_ms = int(elapsed * 1000)
+                    bank.play("select")
+                    chosen_leader_rect = rK_lead if leader_choice == "K" else rM_lead
+                    phase.enter("leader_iti", duration=CHOICE_ITI_SEC)
+                elif phase.expired():
+                    return None
+
+            elif phase.name == "leader_iti":
+                if phase.expired():
+                    # follower receives pellets FIRST
+                    begin_payout("follower_payout", chosen_leader_rect,
+                                 _choice_to_pellets(leader_choice), follower_disp)
+
+            elif phase.name == "follower_payout":
+                flash = step_payout()
+                if phase.expired():
+                    foll_cur.reset((foll_half.centerx, lower_y))
+                    foll_cur.set_targets([("K", rK_follow), ("M", rM_follow)])
+                    phase.enter("follower", duration=CHOICE_TIMEOUT_SEC)
+
+            elif phase.name == "follower":
+                hit = foll_cur.hit
+                if hit:
+                    follower_choice = hit[0]
+                    elapsed = _hit_elapsed(hit, phase.t_enter)
+                    foll_cur.freeze()
+                    follower_time = elapsed
+                    follower_time_ms = int(elapsed * 1000)
+                    bank.play("select")
+                    chosen_follower_rect = rK_follow if follower_choice == "K" else rM_follow
+                    phase.enter("follower_iti", duration=CHOICE_ITI_SEC)
+                elif phase.expired():
+                    return None
+
+            elif phase.name == "follower_iti":
+                if phase.expired():
+                    begin_payout("leader_payout", chosen_follower_rect,
+                                 _choice_to_pellets(follower_choice), leader_disp)
+
+            elif phase.name == "leader_payout":
+                flash = step_payout()
+                if phase.expired():
+                    # show BOTH choices for 2s
+                    phase.enter("feedback", duration=FEEDBACK_SEC)
+
+            elif phase.name == "feedback":
+                if phase.expired():
+                    phase.finish()
+                    break
+
+            # ---- draw ----
+            if phase.name != drawn_phase:
+                renderer.set_scene(draw_phase_static)
+                drawn_phase = phase.name
+            renderer.begin()
+            if phase.name == "start":
+                renderer.circle(CURSOR_COLOR, left_cur.xy(),  R)
+                renderer.circle(CURSOR_COLOR, right_cur.xy(), R)
+            elif phase.name == "leader":
+                renderer.circle(CURSOR_COLOR, lead_cur.xy(), R)   # ONLY leader cursor pre-choice
+            elif phase.name == "follower":
+                renderer.circle(CURSOR_COLOR, foll_cur.xy(), R)   # ONLY follower cursor
+            if flash:
+                renderer.blit(atlas.get("flash", payout["rect"].size), payout["rect"].topleft)
+            if live_stats.overlay_visible():
+                renderer.blit(live_stats.overlay_surface(state, H), (0, 0))
+            probe.mark_draw()
+            renderer.present()
+            probe.mark_flip()
+
+            clock.tick(60)
+            probe.frame_end(f"{tag}:{drawn_phase}")
+    finally:
+        sampler.stop()
 
     return {
     "leader_side": leader_side,
@@ -578,4 +524,5 @@ def run(screen, clock, state):
     "follower_choice_time": round(follower_time or 0.0, 3),
     "leader_choice_time_ms": leader_time_ms,
     "follower_choice_time_ms": follower_time_ms,
+    "phases": phase.timeline_ms(),
     }
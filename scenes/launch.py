@@ -12,29 +12,45 @@ from shared.persistence import (
     INCOMPLETE,
     make_uid,
     load_all_states,
+    load_state,
     save_state,
+    forget_state,
     new_or_resume_state,
     set_next_trial,
     ensure_fake_incomplete_examples,
 )
+from shared.pellets import dispense
+from shared import devices, summaries, text_cache
+from shared.csv_logger import csv_dir
+from shared.frame_probe import FRAME_BUDGET_MS, DROP_FACTOR
 
 # --- DEV PATCH ---
 DEV_KEYBOARD_AS_JOYSTICK = True
 # -----------------
 # ---------- pellet test (launcher sanity check) ----------
-_pelletPath = ['c:/pellet1.exe', 'c:/pellet2.exe']  # 0 = left, 1 = right
+PELLET_TEST_THROTTLE_MS = 150
+_pellet_test_jobs = [None, None]   # last test job per side (0 = left, 1 = right)
+_pellet_test_ms = [None, None]
 
 def _dispense_pellet(side: int, num: int = 1):
     """
     Launcher-only pellet test.
-    HARD GUARANTEE: exactly one pellet per call (collision latching handles frequency).
+    HARD GUARANTEE: at most one pellet per call (collision latching handles frequency).
+    Queued on the background dispenser so the joystick boxes keep updating;
+    presses within PELLET_TEST_THROTTLE_MS, or while the side's previous test
+    pellet is still waiting to be dispensed, are dropped, so repeated clicks
+    never build a backlog that keeps dispensing afterwards.
     """
-    exe = _pelletPath[side]
-    if os.path.isfile(exe):
-        os.system(exe)
-    else:
-        print(f"[PELLET] Missing {exe} — would dispense for side={side}")
-    pygame.time.delay(150)
+    now = pygame.time.get_ticks()
+    last = _pellet_test_ms[side]
+    if last is not None and now - last < PELLET_TEST_THROTTLE_MS:
+        return None
+    job = _pellet_test_jobs[side]
+    if job is not None and not job.done.is_set():
+        return None
+    _pellet_test_ms[side] = now
+    _pellet_test_jobs[side] = dispense(side, 1)
+    return _pellet_test_jobs[side]
 
 
 def _joy_vec(joy_index: int, deadzone: float = 0.20):
@@ -47,15 +63,9 @@ def _joy_vec(joy_index: int, deadzone: float = 0.20):
     dx = dy = 0.0
 
     # HW joystick
-    if pygame.joystick.get_count() > joy_index:
-        try:
-            j = pygame.joystick.Joystick(joy_index)
-            if not j.get_init():
-                j.init()
-            dx = float(j.get_axis(0))
-            dy = float(j.get_axis(1))
-        except Exception:
-            dx = dy = 0.0
+    if devices.present(joy_index):
+        dx = devices.axis(joy_index, 0)
+        dy = devices.axis(joy_index, 1)
 
         if abs(dx) < deadzone: dx = 0.0
         if abs(dy) < deadzone: dy = 0.0
@@ -108,25 +118,6 @@ def _virtual_joystick_active(index: int) -> bool:
 # =====================================================
 # UI helpers (same behavior as before, packaged here)
 # =====================================================
-def _elide(text, font, max_width):
-    if font.size(text)[0] <= max_width:
-        return text
-    if max_width <= font.size("…")[0]:
-        return "…"
-    left, right = 0, len(text)
-    base = text
-    while left < right:
-        mid = (left + right) // 2
-        trial = base[:mid] + "…"
-        if font.size(trial)[0] <= max_width:
-            left = mid + 1
-        else:
-            right = mid
-    return base[:max(0, right - 1)] + "…"
-
-
-
-
 class _Button:
     def __init__(self, rect, label, s, FONT, FG, BTN_BG, BTN_BG_HOVER, BTN_BORDER):
         self.rect = pygame.Rect(rect)
@@ -150,8 +141,7 @@ class _Button:
             surface, self._BTN_BORDER, self.rect, self._s(2), border_radius=self._s(10)
         )
         inner_w = self.rect.w - self._s(20)
-        lbl = _elide(self.label, self._FONT, inner_w)
-        t = self._FONT.render(lbl, True, self._FG)
+        t = text_cache.render(self._FONT, self.label, self._FG, inner_w)
         surface.blit(t, t.get_rect(center=self.rect.center))
 
     def handle(self, event):
@@ -183,7 +173,7 @@ class _TextInput:
         pygame.draw.rect(
             surface, self._BTN_BORDER, self.rect, self._s(2), border_radius=self._s(8)
         )
-        txt = self._FONT.render(self.text, True, self._FG)
+        txt = text_cache.render(self._FONT, self.text, self._FG)
         surface.blit(
             txt,
             (self.rect.x + self._s(10), self.rect.y + (self.rect.h - txt.get_height()) // 2),
@@ -243,7 +233,7 @@ class _Dropdown:
         pygame.draw.rect(surface, self._BTN_BG, self.rect, border_radius=self._s(8))
         pygame.draw.rect(surface, self._BTN_BORDER, self.rect, self._s(2), border_radius=self._s(8))
         label = self.value if self.value else self.placeholder
-        t = self._FONT.render(label, True, self._FG if self.value else (120, 120, 120))
+        t = text_cache.render(self._FONT, label, self._FG if self.value else (120, 120, 120))
         surface.blit(t, (self.rect.x + self._s(10), self.rect.centery - t.get_height() // 2))
         cx = self.rect.right - self._s(24)
         cy = self.rect.centery
@@ -264,7 +254,7 @@ class _Dropdown:
             top = self._drop_rect.y
             for i in range(start, end):
                 r = pygame.Rect(self._drop_rect.x, top, self._drop_rect.w, self._item_h)
-                tt = self._FONT.render(self.options[i], True, self._FG)
+                tt = text_cache.render(self._FONT, self.options[i], self._FG)
                 surface.blit(tt, (r.x + self._s(10), r.centery - tt.get_height() // 2))
                 pygame.draw.line(surface, self._LINE, (r.x, r.bottom), (r.right, r.bottom), 1)
                 top += self._item_h
@@ -336,7 +326,7 @@ class _RadioPair:
             pygame.draw.circle(surface, self._ACCENT, self.right_pos, self.radius - self._s(5))
 
         def _draw_text(txt, x, y):
-            t = self._FONT_SMALL.render(txt, True, self._FG)
+            t = text_cache.render(self._FONT_SMALL, txt, self._FG)
             surface.blit(t, t.get_rect(midleft=(x, y)))
 
         _draw_text("Left is Leader", self.left_pos[0] + self._s(18), self.left_pos[1])
@@ -377,9 +367,9 @@ class _Stepper:
     def draw(self, surface):
         pygame.draw.rect(surface, self._BTN_BG, self.rect, border_radius=self._s(8))
         pygame.draw.rect(surface, self._BTN_BORDER, self.rect, self._s(2), border_radius=self._s(8))
-        t = self._FONT_SMALL.render(self.label, True, self._FG)
+        t = text_cache.render(self._FONT_SMALL, self.label, self._FG)
         surface.blit(t, (self.rect.x, self.rect.y - self._s(22)))
-        v = self._FONT.render(str(self.value), True, self._FG)
+        v = text_cache.render(self._FONT, str(self.value), self._FG)
         surface.blit(v, v.get_rect(center=self.rect.center))
         self.btn_minus.draw(surface)
         self.btn_plus.draw(surface)
@@ -402,6 +392,102 @@ os.makedirs(ARCHIVE_DIR, exist_ok=True)
 def _state_path(uid: str) -> str:
     return os.path.join(STATE_DIR, f"{uid}.json")
 
+# =====================================================
+# Dashboard cards (painted once per data change, then only blitted)
+# =====================================================
+_CURVE_SERIES = (
+    # (label, colour, session summary -> value)
+    ("S+ hit", (0, 150, 60),   lambda ss: _side_mean(ss["hit"])),
+    ("S- FA",  (210, 40, 40),  lambda ss: _side_mean(ss["fa"])),
+    ("KK",     (30, 120, 255), lambda ss: ss["coop"]),
+)
+
+
+def _side_mean(by_side):
+    vals = [v for v in by_side.values() if v is not None]
+    return sum(vals) / len(vals) if vals else None
+
+
+def _fmt_rate(v):
+    return "-" if v is None else f"{v * 100:.0f}%"
+
+
+def _fmt_num(v, spec):
+    return "-" if v is None else format(v, spec)
+
+
+def _paint_pair_card(size, st, sessions, s, FONT_SMALL, FG, BORDER):
+    """
+    One pair's dashboard card: learning curves per session (S+ hit, S- false
+    alarms, KK cooperation), the latest discrimination index per side and the
+    frame timing health. `sessions` comes from shared.summaries.
+    """
+    w, h = size
+    card = pygame.Surface(size).convert()
+    card.fill((255, 255, 255))
+    pygame.draw.rect(card, BORDER, card.get_rect(), s(2), border_radius=s(8))
+    pad = s(10)
+    line_h = FONT_SMALL.get_linesize()
+
+    cfg, prog = st["config"], st["progress"]
+    head = (f"{cfg['leader']} + {cfg['follower']} — {cfg.get('stimuli', '')} — "
+            f"S{prog['session_index']}/{cfg.get('sessions_total', '?')}, next trial {prog['completed_trios'] + 1}")
+    card.blit(FONT_SMALL.render(text_cache.elide(head, FONT_SMALL, w - 2 * pad), True, FG), (pad, pad))
+
+    top = pad + line_h + s(14)
+    chart = pygame.Rect(pad + s(28), top, int(w * 0.58) - pad - s(28), h - top - pad - line_h)
+    text_x = chart.right + s(16)
+    if not sessions:
+        card.blit(FONT_SMALL.render("no trio data yet", True, (120, 120, 120)), (pad, top))
+        return card
+
+    # ---- learning curves ----
+    pygame.draw.rect(card, (248, 248, 248), chart)
+    for frac in (0.0, 0.5, 1.0):
+        y = chart.bottom - int(frac * chart.h)
+        pygame.draw.line(card, (215, 215, 215), (chart.left, y), (chart.right, y))
+        t = FONT_SMALL.render(f"{frac:.1f}", True, (120, 120, 120))
+        card.blit(t, t.get_rect(midright=(chart.left - s(4), y)))
+    n_x = max(int(cfg.get("sessions_total", 0) or 0), sessions[-1]["session"], 2)
+
+    def pt(session, v):
+        x = chart.left + int((session - 1) / (n_x - 1) * chart.w)
+        return x, chart.bottom - int(max(0.0, min(1.0, v)) * chart.h)
+
+    legend_x = chart.left
+    for label, color, value in _CURVE_SERIES:
+        pts = [pt(ss["session"], value(ss)) for ss in sessions if value(ss) is not None]
+        if len(pts) > 1:
+            pygame.draw.lines(card, color, False, pts, max(1, s(2)))
+        for p in pts:
+            pygame.draw.circle(card, color, p, max(2, s(3)))
+        t = FONT_SMALL.render(label, True, color)
+        card.blit(t, (legend_x, chart.bottom + s(2)))
+        legend_x += t.get_width() + s(14)
+    t = FONT_SMALL.render(f"session 1–{n_x}", True, (120, 120, 120))
+    card.blit(t, t.get_rect(topright=(chart.right, chart.bottom + s(2))))
+
+    # ---- latest session: discrimination + timing health ----
+    last = sessions[-1]
+    disc = last["disc"]
+    p99 = last.get("p99_ms")
+    budget = FRAME_BUDGET_MS * DROP_FACTOR
+    health_ok = p99 is not None and p99 <= budget and not last.get("dropped")
+    health = (0, 120, 0) if health_ok else (200, 30, 30)
+    lines = [
+        (f"Session {last['session']} ({last['trios']} trios)", FG),
+        (f"Disc L: {_fmt_num(disc.get('leader'), '+.2f')}   F: {_fmt_num(disc.get('follower'), '+.2f')}", FG),
+        (f"S+ {_fmt_rate(_side_mean(last['hit']))}   S- {_fmt_rate(_side_mean(last['fa']))}"
+         f"   KK {_fmt_rate(last['coop'])}", FG),
+        (f"Frame p99 {_fmt_num(p99, '.1f')} ms (max {_fmt_num(last.get('p99_max_ms'), '.0f')})", health),
+        (f"Dropped frames: {_fmt_num(last.get('dropped'), 'd')}", health),
+    ]
+    y = top
+    for text, color in lines:
+        card.blit(FONT_SMALL.render(text_cache.elide(text, FONT_SMALL, w - text_x - pad), True, color), (text_x, y))
+        y += line_h + s(4)
+    return card
+
 # =====================================================
 # The Scene
 # =====================================================
@@ -411,9 +497,12 @@ class LaunchScene:
     SESSIONS = [str(n) for n in range(1, 13)]
     STIMULI = ["Dark S+", "Light S+"]
 
-    def __init__(self, screen, clock=None):
+    def __init__(self, screen, clock=None, on_first_frame=None, on_frame=None):
         self.screen = screen
         self.clock = clock or pygame.time.Clock()
+        # called once, right after the first frame is on screen (startup timing + preload)
+        self.on_first_frame = on_first_frame
+        self.on_frame = on_frame   # called after every presented frame (idle-time work)
         self.W, self.H = self.screen.get_size()
 
         def s(x):
@@ -518,6 +607,7 @@ class LaunchScene:
         self.reset_btn  = _Button((left_col_x, y, s(210), s(54)), "Reset", s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
         self.launch_btn = _Button((right_col_x + col_w - s(180), y, s(180), s(54)), "Launch", s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
         self.resume_btn = _Button((right_col_x + col_w - s(180) - s(280) - s(16), y, s(280), s(54)), "Restart Session", s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
+        self.dash_btn   = _Button((left_col_x + s(210) + s(16), y, s(200), s(54)), "Dashboard", s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
 
         # Resume UI
         self.mode = "launch"
@@ -535,6 +625,15 @@ class LaunchScene:
         self.restart_btn  = _Button((0, 0, 0, 0), "Restart", s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
         self.back_btn     = _Button((0, 0, 0, 0), "Back",    s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
 
+        # Dashboard: per-pair summaries are refreshed on a worker thread
+        # (shared/summaries.py); each card is a cached surface, repainted only
+        # when that pair's summaries or progress change.
+        self.dash_back_btn = _Button((self.PAD, self.H - self.PAD - s(54), s(180), s(54)), "Back", s, self.FONT, self.FG, self.BTN_BG, self.BTN_BG_HOVER, self.BTN_BORDER)
+        self._summaries = summaries.get_cache(csv_dir())
+        self._cards = {}   # uid -> (key, Surface)
+        self._dash_scroll = 0
+        self._dash_refresh_ms = 0
+
         # Errors
         self.error_lines = []
 
@@ -547,7 +646,7 @@ class LaunchScene:
 
     # --------------- helpers ---------------
     def _draw_text(self, surface, text, font, color, x, y, anchor="topleft"):
-        t = font.render(text, True, color)
+        t = text_cache.render(font, text, color)
         r = t.get_rect(**{anchor: (x, y)})
         surface.blit(t, r)
         return r
@@ -646,6 +745,39 @@ class LaunchScene:
         return list_rect, detail_rect
 
 
+    def _layout_dashboard(self):
+        """(visible area, [(uid, summary, card rect)]) with the scroll offset applied."""
+        top = self.title_rect.bottom + self.s(16)
+        view = pygame.Rect(self.PAD, top, self.W - 2 * self.PAD, self.dash_back_btn.rect.y - self.s(12) - top)
+        gap = self.s(12)
+        cols = max(1, (view.w + gap) // (self.s(560) + gap))
+        card_w = (view.w - (cols - 1) * gap) // cols
+        card_h = self.s(230)
+        entries = list(INCOMPLETE.items())
+        rows = (len(entries) + cols - 1) // cols
+        max_scroll = max(0, rows * (card_h + gap) - gap - view.h)
+        self._dash_scroll = max(0, min(self._dash_scroll, max_scroll))
+        cards = []
+        for i, (uid, st) in enumerate(entries):
+            r, c = divmod(i, cols)
+            rect = pygame.Rect(view.x + c * (card_w + gap), view.y + r * (card_h + gap) - self._dash_scroll,
+                               card_w, card_h)
+            cards.append((uid, st, rect))
+        return view, cards
+
+    def _pair_card(self, uid, st, size):
+        """Cached card surface for one state; repainted only when its inputs change."""
+        cfg, prog = st["config"], st["progress"]
+        pair = f"{cfg['leader']}-{cfg['follower']}"
+        key = (self._summaries.rev.get(pair, 0), tuple(size), cfg.get("stimuli"), cfg.get("sessions_total"),
+               prog["session_index"], prog["completed_trios"])
+        hit = self._cards.get(uid)
+        if hit is None or hit[0] != key:
+            card = _paint_pair_card(size, st, self._summaries.pair_sessions(pair),
+                                    self.s, self.FONT_SMALL, self.FG, self.BTN_BORDER)
+            hit = self._cards[uid] = (key, card)
+        return hit[1]
+
     def _populate_editor_from_state(self, st):
         self.edit_monkeyL.value = st["config"].get("left_name", st["config"]["leader"])
         self.edit_monkeyR.value = st["config"].get("right_name", st["config"]["follower"])
@@ -693,12 +825,9 @@ class LaunchScene:
             st["config"]["sessions_total"],
         )
         if new_uid != st["uid"]:
-            old = _state_path(st["uid"])  # use local helper for consistency
+            old_uid = st["uid"]
             st["uid"] = new_uid
-            try:
-                os.remove(old)
-            except FileNotFoundError:
-                pass
+            forget_state(old_uid)
     
     def _first_open_dropdown(self):
         """Return a reference to the first open dropdown in current mode, else None."""
@@ -725,6 +854,7 @@ class LaunchScene:
 
         while running:
             for event in pygame.event.get():
+                devices.handle_event(event)   # joystick axes + hotplug
                 if event.type == QUIT:
                     return None
                 if event.type == KEYDOWN and (event.key == K_ESCAPE or event.key == K_q):
@@ -767,6 +897,14 @@ class LaunchScene:
                         self._reset_launch()
                         self.error_lines = []
 
+                    if self.dash_btn.handle(event):
+                        self.mode = "dashboard"
+                        self.error_lines = []
+                        load_all_states()
+                        self._dash_scroll = 0
+                        self._summaries.start_refresh()
+                        self._dash_refresh_ms = pygame.time.get_ticks()
+
                     if self.resume_btn.handle(event):
                         self.mode = "resume_menu"
                         self.error_lines = []
@@ -798,6 +936,13 @@ class LaunchScene:
                         else:
                             self.error_lines = msgs[:]
 
+                elif self.mode == "dashboard":
+                    if event.type == MOUSEWHEEL:
+                        self._dash_scroll -= event.y * self.s(60)
+                    if self.dash_back_btn.handle(event):
+                        self.mode = "launch"
+                        load_all_states()
+
                 elif self.mode == "resume_menu":
                     # list selection
                     if event.type == MOUSEBUTTONDOWN and event.button == 1:
@@ -836,7 +981,7 @@ class LaunchScene:
                         if not self.selected_uid:
                             self.error_lines = ["Select a session from the list."]
                         else:
-                            st = INCOMPLETE[self.selected_uid]
+                            st = load_state(self.selected_uid)   # full state only for the one being restarted
                             self._apply_editor_to_state(st)
                             save_state(st)
                             load_all_states()
@@ -877,12 +1022,12 @@ class LaunchScene:
                     pygame.draw.rect(self.screen, self.BTN_BORDER, rect, self.s(2), border_radius=self.s(10))
 
                     # Presence: HW joystick exists OR dev-mode key emulation is enabled
-                    hw_present = (pygame.joystick.get_count() > side_index)
+                    hw_present = devices.present(side_index)
                     present = hw_present or DEV_KEYBOARD_AS_JOYSTICK
 
                     if not present:
                         msg = f"no joystick {side_index} detected"
-                        t = self.FONT_SMALL.render(msg, True, (120, 120, 120))
+                        t = text_cache.render(self.FONT_SMALL, msg, (120, 120, 120))
                         self.screen.blit(t, t.get_rect(center=rect.center))
                         return
 
@@ -997,6 +1142,7 @@ class LaunchScene:
                 self.stim_dd.draw(self.screen)
 
                 self.reset_btn.draw(self.screen)
+                self.dash_btn.draw(self.screen)
                 self.resume_btn.draw(self.screen)
                 self.launch_btn.draw(self.screen)
 
@@ -1049,6 +1195,16 @@ class LaunchScene:
                     line2 = f"Session {sess} — Next Trial {trial} — Stim: {st['config']['stimuli']}"
                     self._draw_text(self.screen, line1, self.FONT_SMALL, self.FG, row.x + self.s(10), row.y + self.s(10))
                     self._draw_text(self.screen, line2, self.FONT_SMALL, (60, 60, 60), row.x + self.s(10), row.bottom - self.s(22))
+                    head = (st.get("stats") or {}).get("session")
+                    if head and head.get("trios"):
+                        # live_stats headline from the catalog (no CSV reads)
+                        pct = lambda v: "-" if v is None else f"{v * 100:.0f}%"
+                        line3 = ("" if head.get("index") == sess else f"(S{head.get('index')}) ")
+                        line3 += (f"S+ {pct(head.get('hit_leader'))}/{pct(head.get('hit_follower'))}  "
+                                 f"S- {pct(head.get('fa_leader'))}/{pct(head.get('fa_follower'))}  "
+                                 f"KK {pct(head.get('coop'))}")
+                        self._draw_text(self.screen, line3, self.FONT_SMALL, (60, 60, 60),
+                                        row.right - self.s(10), row.y + self.s(10), anchor="topright")
                     top_y += item_h + self.s(8)
 
                 # right panel
@@ -1086,7 +1242,34 @@ class LaunchScene:
                         self._draw_text(self.screen, t, self.FONT_SMALL, self.ERROR, detail_rect.centerx, y, anchor="midbottom")
                         y -= self.s(28)
 
+            elif self.mode == "dashboard":
+                now = pygame.time.get_ticks()
+                if now - self._dash_refresh_ms >= summaries.REFRESH_SEC * 1000:
+                    self._summaries.start_refresh()   # stat pass (+ changed CSVs) off the UI thread
+                    self._dash_refresh_ms = now
+
+                view, cards = self._layout_dashboard()
+                clip = self.screen.get_clip()
+                self.screen.set_clip(view)
+                for uid, st, rect in cards:
+                    if rect.bottom >= view.top and rect.top <= view.bottom:
+                        self.screen.blit(self._pair_card(uid, st, rect.size), rect)
+                self.screen.set_clip(clip)
+
+                if not cards:
+                    self._draw_text(self.screen, "No state files.", self.FONT, self.FG, view.centerx, view.centery, "center")
+                status = "updating summaries…" if self._summaries.busy() or not self._summaries.loaded else \
+                    f"{len(cards)} pairs — {len(self._summaries.sessions)} session CSVs"
+                self._draw_text(self.screen, status, self.FONT_SMALL, (90, 90, 90),
+                                self.W - self.PAD, self.dash_back_btn.rect.centery, "midright")
+                self.dash_back_btn.draw(self.screen)
+
             pygame.display.flip()
+            if self.on_first_frame is not None:
+                callback, self.on_first_frame = self.on_first_frame, None
+                callback()
+            elif self.on_frame is not None:
+                self.on_frame()
             self.clock.tick(60)
 
 
@@ -0,0 +1,78 @@
+# shared/atlas.py
+import pygame
+
+
+class StimulusAtlas:
+    """
+    Pre-rendered stimulus surfaces, keyed by (design, size, profile).
+
+    Scenes register a painter per design once:
+        painter(surface, rect, profile)   # draws into a transparent surface at rect
+    and then blit from the cache every frame instead of redrawing polygons,
+    circles and trig per frame. Surfaces are converted to the display format.
+
+    The cache belongs to one display mode; sync_mode()/handle_event() drop it
+    when the resolution or pixel format changes.
+    """
+    def __init__(self):
+        self._painters = {}
+        self._cache = {}
+        self._mode = None
+
+    def register(self, design, painter):
+        if self._painters.get(design) is not painter:
+            self._painters[design] = painter
+            # a new painter for a known design makes its old surfaces stale
+            for key in [k for k in self._cache if k[0] == design]:
+                del self._cache[key]
+
+    def get(self, design, size, profile=None):
+        key = (design, (int(size[0]), int(size[1])), profile)
+        surf = self._cache.get(key)
+        if surf is None:
+            surf = self._render(design, key[1], profile)
+            self._cache[key] = surf
+        return surf
+
+    def blit(self, screen, design, rect, profile=None):
+        screen.blit(self.get(design, rect.size, profile), rect.topleft)
+
+    def warm(self, designs, size, profile=None):
+        """Render a batch up front (e.g. at scene start) so no frame pays for it."""
+        for design in designs:
+            self.get(design, size, profile)
+
+    # --------------- invalidation ---------------
+    def invalidate(self):
+        self._cache.clear()
+
+    def sync_mode(self, screen):
+        """Drop cached surfaces if `screen` is a different size/format than last time."""
+        mode = (screen.get_size(), screen.get_bitsize(), screen.get_flags())
+        if mode != self._mode:
+            self.invalidate()
+            self._mode = mode
+
+    def handle_event(self, ev):
+        if ev.type in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
+            self.invalidate()
+            self._mode = None
+
+    # --------------- internals ---------------
+    def _render(self, design, size, profile):
+        painter = self._painters[design]
+        surf = pygame.Surface(size, pygame.SRCALPHA)
+        painter(surf, surf.get_rect(), profile)
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha()
+        return surf
+
+
+# ---------- shared instance ----------
+_ATLAS = None
+
+def get_atlas():
+    global _ATLAS
+    if _ATLAS is None:
+        _ATLAS = StimulusAtlas()
+    return _ATLAS
@@ -1,7 +1,12 @@
 # shared/csv_logger.py
-import os, csv
+import os, io, csv, json, zlib
+
+CSV_DIR = None   # override the output folder (headless runs); None = project root
 
 def _csv_dir_for_state(state):
+    if CSV_DIR:
+        os.makedirs(CSV_DIR, exist_ok=True)
+        return CSV_DIR
     # This file is <project_root>/shared/csv_logger.py, so one up is the root
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     os.makedirs(project_root, exist_ok=True)  # harmless if it already exists
@@ -13,89 +18,311 @@ def _csv_filename_for_state(state):
     sess     = int(state["progress"]["session_index"])
     return f"KM-JBT_{leader}-{follower}_S{sess}.csv"
 
+def csv_dir():
+    """Folder the session CSVs are written to."""
+    return _csv_dir_for_state(None)
+
 def _csv_path_for_state(state):
     return os.path.join(_csv_dir_for_state(state), _csv_filename_for_state(state))
 
+# ---------- sidecar progress index ----------
+# <csv>.idx holds {"rows", "last_start", "end", "crc"}: the number of data rows,
+# the byte span of the last complete row and its crc32. It is rewritten
+# (tmp + os.replace) whenever the session writer closes the file, so reconciling
+# is one stat plus one short read (plus a tail scan of any rows written since)
+# instead of a walk over the whole CSV.
+
+def _index_path(csv_path):
+    return csv_path + ".idx"
+
+def _read_index(csv_path):
+    try:
+        with open(_index_path(csv_path), "r", encoding="utf-8") as f:
+            idx = json.load(f)
+        return {k: int(idx[k]) for k in ("rows", "last_start", "end", "crc")}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _write_index(csv_path, rows, last_start, end, crc):
+    path = _index_path(csv_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "last_start": last_start, "end": end, "crc": crc}, f)
+    os.replace(tmp, path)
+
+def _scan_rows(f, offset, rows, last_start, crc, skip_header=False):
+    """
+    Count complete (newline-terminated, non-blank) rows from `offset` on.
+    Returns (rows, last_start, end, crc) for the last complete row seen.
+    """
+    f.seek(offset)
+    pos = offset
+    for line in f:
+        if not line.endswith(b"\n"):
+            break   # partial row at EOF (interrupted write) — not a completed trio
+        if skip_header:
+            skip_header = False
+            last_start, crc = pos, zlib.crc32(line)
+        elif line.strip():
+            rows += 1
+            last_start, crc = pos, zlib.crc32(line)
+        pos += len(line)
+    return rows, last_start, pos, crc
+
+def _check_index(f, size, idx):
+    """The sidecar if it still matches the file (size + last-row crc), else None."""
+    if size < idx["end"] or idx["last_start"] >= idx["end"]:
+        return None
+    f.seek(idx["last_start"])
+    if zlib.crc32(f.read(idx["end"] - idx["last_start"])) != idx["crc"]:
+        return None
+    return idx
+
+def _sync_index(path):
+    """(rows, last_start, end, crc) for an existing CSV, refreshing the sidecar if needed."""
+    size = os.path.getsize(path)
+    idx = _read_index(path)
+    with open(path, "rb") as f:
+        hit = _check_index(f, size, idx) if idx else None
+        if hit is not None and size == hit["end"]:
+            return hit["rows"], hit["last_start"], hit["end"], hit["crc"]
+        if hit is not None:
+            found = _scan_rows(f, hit["end"], hit["rows"], hit["last_start"], hit["crc"])
+        else:
+            print(f"[CSV] index missing/stale, rescanning {os.path.basename(path)}")
+            found = _scan_rows(f, 0, 0, 0, 0, skip_header=True)
+    _write_index(path, *found)
+    return found
+
 def reconcile_csv_with_state(state):
     """
     Return the number of *completed trios already on disk* for this pair/session.
     If the CSV doesn't exist, returns 0.
+
+    O(1) when the sidecar index matches the file; rows appended after the
+    indexed offset are picked up by a tail scan, and a missing or stale index
+    (file edited/truncated) falls back to one full scan that rebuilds it.
     """
     path = _csv_path_for_state(state)
     if not os.path.exists(path):
         return 0
-    n = 0
-    with open(path, "r", newline="", encoding="utf-8") as f:
-        rdr = csv.DictReader(f)
-        for _ in rdr:
-            n += 1
-    return n
-
-def append_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow):
-    csv_path = _csv_path_for_state(state)
+    return _sync_index(path)[0]
 
-    is_new = not os.path.exists(csv_path)
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if is_new:
-            w.writerow([
-                "date","time","stimuli_type","pair","leader_side",
-                "leader","follower","session","block","trial",
-                "km_paired_choice","km_leader_choice","km_leader_choice_time",
-                "km_follower_choice","km_follower_choice_time",
-                "jbt_leader_stimuli","jbt_leader_choice","jbt_leader_choice_time",
-                "jbt_follower_stimuli","jbt_follower_choice","jbt_follower_choice_time",
-            ])
-
-        # --- build row from state + km_out + jbt_* ---
-        cfg   = state["config"]
-        prog  = state["progress"]
-        pair  = f'{cfg["leader"]}-{cfg["follower"]}'
-        side  = "Left" if cfg.get("leader") == cfg.get("left_name", cfg["leader"]) else "Right"
-
-        # KM choices and times (prefer *_ms if present; else convert seconds -> ms)
-        km_leader_choice        = km_out.get("leader_choice", "")
-        km_follower_choice      = km_out.get("follower_choice", "")
-        km_paired_choice        = f"{km_leader_choice}{km_follower_choice}"
-
-        leader_time_ms = km_out.get("leader_choice_time_ms")
-        if leader_time_ms is None:
-            leader_time_ms = int(float(km_out.get("leader_choice_time", 0)) * 1000)
-
-        follower_time_ms = km_out.get("follower_choice_time_ms")
-        if follower_time_ms is None:
-            follower_time_ms = int(float(km_out.get("follower_choice_time", 0)) * 1000)
-
-        row = [
-            km_start_dt.strftime("%Y-%m-%d"),
-            km_start_dt.strftime("%H:%M:%S"),
-            cfg.get("stimuli", ""),
-            pair,
-            side,
-            cfg["leader"],
-            cfg["follower"],
-            int(prog.get("session_index", 1)),
-            int(prog.get("block_index", 1)),
-            int(prog.get("completed_trios", 0)) + 1,  # overall trial = next trio index
-
-            # KM (now in the right order)
-            km_paired_choice,
-            km_leader_choice,
-            int(leader_time_ms),
-            km_follower_choice,
-            int(follower_time_ms),
-
-            # JBT leader
-            jbt_lead.get("stimulus",""),
-            1 if jbt_lead.get("collided") else 0,
-            int(jbt_lead.get("rt_ms", 0)),
-
-            # JBT follower
-            jbt_follow.get("stimulus",""),
-            1 if jbt_follow.get("collided") else 0,
-            int(jbt_follow.get("rt_ms", 0)),
-        ]
-        w.writerow(row)
-
-    print("[CSV] wrote:", os.path.abspath(csv_path))
+def read_session_rows(state):
+    """(header, rows) of the current session CSV as text ([] rows if it doesn't exist)."""
+    path = _csv_path_for_state(state)
+    if not os.path.exists(path):
+        return CSV_HEADER, []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or CSV_HEADER
+        return header, [r for r in reader if r]
+
+def _row_bytes(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue().encode("utf-8")
+
+CSV_HEADER = [
+    "date","time","stimuli_type","pair","leader_side",
+    "leader","follower","session","block","trial",
+    "km_paired_choice","km_leader_choice","km_leader_choice_time",
+    "km_follower_choice","km_follower_choice_time",
+    "jbt_leader_stimuli","jbt_leader_choice","jbt_leader_choice_time",
+    "jbt_follower_stimuli","jbt_follower_choice","jbt_follower_choice_time",
+    "frame_p50_ms","frame_p99_ms","dropped_frames",
+]
+
+# ---------- header migration ----------
+def _migrate_header(path):
+    """
+    Rewrite an existing session CSV whose header is not CSV_HEADER (a session
+    started by an older version, e.g. before the frame-timing columns) so rows
+    appended now line up: old columns are carried over by name, new ones are
+    left blank, and a partial row at EOF is dropped. Returns True if rewritten.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    first = data.split(b"\n", 1)[0]
+    if len(first) == len(data):
+        return False   # no complete header line; open() truncates and rewrites it
+    header = next(csv.reader([first.decode("utf-8")]), [])
+    if header == CSV_HEADER:
+        return False
+    complete = data[:data.rfind(b"\n") + 1].decode("utf-8")
+    pos = {name: i for i, name in enumerate(header)}
+    rows = []
+    for r in list(csv.reader(io.StringIO(complete, newline="")))[1:]:
+        if r:
+            rows.append([r[pos[c]] if c in pos and pos[c] < len(r) else "" for c in CSV_HEADER])
+    print(f"[CSV] migrating {os.path.basename(path)} to the current header ({len(rows)} rows)")
+    _write_csv(path, rows)
+    return True
+
+# ---------- session writer ----------
+TRIAL_BUFFER_BYTES = 64 * 1024   # rows sit in this buffer until the trio-boundary sync()
+
+class TrialWriter:
+    """
+    Session CSV kept open across trios.
+
+    Rows go through a bounded write buffer; sync() at each trio boundary turns
+    them into one write() plus one fsync(). Opening a different path (the
+    session rolled over) closes the old file first; an existing file with an
+    older header is migrated to CSV_HEADER before appending. The sidecar index is
+    written on close; if the program dies before that, reconcile's tail scan
+    picks up the rows past the last indexed offset.
+    """
+    def __init__(self, buffer_bytes=TRIAL_BUFFER_BYTES):
+        self.buffer_bytes = int(buffer_bytes)
+        self.path = None
+        self._f = None
+        self._mark = None   # (rows, last_start, end, crc) as in the sidecar
+
+    def open(self, path):
+        if self._f is not None and path == self.path:
+            return
+        self.close()
+        mark = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            _migrate_header(path)
+            mark = _sync_index(path)
+            if os.path.getsize(path) > mark[2]:
+                # interrupted write at EOF: drop the partial row so the next one starts clean
+                print(f"[CSV] dropping partial row at end of {os.path.basename(path)}")
+                os.truncate(path, mark[2])
+            if mark[2] == 0:
+                mark = None   # not even a complete header survived: start over with one
+        self._f = open(path, "ab", buffering=self.buffer_bytes)
+        self.path = path
+        if mark is None:
+            header = _row_bytes(CSV_HEADER)
+            self._f.write(header)
+            mark = (0, 0, len(header), zlib.crc32(header))
+        self._mark = mark
+
+    def write_row(self, row):
+        data = _row_bytes(row)
+        rows, _, end, _ = self._mark
+        self._f.write(data)
+        self._mark = (rows + 1, end, end + len(data), zlib.crc32(data))
+
+    def sync(self):
+        """Trio boundary: push the buffered rows to disk (flush + fsync)."""
+        if self._f is None:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f is None:
+            return
+        self.sync()
+        self._f.close()
+        _write_index(self.path, *self._mark)
+        self._f = None
+        self.path = None
+        self._mark = None
+
+
+_WRITER = None
+
+def get_trial_writer():
+    global _WRITER
+    if _WRITER is None:
+        _WRITER = TrialWriter()
+    return _WRITER
+
+def close_trial_writer():
+    """Flush, index and close the current session CSV (session rollover / shutdown)."""
+    if _WRITER is not None:
+        _WRITER.close()
+
+def _write_csv(path, rows):
+    """Write header + rows to `path` atomically, with a fresh sidecar index."""
+    tmp = path + ".tmp"
+    header = _row_bytes(CSV_HEADER)
+    n, last_start, end, crc = 0, 0, len(header), zlib.crc32(header)
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for row in rows:
+            data = _row_bytes(row)
+            f.write(data)
+            n, last_start, end, crc = n + 1, end, end + len(data), zlib.crc32(data)
+    os.replace(tmp, path)
+    _write_index(path, n, last_start, end, crc)
+
+def write_session_csv(state, rows):
+    """Write a whole session CSV (header + rows) atomically, with a fresh sidecar index."""
+    path = _csv_path_for_state(state)
+    _write_csv(path, rows)
+    return path
+
+def build_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow, frame_stats=None):
+    """One CSV_HEADER-ordered row for a completed trio (call before progress advances)."""
+    # --- build row from state + km_out + jbt_* ---
+    cfg   = state["config"]
+    prog  = state["progress"]
+    pair  = f'{cfg["leader"]}-{cfg["follower"]}'
+    side  = "Left" if cfg.get("leader") == cfg.get("left_name", cfg["leader"]) else "Right"
+
+    # KM choices and times (prefer *_ms if present; else convert seconds -> ms)
+    km_leader_choice        = km_out.get("leader_choice", "")
+    km_follower_choice      = km_out.get("follower_choice", "")
+    km_paired_choice        = f"{km_leader_choice}{km_follower_choice}"
+
+    leader_time_ms = km_out.get("leader_choice_time_ms")
+    if leader_time_ms is None:
+        leader_time_ms = int(float(km_out.get("leader_choice_time", 0)) * 1000)
+
+    follower_time_ms = km_out.get("follower_choice_time_ms")
+    if follower_time_ms is None:
+        follower_time_ms = int(float(km_out.get("follower_choice_time", 0)) * 1000)
+
+    row = [
+        km_start_dt.strftime("%Y-%m-%d"),
+        km_start_dt.strftime("%H:%M:%S"),
+        cfg.get("stimuli", ""),
+        pair,
+        side,
+        cfg["leader"],
+        cfg["follower"],
+        int(prog.get("session_index", 1)),
+        int(prog.get("block_index", 1)),
+        int(prog.get("completed_trios", 0)) + 1,  # overall trial = next trio index
+
+        # KM (now in the right order)
+        km_paired_choice,
+        km_leader_choice,
+        int(leader_time_ms),
+        km_follower_choice,
+        int(follower_time_ms),
+
+        # JBT leader
+        jbt_lead.get("stimulus",""),
+        1 if jbt_lead.get("collided") else 0,
+        int(jbt_lead.get("rt_ms", 0)),
+
+        # JBT follower
+        jbt_follow.get("stimulus",""),
+        1 if jbt_follow.get("collided") else 0,
+        int(jbt_follow.get("rt_ms", 0)),
+
+        # frame timing health for the whole trio (blank if not measured)
+        frame_stats.get("p50_ms", "") if frame_stats else "",
+        frame_stats.get("p99_ms", "") if frame_stats else "",
+        frame_stats.get("dropped", "") if frame_stats else "",
+    ]
+    return row
+
+def append_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow, frame_stats=None):
+    """
+    frame_stats: optional FrameProbe.summary() for the trio (timing-health columns).
+    The row goes through the shared TrialWriter and is on disk (fsync) on return.
+    """
+    csv_path = _csv_path_for_state(state)
+    writer = get_trial_writer()
+    writer.open(csv_path)
+    writer.write_row(build_trio_row(state, km_start_dt, km_out, jbt_lead, jbt_follow, frame_stats))
+    writer.sync()
     return csv_path
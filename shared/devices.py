@@ -0,0 +1,132 @@
+# shared/devices.py
+from array import array
+
+import pygame
+
+# Joysticks are owned by ONE device manager for the whole program (launcher
+# and scenes share it). Index convention everywhere: 0 -> left half,
+# 1 -> right half.
+#
+# Axis values are not polled per frame: JOYAXISMOTION events update a flat
+# array (x, y per side), so a per-frame read is one array index and no
+# Joystick objects are created after a device is opened. JOYDEVICEADDED /
+# JOYDEVICEREMOVED keep it current when a controller is hotplugged.
+SIDES = 2
+AXES_PER_SIDE = 2
+
+# pin a controller to a half by GUID (pygame.joystick.Joystick.get_guid());
+# unpinned devices take the first free side in the order they appear
+GUID_SIDES = {}
+
+
+class DeviceManager:
+    def __init__(self):
+        self.axes = array("d", [0.0] * (SIDES * AXES_PER_SIDE))
+        self.sticks = {}      # instance_id -> Joystick
+        self.side_of = {}     # instance_id -> side index
+        self.by_side = [None] * SIDES   # side -> instance_id
+        self.guid_side = dict(GUID_SIDES)   # remembered, so a replugged stick gets its half back
+
+    def open_all(self):
+        pygame.joystick.init()
+        for i in range(pygame.joystick.get_count()):
+            self._add(i)
+
+    # --------------- hotplug ---------------
+    def _add(self, device_index):
+        try:
+            js = pygame.joystick.Joystick(device_index)
+            js.init()
+        except pygame.error as e:
+            print(f"[JOY] could not open device {device_index}: {e}")
+            return None
+        iid = js.get_instance_id()
+        if iid in self.sticks:
+            return self.side_of.get(iid)
+        self.sticks[iid] = js
+        guid = js.get_guid()
+        side = self.guid_side.get(guid)
+        if side is None or self.by_side[side] is not None:
+            side = next((s for s in range(SIDES) if self.by_side[s] is None), None)
+        if side is None:
+            print(f"[JOY] {js.get_name()} connected, no free side")
+            return None
+        self.guid_side[guid] = side
+        self.side_of[iid] = side
+        self.by_side[side] = iid
+        base = side * AXES_PER_SIDE
+        for k in range(min(AXES_PER_SIDE, js.get_numaxes())):
+            self.axes[base + k] = js.get_axis(k)
+        print(f"[JOY] {js.get_name()} -> {'left' if side == 0 else 'right'}")
+        return side
+
+    def _remove(self, instance_id):
+        js = self.sticks.pop(instance_id, None)
+        side = self.side_of.pop(instance_id, None)
+        if side is not None:
+            self.by_side[side] = None
+            base = side * AXES_PER_SIDE
+            for k in range(AXES_PER_SIDE):
+                self.axes[base + k] = 0.0
+            print(f"[JOY] {'left' if side == 0 else 'right'} controller removed")
+        if js is not None:
+            try:
+                js.quit()
+            except pygame.error:
+                pass
+
+    # --------------- events ---------------
+    def handle_event(self, ev):
+        """Feed every pygame event through here; non-joystick events are ignored."""
+        if ev.type == pygame.JOYAXISMOTION:
+            side = self.side_of.get(ev.instance_id)
+            if side is not None and ev.axis < AXES_PER_SIDE:
+                self.axes[side * AXES_PER_SIDE + ev.axis] = ev.value
+        elif ev.type == pygame.JOYDEVICEADDED:
+            self._add(ev.device_index)
+        elif ev.type == pygame.JOYDEVICEREMOVED:
+            self._remove(ev.instance_id)
+
+    # --------------- reads ---------------
+    def present(self, side):
+        return self.by_side[side] is not None
+
+    def axis(self, side, k):
+        return self.axes[side * AXES_PER_SIDE + k]
+
+    def count(self):
+        return len(self.sticks)
+
+
+# ---------- shared instance ----------
+_MANAGER = None
+
+def get_manager():
+    global _MANAGER
+    if _MANAGER is None:
+        _MANAGER = DeviceManager()
+        _MANAGER.open_all()
+    return _MANAGER
+
+
+def init_joysticks():
+    """Open the joystick subsystem and every attached stick (first call only)."""
+    return get_manager()
+
+
+def handle_event(ev):
+    if _MANAGER is not None:
+        _MANAGER.handle_event(ev)
+
+
+def present(side):
+    return get_manager().present(side)
+
+
+def axis(side, k):
+    """Latest value of axis k (0 = x, 1 = y) of the stick driving `side`; 0.0 if none."""
+    return get_manager().axes[side * AXES_PER_SIDE + k]
+
+
+def joystick_count():
+    return get_manager().count()
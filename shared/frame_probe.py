@@ -0,0 +1,94 @@
+# shared/frame_probe.py
+from array import array
+
+from shared import timebase
+
+FRAME_BUDGET_MS = 1000.0 / 60   # clock.tick(60)
+DROP_FACTOR     = 1.5           # a frame this far over budget missed at least one refresh
+PROBE_CAPACITY  = 8192          # ~2 min of frames at 60 fps
+
+
+class FrameProbe:
+    """
+    Per-frame timing for the trial loops, stored in preallocated ring buffers
+    (no allocation per frame).
+
+    Call order inside a frame loop:
+        probe.frame_start()
+        ... update + draw ...
+        probe.mark_draw()          # drawing done, about to present
+        renderer.present()
+        probe.mark_flip()          # present returned
+        clock.tick(60)
+        probe.frame_end(phase)     # whole frame (incl. tick sleep) attributed to `phase`
+
+    One probe can be shared by the three scenes of a trio; summary() then
+    covers the whole trio.
+    """
+    def __init__(self, capacity=PROBE_CAPACITY, budget_ms=FRAME_BUDGET_MS, clock=timebase.now):
+        self.capacity = int(capacity)
+        self.budget_ms = float(budget_ms)
+        self._clock = clock
+        self._frame_ms = array("d", bytes(8 * self.capacity))
+        self._draw_ms  = array("d", bytes(8 * self.capacity))
+        self._flip_ms  = array("d", bytes(8 * self.capacity))
+        self.count = 0                 # total frames seen (not capped by capacity)
+        self.over_budget = {}          # phase -> frames over budget
+        self.dropped = {}              # phase -> frames over budget * DROP_FACTOR
+        self._t_start = self._t_draw = self._t_flip = None
+
+    def frame_start(self):
+        self._t_start = self._clock()
+        self._t_draw = self._t_flip = None
+
+    def mark_draw(self):
+        self._t_draw = self._clock()
+
+    def mark_flip(self):
+        self._t_flip = self._clock()
+
+    def frame_end(self, phase):
+        if self._t_start is None:
+            return
+        t_end = self._clock()
+        t_draw = self._t_draw if self._t_draw is not None else t_end
+        t_flip = self._t_flip if self._t_flip is not None else t_draw
+        i = self.count % self.capacity
+        frame_ms = (t_end - self._t_start) * 1000.0
+        self._frame_ms[i] = frame_ms
+        self._draw_ms[i]  = (t_draw - self._t_start) * 1000.0
+        self._flip_ms[i]  = (t_flip - t_draw) * 1000.0
+        self.count += 1
+        self._t_start = None
+        if frame_ms > self.budget_ms:
+            self.over_budget[phase] = self.over_budget.get(phase, 0) + 1
+            if frame_ms > self.budget_ms * DROP_FACTOR:
+                self.dropped[phase] = self.dropped.get(phase, 0) + 1
+
+    # --------------- reporting ---------------
+    def _window(self, buf):
+        n = min(self.count, self.capacity)
+        return sorted(buf[:n])
+
+    @staticmethod
+    def _pct(values, q):
+        if not values:
+            return 0.0
+        return values[int(round(q * (len(values) - 1)))]
+
+    def summary(self):
+        """p50/p99 over the buffered frames; over-budget/dropped counts over all frames."""
+        frames = self._window(self._frame_ms)
+        draws = self._window(self._draw_ms)
+        flips = self._window(self._flip_ms)
+        return {
+            "frames": self.count,
+            "p50_ms": round(self._pct(frames, 0.50), 2),
+            "p99_ms": round(self._pct(frames, 0.99), 2),
+            "draw_p50_ms": round(self._pct(draws, 0.50), 2),
+            "flip_p50_ms": round(self._pct(flips, 0.50), 2),
+            "over_budget": sum(self.over_budget.values()),
+            "dropped": sum(self.dropped.values()),
+            "over_budget_by_phase": dict(self.over_budget),
+            "dropped_by_phase": dict(self.dropped),
+        }
@@ -0,0 +1,174 @@
+# shared/headless.py
+import os
+import random
+import weakref
+
+import pygame
+from pygame.locals import *
+
+from shared import timebase, inputs
+from shared import input_sampler
+from shared.input_sampler import InputSampler
+from shared.pellets import PelletDispenser, PelletJob, set_dispenser
+
+# same key layout the scenes use: left half = WASD, right half = arrows
+SIDE_KEYS = {
+    "left":  (K_w, K_s, K_a, K_d),
+    "right": (K_UP, K_DOWN, K_LEFT, K_RIGHT),
+}
+
+
+# ---------- virtual clock ----------
+class VirtualClock:
+    """
+    Stand-in for pygame.time.Clock that never sleeps.
+
+    tick() advances the experiment clock by one frame (step_sec, default one
+    60 fps frame), so phase deadlines, ITIs and pellet cadence pass in frame
+    counts instead of wall-clock seconds. Install with timebase.set_source(vc.now).
+    """
+    def __init__(self, step_sec=1.0 / 60):
+        self.step_ns = int(round(step_sec * 1e9))
+        self.t_ns = 0
+        self.frames = 0
+
+    def now(self):
+        return self.t_ns / 1e9
+
+    def tick(self, framerate=0):
+        self.t_ns += self.step_ns
+        self.frames += 1
+        return self.step_ns // 1_000_000
+
+    def get_fps(self):
+        return 1e9 / self.step_ns
+
+
+# ---------- pellets ----------
+class InstantDispenser(PelletDispenser):
+    """No hardware, no threads: every job completes at request time (virtual clock)."""
+    def __init__(self):
+        super().__init__()
+        self.delivered = [0] * len(self.paths)
+
+    def dispense(self, side, num=1, on_done=None):
+        job = PelletJob(side, num, on_done)
+        job.timestamps_ns = [job.requested_ns] * max(0, job.num)
+        self.delivered[job.side] += max(0, job.num)
+        self._finish(job)
+        return job
+
+
+# ---------- scripted agents ----------
+class _Keys(dict):
+    """key.get_pressed() look-alike: unknown keys read as not pressed."""
+    def __missing__(self, key):
+        return False
+
+
+class Agent:
+    """
+    Scripted subject for one side.
+
+    Waits a random reaction time after new targets appear, then steers its
+    cursor to the chosen target with the side's keys. KM choices are K with
+    probability p_k; on JBT stimuli it goes with probability p_go (otherwise
+    it sits the window out).
+    """
+    def __init__(self, rng, p_k=0.5, p_go=0.7, rt_sec=(0.2, 0.8)):
+        self.rng = rng
+        self.p_k = p_k
+        self.p_go = p_go
+        self.rt_sec = rt_sec
+        self._plans = weakref.WeakKeyDictionary()   # cursor -> (targets list, target rect or None, go_at)
+
+    def _plan(self, cursor, now):
+        plan = self._plans.get(cursor)
+        if plan is not None and plan[0] is cursor.targets:
+            return plan
+        names = dict(cursor.targets)
+        if "K" in names and "M" in names:
+            rect = names["K"] if self.rng.random() < self.p_k else names["M"]
+        elif "stim" in names:
+            rect = names["stim"] if self.rng.random() < self.p_go else None
+        elif names:
+            rect = next(iter(names.values()))
+        else:
+            rect = None
+        plan = (cursor.targets, rect, now + self.rng.uniform(*self.rt_sec))
+        self._plans[cursor] = plan
+        return plan
+
+    def press(self, cursor, keys, now):
+        """Set this side's keys in `keys` to steer `cursor` toward its plan."""
+        if not cursor.active or cursor.hit is not None:
+            return
+        _, rect, go_at = self._plan(cursor, now)
+        if rect is None or now < go_at:
+            return
+        up, down, left, right = SIDE_KEYS[cursor.side]
+        dx = rect.centerx - cursor.pos[0]
+        dy = 0.0 if cursor.horizontal else rect.centery - cursor.pos[1]
+        slack = 2.0
+        keys[left] = dx < -slack
+        keys[right] = dx > slack
+        keys[up] = dy < -slack
+        keys[down] = dy > slack
+
+
+class ScriptedInput:
+    """
+    inputs source driven by one Agent per side.
+
+    Key state is computed from the cursors of the currently running samplers
+    (InputSampler.live), so the scenes run unchanged. The real event queue is
+    drained and ignored.
+    """
+    def __init__(self, agents):
+        self.agents = agents   # {"left": Agent, "right": Agent}
+
+    def events(self):
+        pygame.event.clear()
+        return []
+
+    def keys(self):
+        keys = _Keys()
+        now = timebase.now()
+        for sampler in InputSampler.live:
+            for cur in sampler.cursors:
+                agent = self.agents.get(cur.side)
+                if agent is not None:
+                    agent.press(cur, keys, now)
+        return keys
+
+    def axis(self, side, k):
+        return 0.0
+
+
+# ---------- setup ----------
+def setup(size=(800, 600), seed=0, step_sec=1.0 / 60, p_k=0.5, p_go=0.7):
+    """
+    Prepare a headless run: dummy SDL drivers, virtual clock, instant pellets,
+    per-frame input sampling and a scripted agent on each side.
+    Returns (screen, clock, dispenser). The scenes' own `random` use is seeded too.
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    random.seed(seed)
+
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+
+    clock = VirtualClock(step_sec)
+    timebase.set_source(clock.now)
+    input_sampler.SAMPLER_THREADED = False
+
+    dispenser = InstantDispenser()
+    set_dispenser(dispenser)
+
+    rng = random.Random(seed)
+    inputs.install(ScriptedInput({
+        "left":  Agent(random.Random(rng.random()), p_k, p_go),
+        "right": Agent(random.Random(rng.random()), p_k, p_go),
+    }))
+    return screen, clock, dispenser
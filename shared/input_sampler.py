@@ -0,0 +1,198 @@
+# shared/input_sampler.py
+import time
+import threading
+
+from shared import timebase
+
+SAMPLE_HZ = 1000   # input acquisition rate (independent of the 60 fps render loop)
+SAMPLER_THREADED = True   # False: sample once per frame instead (headless/replay runs)
+
+
+class Cursor:
+    """
+    One cursor integrated at the sampler rate.
+
+    read()      -> (dx, dy) direction in [-1..1] (keys/joystick, already deadzoned)
+    speed       -> pixels per SECOND (the old per-frame speed * 60)
+    bounds      -> (left, top, right, bottom) clamp box for the cursor centre
+    targets     -> [(name, pygame.Rect)]; the first entry of the centre into one
+                   of them is stored as hit = (name, t_ns), interpolated between
+                   the two samples that straddle the crossing.
+
+    side        -> "left"/"right" half this cursor belongs to (for agents/recorders)
+    trace       -> optional trace(t_ns, x, y), called on the sampler thread after
+                   every move and once after each reset (trajectory recording)
+
+    pos is read by the render loop; configure with reset()/set_targets(),
+    which take the same lock the sampler thread uses.
+    """
+    def __init__(self, read, speed, bounds, pos, horizontal=False, side=None):
+        self.read = read
+        self.side = side
+        self.speed = float(speed)
+        self.bounds = bounds
+        self.horizontal = horizontal
+        self.pos = [float(pos[0]), float(pos[1])]
+        self.active = True
+        self.stop_on_hit = True
+        self.targets = []
+        self.hit = None
+        self._last_ns = None
+        self.trace = None
+        self._lock = threading.Lock()
+
+    # --------------- main-thread API ---------------
+    def reset(self, pos, active=True):
+        with self._lock:
+            self.pos[0], self.pos[1] = float(pos[0]), float(pos[1])
+            self.active = active
+            self.hit = None
+            self._last_ns = None
+
+    def set_targets(self, targets, stop_on_hit=True):
+        with self._lock:
+            self.targets = list(targets)
+            self.stop_on_hit = stop_on_hit
+            self.hit = None
+
+    def freeze(self):
+        """Stop integrating (keeps position and hit)."""
+        with self._lock:
+            self.active = False
+
+    def xy(self):
+        """Integer centre for drawing/collision, like the old list-of-ints cursor."""
+        return int(self.pos[0]), int(self.pos[1])
+
+    # --------------- sampler-thread API ---------------
+    def sample(self, t_ns):
+        with self._lock:
+            last = self._last_ns
+            self._last_ns = t_ns
+            if not self.active:
+                return
+            if last is None:
+                if self.trace is not None:
+                    self.trace(t_ns, self.pos[0], self.pos[1])
+                return
+            if self.hit is not None and self.stop_on_hit:
+                return
+            dx, dy = self.read()
+            if self.horizontal:
+                dy = 0.0
+            if not (dx or dy):
+                return
+            dt = (t_ns - last) / 1e9
+            x0, y0 = self.pos
+            left, top, right, bottom = self.bounds
+            x1 = min(max(x0 + dx * self.speed * dt, left), right)
+            y1 = min(max(y0 + dy * self.speed * dt, top), bottom)
+            self.pos[0], self.pos[1] = x1, y1
+            if self.trace is not None:
+                self.trace(t_ns, x1, y1)
+            if self.hit is None:
+                for name, rect in self.targets:
+                    s = _entry_fraction(x0, y0, x1, y1, rect)
+                    if s is not None:
+                        self.hit = (name, last + int(s * (t_ns - last)))
+                        break
+
+
+def _entry_fraction(x0, y0, x1, y1, rect):
+    """
+    Fraction s in [0, 1] where the segment (x0,y0)->(x1,y1) first enters rect
+    (half-open like Rect.collidepoint), or None if it never does.
+    """
+    s_lo, s_hi = 0.0, 1.0
+    for p0, p1, lo, hi in ((x0, x1, rect.left, rect.right), (y0, y1, rect.top, rect.bottom)):
+        d = p1 - p0
+        if d == 0:
+            if not (lo <= p0 < hi):
+                return None
+            continue
+        a = (lo - p0) / d
+        b = (hi - p0) / d
+        if a > b:
+            a, b = b, a
+        s_lo = max(s_lo, a)
+        s_hi = min(s_hi, b)
+        if s_lo > s_hi:
+            return None
+    return s_lo
+
+
+class InputSampler:
+    """
+    Samples every registered Cursor at `hz` on its own thread, stamped with
+    timebase.now_ns, so reaction times do not depend on the render rate.
+
+    threaded=False turns it into a plain per-frame stepper: call sync() once
+    per frame (used where a real-time thread makes no sense, e.g. headless runs).
+    Started samplers are listed in InputSampler.live until stopped.
+
+    Record/replay hooks (shared/replay.py): on_step(t_ns) is called at the
+    start of every step; with driven=True sync() does nothing and steps come
+    only from outside (replaying a threaded recording at its logged times).
+    """
+    live = []
+    on_step = None
+    driven = False
+
+    def __init__(self, hz=SAMPLE_HZ, threaded=None, clock_ns=timebase.now_ns):
+        self.period = 1.0 / float(hz)
+        self.threaded = SAMPLER_THREADED if threaded is None else threaded
+        self.clock_ns = clock_ns
+        self.cursors = []
+        self._thread = None
+        self._running = False
+
+    def add(self, cursor):
+        self.cursors.append(cursor)
+        return cursor
+
+    def step(self, t_ns=None):
+        t_ns = self.clock_ns() if t_ns is None else t_ns
+        if InputSampler.on_step is not None:
+            InputSampler.on_step(t_ns)
+        for c in self.cursors:
+            c.sample(t_ns)
+
+    def sync(self):
+        """Per-frame hook: no-op while the thread runs, one sample otherwise."""
+        if not self._running and not InputSampler.driven:
+            self.step()
+
+    def start(self):
+        if self not in InputSampler.live:
+            InputSampler.live.append(self)
+        if self.threaded and not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="input-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self in InputSampler.live:
+            InputSampler.live.remove(self)
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=0.5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _loop(self):
+        next_t = time.perf_counter()
+        while self._running:
+            self.step()
+            next_t += self.period
+            delay = next_t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_t = time.perf_counter()   # fell behind: don't try to catch up
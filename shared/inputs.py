@@ -0,0 +1,77 @@
+# shared/inputs.py
+import pygame
+
+from shared import devices
+
+
+class LiveInput:
+    """Default input source: the real pygame event queue and keyboard state."""
+    def events(self):
+        evs = pygame.event.get()
+        for ev in evs:
+            devices.handle_event(ev)   # joystick axes + hotplug
+        return evs
+
+    def keys(self):
+        return pygame.key.get_pressed()
+
+    def axis(self, side, k):
+        return devices.axis(side, k)
+
+
+# The scenes read input ONLY through events()/key_state()/axis(), so a different
+# source (scripted agents, replays) can be installed without touching them.
+_SOURCE = LiveInput()
+
+
+def events():
+    return _SOURCE.events()
+
+
+def key_state():
+    return _SOURCE.keys()
+
+
+def axis(side, k):
+    """Joystick axis k (0 = x, 1 = y) for `side` (0 = left, 1 = right)."""
+    return _SOURCE.axis(side, k)
+
+
+# ---------- per-frame snapshot ----------
+# Key and axis state only change when the main thread pumps events, so the
+# trial loops take one snapshot per frame (after events(), before the sampler
+# sync) and the input sampler thread integrates from it instead of calling
+# key.get_pressed() -- a fresh 512-entry tuple -- on every 1 kHz sample.
+class _NoKeys(dict):
+    def __missing__(self, key):
+        return False
+
+
+N_SIDES = 2
+_BLANK = (_NoKeys(), (0.0,) * (2 * N_SIDES))   # nothing pressed, axes centred
+_FRAME = _BLANK   # (keys, axes[side * 2 + k]); replaced whole, never mutated
+
+
+def snapshot():
+    """Main thread, once per frame after events(): cache keys + joystick axes."""
+    global _FRAME
+    _FRAME = (key_state(), tuple(axis(side, k) for side in range(N_SIDES) for k in (0, 1)))
+
+
+def frame_keys():
+    """Key state as of the last snapshot() (safe to read from the sampler thread)."""
+    return _FRAME[0]
+
+
+def frame_axis(side, k):
+    """Joystick axis as of the last snapshot()."""
+    return _FRAME[1][side * 2 + k]
+
+
+def install(source=None):
+    """Install an input source (None restores LiveInput). Returns the previous one."""
+    global _SOURCE, _FRAME
+    old = _SOURCE
+    _SOURCE = source or LiveInput()
+    _FRAME = _BLANK
+    return old
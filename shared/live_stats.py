@@ -0,0 +1,275 @@
+# shared/live_stats.py
+import math
+
+# Running performance counters kept in the state file next to "progress"
+# (state["stats"]), updated once per trio from the same km_out / jbt_* dicts
+# that go into the CSV row, so the launcher and the experimenter overlay never
+# reread CSVs. Every update touches a fixed number of counters (O(1)), which
+# also keeps the progress journal records small.
+#
+# state["stats"] = {
+#   "sessions": {"<session>": {"all": cell, "blocks": {"<block>": cell}}},
+#   "total": cell,
+#   "summary": {"session": headline, "all": headline},   # see headline()
+# }
+# cell = {
+#   "km":  {"n", "k_leader", "k_follower", "kk", "rt_leader": hist, "rt_follower": hist},
+#   "jbt": {"leader" | "follower": {"<label>": {"n", "go", "rt": hist}}},
+# }
+# RT histograms are sparse log-spaced bins ({"<bin>": count}); quantiles read
+# off them are within one bin (RT_BIN_RATIO) of the exact value.
+LIVE_STATS   = True
+RT_MIN_MS    = 50.0
+RT_BIN_RATIO = 1.10
+RT_MAX_BIN   = 72          # 50 ms * 1.1^72 ~ 47 s
+SIDES        = ("leader", "follower")
+
+_LOG_RATIO = math.log(RT_BIN_RATIO)
+
+
+# ---------- RT histograms ----------
+def _rt_bin(ms):
+    if ms <= RT_MIN_MS:
+        return 0
+    return min(RT_MAX_BIN, int(math.log(ms / RT_MIN_MS) / _LOG_RATIO) + 1)
+
+
+def _hist_add(hist, ms, n=1):
+    key = str(_rt_bin(ms))
+    hist[key] = hist.get(key, 0) + n
+
+
+def hist_quantile(hist, q):
+    """q-quantile (0..1) of a sparse RT histogram in ms, or None if it is empty."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    target = q * total
+    seen = 0
+    for key in sorted(hist, key=int):
+        count = hist[key]
+        if seen + count >= target:
+            b = int(key)
+            lo = 0.0 if b == 0 else RT_MIN_MS * RT_BIN_RATIO ** (b - 1)
+            hi = RT_MIN_MS * RT_BIN_RATIO ** b
+            return lo + (hi - lo) * ((target - seen) / count)
+        seen += count
+    return RT_MIN_MS * RT_BIN_RATIO ** RT_MAX_BIN
+
+
+# ---------- cells ----------
+def _new_cell():
+    return {
+        "km": {"n": 0, "k_leader": 0, "k_follower": 0, "kk": 0, "rt_leader": {}, "rt_follower": {}},
+        "jbt": {side: {} for side in SIDES},
+    }
+
+
+def _add_trio(cell, km_lead, km_foll, km_lead_ms, km_foll_ms, jbt):
+    """jbt: ((side, label, go 0/1, rt_ms), ...)."""
+    km = cell["km"]
+    km["n"] += 1
+    km["k_leader"] += km_lead == "K"
+    km["k_follower"] += km_foll == "K"
+    km["kk"] += km_lead == "K" and km_foll == "K"
+    if km_lead:
+        _hist_add(km["rt_leader"], km_lead_ms)
+    if km_foll:
+        _hist_add(km["rt_follower"], km_foll_ms)
+    for side, label, go, rt_ms in jbt:
+        if not label:
+            continue
+        c = cell["jbt"][side].setdefault(label, {"n": 0, "go": 0, "rt": {}})
+        c["n"] += 1
+        if go:
+            c["go"] += 1
+            _hist_add(c["rt"], rt_ms)
+
+
+def _merge(into, cell):
+    km, other = into["km"], cell["km"]
+    for k in ("n", "k_leader", "k_follower", "kk"):
+        km[k] += other[k]
+    for k in ("rt_leader", "rt_follower"):
+        for b, n in other[k].items():
+            km[k][b] = km[k].get(b, 0) + n
+    for side in SIDES:
+        for label, c in cell["jbt"][side].items():
+            d = into["jbt"][side].setdefault(label, {"n": 0, "go": 0, "rt": {}})
+            d["n"] += c["n"]
+            d["go"] += c["go"]
+            for b, n in c["rt"].items():
+                d["rt"][b] = d["rt"].get(b, 0) + n
+
+
+def _rate(num, den):
+    return round(num / den, 3) if den else None
+
+
+def headline(cell):
+    """The numbers the launcher lists: trios, KK (cooperation) rate, K rates, S+ hits, S- false alarms."""
+    km = cell["km"]
+    out = {
+        "trios": km["n"],
+        "coop": _rate(km["kk"], km["n"]),
+        "k_leader": _rate(km["k_leader"], km["n"]),
+        "k_follower": _rate(km["k_follower"], km["n"]),
+    }
+    for side in SIDES:
+        labels = cell["jbt"][side]
+        pos, neg = labels.get("S+"), labels.get("S-")
+        out[f"hit_{side}"] = _rate(pos["go"], pos["n"]) if pos else None
+        out[f"fa_{side}"] = _rate(neg["go"], neg["n"]) if neg else None
+    return out
+
+
+# ---------- state ----------
+def _stats(state):
+    return state.setdefault("stats", {"sessions": {}, "total": _new_cell(), "summary": {}})
+
+
+def _session(stats, session):
+    return stats["sessions"].setdefault(str(int(session)), {"all": _new_cell(), "blocks": {}})
+
+
+def _refresh_summary(stats, session):
+    sess = stats["sessions"].get(str(int(session)))
+    stats["summary"] = {
+        "session": dict(headline(sess["all"] if sess else _new_cell()), index=int(session)),
+        "all": headline(stats["total"]),
+    }
+
+
+def update(state, km_out, jbt_lead, jbt_follow):
+    """Count one completed trio (call before progress advances, like build_trio_row)."""
+    if not LIVE_STATS:
+        return
+    prog = state["progress"]
+    session = int(prog.get("session_index", 1))
+    block = int(prog.get("block_index", 1))
+
+    lead_ms = km_out.get("leader_choice_time_ms")
+    if lead_ms is None:
+        lead_ms = float(km_out.get("leader_choice_time", 0)) * 1000
+    foll_ms = km_out.get("follower_choice_time_ms")
+    if foll_ms is None:
+        foll_ms = float(km_out.get("follower_choice_time", 0)) * 1000
+    args = (km_out.get("leader_choice") or "", km_out.get("follower_choice") or "", lead_ms, foll_ms,
+            (("leader", jbt_lead.get("stimulus", ""), bool(jbt_lead.get("collided")), jbt_lead.get("rt_ms", 0)),
+             ("follower", jbt_follow.get("stimulus", ""), bool(jbt_follow.get("collided")), jbt_follow.get("rt_ms", 0))))
+
+    stats = _stats(state)
+    sess = _session(stats, session)
+    _add_trio(sess["blocks"].setdefault(str(block), _new_cell()), *args)
+    _add_trio(sess["all"], *args)
+    _add_trio(stats["total"], *args)
+    _refresh_summary(stats, session)
+
+
+def session_trios(state):
+    """Trios counted for the current session (compare with progress.completed_trios)."""
+    sess = state.get("stats", {}).get("sessions", {}).get(str(int(state["progress"].get("session_index", 1))))
+    return sess["all"]["km"]["n"] if sess else 0
+
+
+def rebuild_session(state, rows, header):
+    """
+    Recount the current session from its CSV rows (text, `header` order) --
+    only needed when reconcile_progress finds the counters out of step with
+    the CSV, e.g. after a crash between the CSV write and the state save.
+    """
+    if not LIVE_STATS:
+        return
+    pos = {name: i for i, name in enumerate(header)}
+
+    def num(r, name):
+        try:
+            return float(r[pos[name]])
+        except (ValueError, IndexError):
+            return 0.0
+
+    stats = _stats(state)
+    session = int(state["progress"].get("session_index", 1))
+    sess = stats["sessions"][str(session)] = {"all": _new_cell(), "blocks": {}}
+    for r in rows:
+        args = (r[pos["km_leader_choice"]], r[pos["km_follower_choice"]],
+                num(r, "km_leader_choice_time"), num(r, "km_follower_choice_time"),
+                tuple((side, r[pos[f"jbt_{side}_stimuli"]], num(r, f"jbt_{side}_choice") == 1,
+                       num(r, f"jbt_{side}_choice_time")) for side in SIDES))
+        _add_trio(sess["blocks"].setdefault(str(int(num(r, "block"))), _new_cell()), *args)
+        _add_trio(sess["all"], *args)
+    stats["total"] = _new_cell()
+    for s in stats["sessions"].values():
+        _merge(stats["total"], s["all"])
+    _refresh_summary(stats, session)
+
+
+# ---------- experimenter overlay ----------
+# F1 in the trial scenes toggles a small panel with the current session's
+# numbers. The text surface is rebuilt only when a trio was counted.
+_OVERLAY = {"visible": False, "key": None, "surface": None, "font": None, "font_size": 0}
+
+
+def toggle_overlay():
+    _OVERLAY["visible"] = not _OVERLAY["visible"]
+    return _OVERLAY["visible"]
+
+
+def overlay_visible():
+    return _OVERLAY["visible"]
+
+
+def _pct(v):
+    return "  -" if v is None else f"{v * 100:3.0f}%"
+
+
+def overlay_lines(state):
+    """Text lines for the overlay: headline rates plus per-block KK and per-side RT medians."""
+    stats = state.get("stats")
+    if not stats:
+        return ["no trios counted yet"]
+    session = int(state["progress"].get("session_index", 1))
+    sess = stats["sessions"].get(str(session))
+    cur = stats["summary"].get("session", {})
+    lines = [f"Session {session}: {cur.get('trios', 0)} trios   KK {_pct(cur.get('coop'))}   "
+             f"K L/F {_pct(cur.get('k_leader'))} / {_pct(cur.get('k_follower'))}"]
+    for side in SIDES:
+        rt = None
+        if sess:
+            c = sess["all"]["jbt"][side].get("S+")
+            rt = hist_quantile(c["rt"], 0.5) if c else None
+        lines.append(f"{side:<8} S+ hit {_pct(cur.get(f'hit_{side}'))}   S- FA {_pct(cur.get(f'fa_{side}'))}"
+                     f"   S+ RT p50 {'-' if rt is None else f'{rt:.0f} ms'}")
+    if sess:
+        blocks = "  ".join(f"B{b} {_pct(headline(c)['coop'])}"
+                           for b, c in sorted(sess["blocks"].items(), key=lambda kv: int(kv[0])))
+        lines.append(f"KK by block: {blocks}")
+    total = stats["summary"].get("all", {})
+    lines.append(f"All sessions: {total.get('trios', 0)} trios   KK {_pct(total.get('coop'))}")
+    return lines
+
+
+def overlay_surface(state, height):
+    """Cached panel surface for the current stats (rebuilt only when they change)."""
+    import pygame
+    total = state.get("stats", {}).get("total", {}).get("km", {}).get("n", 0)
+    key = (state.get("uid"), total, int(state["progress"].get("session_index", 1)), height)
+    if _OVERLAY["key"] != key:
+        size = max(12, height // 40)
+        if _OVERLAY["font_size"] != size:
+            _OVERLAY["font"] = pygame.font.Font(None, size)
+            _OVERLAY["font_size"] = size
+        font = _OVERLAY["font"]
+        texts = [font.render(line, True, (255, 255, 255)) for line in overlay_lines(state)]
+        pad = size // 3
+        w = max(t.get_width() for t in texts) + 2 * pad
+        h = sum(t.get_height() for t in texts) + 2 * pad
+        panel = pygame.Surface((w, h))
+        panel.fill((30, 30, 30))
+        y = pad
+        for t in texts:
+            panel.blit(t, (pad, y))
+            y += t.get_height()
+        _OVERLAY["surface"] = panel
+        _OVERLAY["key"] = key
+    return _OVERLAY["surface"]
@@ -0,0 +1,165 @@
+# shared/pellets.py
+import os
+import time
+import queue
+import threading
+
+from shared import timebase
+
+# ---------- hardware pellet paths ----------
+pelletPath = ['c:/pellet1.exe', 'c:/pellet2.exe']  # 0 = left, 1 = right
+
+PELLET_SPACING_SEC = 0.5   # hardware needs ~500ms between pellets on the same side
+
+
+class PelletJob:
+    """
+    One dispense request for a single side.
+    timestamps_ns is filled in by the worker (one entry per pellet, timebase.now_ns).
+    `done` is set once the last pellet has been dispensed.
+    """
+    def __init__(self, side, num, on_done=None):
+        self.side = int(side)
+        self.num = int(num)
+        self.on_done = on_done
+        self.requested_ns = timebase.now_ns()
+        self.timestamps_ns = []
+        self.done = threading.Event()
+
+
+class PelletDispenser:
+    """
+    Background pellet dispenser.
+
+    Each side (0 = left, 1 = right) gets its own queue and worker thread, so
+    dispense() returns right away and the scenes keep rendering while the
+    pellet#.exe calls run. Jobs on the same side are delivered in order and
+    spaced by `spacing_sec`; the two sides run independently.
+
+    on_done(job) is called from the WORKER thread — keep it short and do not
+    touch the display from it.
+    """
+    def __init__(self, paths=None, spacing_sec=PELLET_SPACING_SEC):
+        self.paths = list(paths or pelletPath)
+        self.spacing_sec = float(spacing_sec)
+        self._queues = [queue.Queue() for _ in self.paths]
+        self._threads = [None] * len(self.paths)
+        self._lock = threading.Lock()
+
+    # --------------- public API ---------------
+    def dispense(self, side, num=1, on_done=None):
+        """Queue [num] pellets for `side` and return the PelletJob immediately."""
+        job = PelletJob(side, num, on_done)
+        if job.num <= 0:
+            self._finish(job)
+            return job
+        self._ensure_worker(job.side)
+        self._queues[job.side].put(job)
+        return job
+
+    def pending(self, side=None):
+        """Number of jobs still queued (not counting the one in progress)."""
+        if side is None:
+            return sum(q.qsize() for q in self._queues)
+        return self._queues[side].qsize()
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued job has been delivered. Returns False on timeout."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for q in self._queues:
+            while q.unfinished_tasks:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+                time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        """Let queued pellets finish (up to `timeout`), then stop the workers."""
+        self.wait_idle(timeout)
+        with self._lock:
+            for side, t in enumerate(self._threads):
+                if t is not None and t.is_alive():
+                    self._queues[side].put(None)
+            for side, t in enumerate(self._threads):
+                if t is not None:
+                    t.join(timeout=1.0)
+                self._threads[side] = None
+
+    # --------------- worker ---------------
+    def _ensure_worker(self, side):
+        with self._lock:
+            t = self._threads[side]
+            if t is None or not t.is_alive():
+                t = threading.Thread(
+                    target=self._worker, args=(side,),
+                    name=f"pellet-{side}", daemon=True,
+                )
+                self._threads[side] = t
+                t.start()
+
+    def _worker(self, side):
+        q = self._queues[side]
+        while True:
+            job = q.get()
+            if job is None:
+                q.task_done()
+                return
+            try:
+                for _ in range(job.num):
+                    self._fire(side)
+                    job.timestamps_ns.append(timebase.now_ns())
+                    if len(job.timestamps_ns) == job.num:
+                        self._finish(job)
+                    # keep the same spacing the old blocking pellet() used
+                    time.sleep(self.spacing_sec)
+            except Exception as e:
+                print(f"[PELLET] side={side} error: {e}")
+                self._finish(job)
+            finally:
+                q.task_done()
+
+    def _fire(self, side):
+        exe = self.paths[side]
+        if os.path.isfile(exe):
+            os.system(exe)
+        else:
+            print(f"[PELLET] Missing {exe} — would dispense for side={side}")
+
+    @staticmethod
+    def _finish(job):
+        if job.done.is_set():
+            return
+        job.done.set()
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                print(f"[PELLET] on_done callback error: {e}")
+
+
+# ---------- shared instance ----------
+_DISPENSER = None
+
+def get_dispenser():
+    global _DISPENSER
+    if _DISPENSER is None:
+        _DISPENSER = PelletDispenser()
+    return _DISPENSER
+
+def set_dispenser(dispenser):
+    """Swap the shared dispenser (e.g. a silent one for headless runs). Returns the old one."""
+    global _DISPENSER
+    old = _DISPENSER
+    _DISPENSER = dispenser
+    return old
+
+def dispense(side, num=1, on_done=None):
+    """Non-blocking: queue [num] pellets for side (0 = left, 1 = right)."""
+    return get_dispenser().dispense(side, num, on_done)
+
+def shutdown(timeout=5.0):
+    """Flush pending pellets and stop the worker threads (call before pygame.quit)."""
+    global _DISPENSER
+    if _DISPENSER is not None:
+        _DISPENSER.close(timeout)
+        _DISPENSER = None
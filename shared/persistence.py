@@ -1,5 +1,5 @@
 # shared/persistence.py
-import os, json
+import os, json, copy
 from datetime import datetime
 
 STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "state", "KM_JBT")
@@ -7,7 +7,11 @@ ARCHIVE_DIR = os.path.join(STATE_DIR, "archive")
 os.makedirs(STATE_DIR, exist_ok=True)
 os.makedirs(ARCHIVE_DIR, exist_ok=True)
 
-INCOMPLETE = {}  # uid -> state dict
+INCOMPLETE = {}  # uid -> catalog summary (see load_all_states / load_state)
+
+# Optional database backend (shared/store.py enable() sets this). When set,
+# progress is saved to / loaded from it instead of the JSON files.
+STORE = None
 
 
 def make_uid(leader, follower, stimuli, sessions_total, version="v1"):
@@ -18,52 +22,270 @@ def state_path(uid):
     return os.path.join(STATE_DIR, f"{uid}.json")
 
 
-def save_state(state):
-    state.setdefault("progress", {})
-    state["progress"]["last_saved_iso"] = datetime.now().isoformat(timespec="seconds")
+def journal_path(uid):
+    return os.path.join(STATE_DIR, f"{uid}.journal")
+
+
+# ---------- progress journal ----------
+# In journal mode save_state appends one line per call to <uid>.journal with
+# only what changed since the last save (progress fields, deck pops, layout
+# history entries), instead of rewriting the whole JSON. The JSON snapshot is
+# rewritten (compacted) every COMPACT_EVERY records, on session rollover and
+# whenever the state was not loaded/created in this process. Loading replays
+# the journal on top of the snapshot.
+#
+# Each snapshot carries a "journal_gen"; records are tagged with it, so a
+# journal left behind by a crash right after a compaction is ignored on replay.
+JOURNAL_MODE  = True
+COMPACT_EVERY = 28   # journal records between snapshot rewrites
+
+_SAVED = {}   # uid -> {"state": copy as last persisted, "records": n, "gen": journal_gen}
+
+
+def _diff(old, new, path, ops):
+    """Ops that turn `old` into `new`: ["set", path, v], ["ext", path, items], ["del", path]."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for k in old:
+            if k not in new:
+                ops.append(["del", path + [k]])
+        for k, v in new.items():
+            if k not in old:
+                ops.append(["set", path + [k], v])
+            else:
+                _diff(old[k], v, path + [k], ops)
+    elif (isinstance(old, list) and isinstance(new, list)
+          and len(new) > len(old) and new[:len(old)] == old):
+        ops.append(["ext", path, new[len(old):]])
+    elif type(old) is not type(new) or old != new:
+        ops.append(["set", path, new])
+    return ops
+
+
+def _apply(state, ops):
+    for op in ops:
+        kind, path = op[0], op[1]
+        parent = state
+        for k in path[:-1]:
+            parent = parent[k]
+        key = path[-1]
+        if kind == "set":
+            parent[key] = op[2]
+        elif kind == "ext":
+            parent[key].extend(op[2])
+        elif kind == "del":
+            parent.pop(key, None)
+
+
+def _replay(state, uid):
+    """Apply the matching-generation journal records to a freshly read snapshot. Returns the count."""
+    gen = state.get("journal_gen")
+    n = 0
+    try:
+        with open(journal_path(uid), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break   # torn last line from an interrupted append
+                if rec.get("gen") != gen:
+                    continue
+                _apply(state, rec["ops"])
+                n += 1
+    except FileNotFoundError:
+        pass
+    return n
+
+
+def _read_state(path, uid=None):
+    """Snapshot + journal replay for one state file. Returns (state, journal records applied)."""
+    with open(path, "r", encoding="utf-8") as f:
+        st = json.load(f)
+    n = _replay(st, uid or st.get("uid") or os.path.basename(path)[:-5])
+    return _backfill(st), n
+
+
+def _remember(state, records):
+    _SAVED[state["uid"]] = {
+        "state": copy.deepcopy(state),
+        "records": records,
+        "gen": state.get("journal_gen"),
+    }
+
+
+def compact_state(state):
+    """Rewrite the full JSON snapshot and start a fresh journal generation."""
+    if STORE is not None:
+        STORE.save_state(state)
+        return
+    state["journal_gen"] = int(state.get("journal_gen", 0)) + 1
     tmp = state_path(state["uid"]) + ".tmp"
     final = state_path(state["uid"])
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(state, f, indent=2)
     os.replace(tmp, final)
+    try:
+        os.remove(journal_path(state["uid"]))
+    except FileNotFoundError:
+        pass
+    _remember(state, 0)
 
 
-def load_all_states():
-    INCOMPLETE.clear()
-    for fn in os.listdir(STATE_DIR):
-        if not fn.endswith(".json"): 
-            continue
-        path = os.path.join(STATE_DIR, fn)
+def save_state(state):
+    state.setdefault("progress", {})
+    state["progress"]["last_saved_iso"] = datetime.now().isoformat(timespec="seconds")
+    if STORE is not None:
+        STORE.save_state(state)
+        return
+    saved = _SAVED.get(state["uid"])
+    if (not JOURNAL_MODE or saved is None or saved["records"] >= COMPACT_EVERY
+            or saved["gen"] != state.get("journal_gen")
+            or not os.path.exists(state_path(state["uid"]))):
+        compact_state(state)
+        return
+    ops = _diff(saved["state"], state, [], [])
+    if not ops:
+        return
+    line = json.dumps({"gen": saved["gen"], "ops": ops}, separators=(",", ":"))
+    with open(journal_path(state["uid"]), "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+    _apply(saved["state"], copy.deepcopy(ops))
+    saved["records"] += 1
+
+
+# ---------- state catalog ----------
+# INCOMPLETE holds a compact summary per uid (the config/progress fields the
+# launcher lists and edits), not the full state. The summaries are persisted
+# in one index file next to the states, keyed by file name with mtime/size, so
+# a refresh is one stat pass and only changed files (or journals) are parsed again.
+# Use load_state(uid) for the full dict.
+CATALOG_NAME = "_catalog.idx"
+CATALOG_VERSION = 2   # 2: summaries carry the live_stats headline numbers
+_CATALOG = {"dir": None, "files": {}}   # file name -> summary (+ mtime_ns/size)
+
+
+def _backfill(st):
+    # older files predate left_name/right_name
+    cfg = st.setdefault("config", {})
+    if "left_name" not in cfg:
+        cfg["left_name"] = cfg.get("leader", "")
+    if "right_name" not in cfg:
+        cfg["right_name"] = cfg.get("follower", "")
+    return st
+
+
+def _summarize(st, fn, stat):
+    cfg = st.get("config", {})
+    prog = st.get("progress", {})
+    return {
+        "uid": st.get("uid") or fn[:-5],
+        "file": fn,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "status": st.get("status", "incomplete"),
+        "config": {
+            "leader":         cfg.get("leader", ""),
+            "follower":       cfg.get("follower", ""),
+            "stimuli":        cfg.get("stimuli", ""),
+            "sessions_total": cfg.get("sessions_total", 0),
+            "left_name":      cfg.get("left_name", ""),
+            "right_name":     cfg.get("right_name", ""),
+        },
+        "progress": {
+            "session_index":   int(prog.get("session_index", 1)),
+            "completed_trios": int(prog.get("completed_trios", 0)),
+        },
+        "stats": st.get("stats", {}).get("summary"),   # live_stats headline, None before any trio
+    }
+
+
+def _catalog_files():
+    """The persisted catalog for the current STATE_DIR (read once per dir)."""
+    if _CATALOG["dir"] != STATE_DIR:
+        files = {}
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                st = json.load(f)
-        except Exception:
-            continue
+            with open(os.path.join(STATE_DIR, CATALOG_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                files = data.get("files", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        _CATALOG["dir"] = STATE_DIR
+        _CATALOG["files"] = files
+    return _CATALOG["files"]
 
-        # ---- backfill for older files (this is the important bit) ----
-        cfg = st.setdefault("config", {})
-        if "left_name" not in cfg:
-            cfg["left_name"] = cfg.get("leader", "")
-        if "right_name" not in cfg:
-            cfg["right_name"] = cfg.get("follower", "")
 
-        uid = st.get("uid") or fn[:-5]
-        INCOMPLETE[uid] = st
+def _write_catalog(files):
+    path = os.path.join(STATE_DIR, CATALOG_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": CATALOG_VERSION, "files": files}, f)
+    os.replace(tmp, path)
 
 
+def load_all_states():
+    """Refresh INCOMPLETE from the catalog; reparses only state files whose mtime/size changed."""
+    cached = _catalog_files()
+    files = {}
+    changed = False
+    for entry in os.scandir(STATE_DIR):
+        fn = entry.name
+        if not fn.endswith(".json") or not entry.is_file():
+            continue
+        stat = entry.stat()
+        try:
+            js = os.stat(os.path.join(STATE_DIR, fn[:-5] + ".journal"))
+            journal = [js.st_mtime_ns, js.st_size]
+        except FileNotFoundError:
+            journal = None
+        summ = cached.get(fn)
+        if (summ is None or summ["mtime_ns"] != stat.st_mtime_ns or summ["size"] != stat.st_size
+                or summ.get("journal") != journal):
+            try:
+                st, _ = _read_state(entry.path, fn[:-5])
+            except Exception:
+                continue
+            summ = _summarize(st, fn, stat)
+            summ["journal"] = journal
+            changed = True
+        files[fn] = summ
+    if changed or len(files) != len(cached):
+        _CATALOG["files"] = files
+        try:
+            _write_catalog(files)
+        except OSError as e:
+            print(f"[STATE] catalog write failed: {e}")
+
+    INCOMPLETE.clear()
+    for summ in files.values():
+        INCOMPLETE[summ["uid"]] = summ
+    if STORE is not None:
+        INCOMPLETE.update(STORE.summaries())   # the database wins over leftover JSON
+
+
+def load_state(uid):
+    """Full state dict for `uid` (snapshot + journal, backfilled like new_or_resume_state)."""
+    if STORE is not None:
+        st = STORE.load_state(uid)
+        if st is not None:
+            return _backfill(st)
+    summ = INCOMPLETE.get(uid)
+    fn = summ["file"] if summ else f"{uid}.json"
+    st, n = _read_state(os.path.join(STATE_DIR, fn), fn[:-5])
+    if fn == f"{st['uid']}.json":
+        _remember(st, n)
+    return st
+
 
 def new_or_resume_state(uid, config):
     """Open existing state if it exists; otherwise create a new one."""
+    if STORE is not None:
+        st = STORE.load_state(uid)
+        if st is not None:
+            return _backfill(st), True
     p = state_path(uid)
     if os.path.exists(p):
-        with open(p, "r", encoding="utf-8") as f:
-            st = json.load(f)
-        # ---- backfill for older files (see section B below) ----
-        cfg = st.setdefault("config", {})
-        if "left_name" not in cfg:
-            cfg["left_name"] = cfg.get("leader", "")
-        if "right_name" not in cfg:
-            cfg["right_name"] = cfg.get("follower", "")
+        st, n = _read_state(p, uid)
+        _remember(st, n)
         return st, True
 
     # ---- NEW STATE (preserve left/right names from Launch) ----
@@ -89,12 +311,24 @@ def new_or_resume_state(uid, config):
         },
         "created_at": datetime.now().isoformat(timespec="seconds"),
     }
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2)
+    compact_state(state)
     return state, False
 
 
 
+def forget_state(uid):
+    """Remove every stored copy of `uid` (JSON, journal, database progress), e.g. after a rename."""
+    for path in (state_path(uid), journal_path(uid)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    _SAVED.pop(uid, None)
+    if STORE is not None:
+        STORE.delete_state(uid)
+
+
+
 def set_next_trial(state, session_index, next_trial):  # 1..28
     next_trial = max(1, min(28, int(next_trial)))
     block_index = ((next_trial - 1) // 7) + 1
@@ -109,7 +343,16 @@ def set_next_trial(state, session_index, next_trial):  # 1..28
 def archive_or_delete_if_complete(state, delete=True):
     if state.get("status") != "complete":
         return
+    if STORE is not None:
+        STORE.delete_state(state["uid"])   # trio rows stay in the database
     src = state_path(state["uid"])
+    if not delete and os.path.exists(journal_path(state["uid"])):
+        compact_state(state)   # archive a self-contained snapshot
+    _SAVED.pop(state["uid"], None)
+    try:
+        os.remove(journal_path(state["uid"]))
+    except FileNotFoundError:
+        pass
     if delete:
         try:
             os.remove(src)
@@ -193,39 +436,3 @@ def advance_after_trio(state):
 
     # always reset stage to KM for the next trio
     p["stage"] = "KM"
-
-import random
-
-_JBT_BLOCK_TEMPLATE = ["S+", "S+", "S-", "S-", "NP", "INT", "NG"]
-
-def _ensure_block_schedule(state):
-    """
-    Ensure we have a randomized schedule for each block in the current session.
-    Stored under progress["_stim_blocks"][str(session_index)][str(block_index)] = list of 7 labels
-    """
-    p = state["progress"]
-    sess = str(p["session_index"])
-    blk  = str(p["block_index"])
-
-    if "_stim_blocks" not in p:
-        p["_stim_blocks"] = {}
-
-    if sess not in p["_stim_blocks"]:
-        p["_stim_blocks"][sess] = {}
-
-    if blk not in p["_stim_blocks"][sess]:
-        block = _JBT_BLOCK_TEMPLATE[:]
-        random.shuffle(block)  # simple shuffle; change if you want extra constraints
-        p["_stim_blocks"][sess][blk] = block
-
-def get_current_jbt_stimulus(state) -> str:
-    """
-    Returns the scheduled JBT stimulus label ("S+","S-","NP","INT","NG") for the current trio.
-    """
-    _ensure_block_schedule(state)
-    p = state["progress"]
-    sess = str(p["session_index"]); blk = str(p["block_index"])
-    trio_idx_1based = int(p["trio_index"])
-    # guard
-    trio_idx_1based = max(1, min(7, trio_idx_1based))
-    return p["_stim_blocks"][sess][blk][trio_idx_1based - 1]
@@ -0,0 +1,63 @@
+# shared/phases.py
+from shared import timebase
+
+
+class PhaseMachine:
+    """
+    Deadline-driven phase tracker for the trial scenes.
+
+    The scene keeps ONE frame loop and asks the machine which phase it is in,
+    instead of chaining pygame.time.delay() calls. Every phase change is
+    timestamped so the trial's timeline can be returned with the results.
+
+        pm = PhaseMachine()
+        pm.enter("start")
+        pm.enter("iti", duration=0.5)   # deadline 0.5s from now
+        if pm.expired(): ...
+    """
+    def __init__(self, clock_fn=timebase.now):
+        self._now = clock_fn
+        self.t0 = clock_fn()
+        self.name = None
+        self.t_enter = None
+        self.deadline = None
+        self.log = []   # [(phase, t_enter, t_exit)] for completed phases
+
+    def now(self):
+        return self._now()
+
+    def enter(self, name, duration=None):
+        """Close the current phase and start `name` (optionally with a deadline in seconds)."""
+        t = self._now()
+        if self.name is not None:
+            self.log.append((self.name, self.t_enter, t))
+        self.name = name
+        self.t_enter = t
+        self.deadline = None if duration is None else t + float(duration)
+
+    def finish(self):
+        """Close the current phase without starting a new one."""
+        if self.name is not None:
+            self.log.append((self.name, self.t_enter, self._now()))
+        self.name = None
+        self.t_enter = None
+        self.deadline = None
+
+    @property
+    def elapsed(self):
+        """Seconds since the current phase started."""
+        return self._now() - self.t_enter
+
+    def expired(self):
+        return self.deadline is not None and self._now() >= self.deadline
+
+    def timeline_ms(self):
+        """Completed phases as [{'phase', 'start_ms', 'dur_ms'}] relative to machine creation."""
+        return [
+            {
+                "phase": name,
+                "start_ms": int(round((t_in - self.t0) * 1000)),
+                "dur_ms": int(round((t_out - t_in) * 1000)),
+            }
+            for name, t_in, t_out in self.log
+        ]
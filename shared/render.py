@@ -0,0 +1,78 @@
+# shared/render.py
+import pygame
+
+# Renderer mode: True = restore/push only dirty rects each frame,
+# False = blit the cached scene layer and flip the whole screen.
+DIRTY_RECTS = True
+
+
+class SplitScreenRenderer:
+    """
+    Layered renderer for the split-screen trial scenes.
+
+      base   — static split-screen background (fill, active half, divider,
+               borders), painted ONCE per scene.
+      scene  — base + whatever is static for the current phase (start bar,
+               choice boxes, stimulus). Rebuilt only on set_scene().
+      sprites— per-frame items (cursors, flash overlay) drawn via circle()/blit().
+
+    Each frame: begin() restores the scene layer under last frame's sprites,
+    the caller draws sprites, present() pushes only the changed rects with
+    pygame.display.update(rects). Phase changes (set_scene) push one full flip.
+    """
+    def __init__(self, screen, paint_base, dirty=None):
+        self.screen = screen
+        self.dirty = DIRTY_RECTS if dirty is None else bool(dirty)
+        self._paint_base = paint_base
+        self._base = None
+        self._scene = None
+        self._paint_static = None
+        self._prev = []
+        self._cur = []
+        self._full = True
+        self._build_base()
+
+    # --------------- layers ---------------
+    def _build_base(self):
+        self._base = pygame.Surface(self.screen.get_size()).convert()
+        self._paint_base(self._base)
+        self._build_scene()
+
+    def _build_scene(self):
+        self._scene = self._base.copy()
+        if self._paint_static is not None:
+            self._paint_static(self._scene)
+        self._full = True
+
+    def set_scene(self, paint_static=None):
+        """Bake the static items for the current phase on top of the base layer."""
+        self._paint_static = paint_static
+        self._build_scene()
+
+    def handle_event(self, ev):
+        if ev.type in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
+            self.screen = pygame.display.get_surface() or self.screen
+            self._build_base()
+
+    # --------------- per frame ---------------
+    def begin(self):
+        if self._full or not self.dirty:
+            self.screen.blit(self._scene, (0, 0))
+        else:
+            for r in self._prev:
+                self.screen.blit(self._scene, r, r)
+
+    def circle(self, color, center, radius):
+        self._cur.append(pygame.draw.circle(self.screen, color, center, radius))
+
+    def blit(self, surface, pos):
+        self._cur.append(self.screen.blit(surface, pos))
+
+    def present(self):
+        if self._full or not self.dirty:
+            pygame.display.flip()
+            self._full = False
+        else:
+            pygame.display.update(self._prev + self._cur)
+        self._prev = self._cur
+        self._cur = []
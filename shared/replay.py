@@ -0,0 +1,303 @@
+# shared/replay.py
+import os
+import sys
+import json
+import random
+import threading
+from array import array
+from datetime import datetime
+
+import pygame
+from pygame.locals import *
+
+from shared import timebase, inputs
+from shared.input_sampler import InputSampler
+
+# Input record/replay.
+#
+# A recording captures everything the trial loops take from outside, at the
+# seams they already read through:
+#   - every main-thread clock read (timebase source), in order ("tape")
+#   - input sampler step times (only needed when the sampler ran threaded)
+#   - inputs.events() per call, inputs.key_state() for the movement keys and
+#     inputs.axis() values (read once per frame by inputs.snapshot()), each
+#     logged only when it changes, keyed by read count
+#   - the `random` generator state, the starting state and the CSV row of every trio
+# Replaying installs the same seams with the logged values, a dummy display
+# and instant pellets, so run_trio() (run_km / run_jbt) takes exactly the same
+# path and rebuilds the same rows, headless and as fast as the CPU allows.
+#
+# Recordings made with a threaded sampler are exact up to the moment a main-
+# thread cursor change lands between two samples; headless/unthreaded ones
+# replay bit-for-bit.
+INPUT_RECORDING = False
+RECORDINGS_DIR = None   # None -> <project root>/recordings
+
+FORMAT = 2   # 2: keys/axes read once per frame (inputs.snapshot), not per sample
+RECORD_KEYS = (K_w, K_s, K_a, K_d, K_UP, K_DOWN, K_LEFT, K_RIGHT)
+N_AXES = 4   # (side, k) -> side * 2 + k
+
+
+def _event_attrs(ev):
+    return {k: v for k, v in ev.dict.items() if isinstance(v, (int, float, str, bool))}
+
+
+# ---------- recording ----------
+class InputRecorder:
+    """
+    Installed as the inputs source (wrapping the real one) and as the
+    timebase source (wrapping the current clock) by start().
+    """
+    def __init__(self, source=None):
+        self.source = source   # None -> whatever inputs source is installed at start()
+        self.tape = array("d")
+        self.steps = array("q")
+        self.key_idx, self.key_bits = array("q"), array("H")
+        self.axis_idx = [array("q") for _ in range(N_AXES)]
+        self.axis_val = [array("d") for _ in range(N_AXES)]
+        self.events_log = []   # [call index, type, attrs]
+        self.n_events = 0
+        self.n_keys = 0
+        self.n_axis = [0] * N_AXES
+        self.trios = []        # [km start ISO, CSV row]
+        self.meta = {}
+        self._last_bits = None
+        self._last_axis = [None] * N_AXES
+        self._inner_clock = None
+        self._old_input = None
+        self._main = threading.main_thread()
+        self._local = threading.local()
+
+    # --------------- seams ---------------
+    def _now(self):
+        t = self._inner_clock()
+        # only the main thread's reads are taped; input-source calls (scripted
+        # agents) and worker threads read the clock untaped
+        if threading.current_thread() is self._main and not getattr(self._local, "busy", False):
+            self.tape.append(t)
+        return t
+
+    def _on_step(self, t_ns):
+        if self.meta["threaded"]:
+            self.steps.append(t_ns)
+
+    def events(self):
+        self._local.busy = True
+        try:
+            evs = self.source.events()
+        finally:
+            self._local.busy = False
+        for ev in evs:
+            self.events_log.append([self.n_events, ev.type, _event_attrs(ev)])
+        self.n_events += 1
+        return evs
+
+    def keys(self):
+        self._local.busy = True
+        try:
+            keys = self.source.keys()
+        finally:
+            self._local.busy = False
+        bits = 0
+        for i, k in enumerate(RECORD_KEYS):
+            if keys[k]:
+                bits |= 1 << i
+        if bits != self._last_bits:
+            self._last_bits = bits
+            self.key_idx.append(self.n_keys)
+            self.key_bits.append(bits)
+        self.n_keys += 1
+        return keys
+
+    def axis(self, side, k):
+        v = self.source.axis(side, k)
+        a = side * 2 + k
+        if v != self._last_axis[a]:
+            self._last_axis[a] = v
+            self.axis_idx[a].append(self.n_axis[a])
+            self.axis_val[a].append(v)
+        self.n_axis[a] += 1
+        return v
+
+    # --------------- lifecycle ---------------
+    def start(self, state, screen_size, threaded):
+        version, internal, gauss = random.getstate()
+        self.meta = {
+            "format": FORMAT, "size": list(screen_size), "threaded": bool(threaded),
+            "random_state": [version, list(internal), gauss],
+            "state": json.loads(json.dumps(state)),
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._inner_clock = timebase.set_source(self._now)
+        self._old_input = inputs.install(self)
+        if self.source is None:
+            self.source = self._old_input
+        InputSampler.on_step = self._on_step
+        return self
+
+    def stop(self):
+        if self._inner_clock is not None:
+            timebase.set_source(self._inner_clock)
+            inputs.install(self._old_input)
+            InputSampler.on_step = None
+            self._inner_clock = None
+
+    def note_trio(self, km_start_dt, row):
+        self.trios.append([km_start_dt.isoformat(), list(row)])
+
+    def save(self, path):
+        arrays = [self.tape, self.steps, self.key_idx, self.key_bits] + self.axis_idx + self.axis_val
+        header = dict(self.meta, trios=self.trios, events=self.events_log,
+                      counts={"events": self.n_events, "keys": self.n_keys, "axis": self.n_axis},
+                      arrays=[[a.typecode, len(a)] for a in arrays])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+            for a in arrays:
+                if sys.byteorder != "little":
+                    a = array(a.typecode, a)
+                    a.byteswap()
+                f.write(a.tobytes())
+        os.replace(tmp, path)
+        return path
+
+
+def load_recording(path):
+    """-> (header dict, [arrays]) in InputRecorder.save order."""
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path}: unsupported recording format {header.get('format')}")
+        arrays = []
+        for code, n in header["arrays"]:
+            a = array(code)
+            a.frombytes(f.read(a.itemsize * n))
+            if sys.byteorder != "little":
+                a.byteswap()
+            arrays.append(a)
+    return header, arrays
+
+
+# ---------- replay ----------
+class _Keys(dict):
+    def __missing__(self, key):
+        return False
+
+
+class Replayer:
+    """inputs + timebase source that plays a recording back (single-threaded)."""
+    def __init__(self, header, arrays, step_sec=1.0 / 60):
+        self.header = header
+        self.tape, self.steps, self.key_idx, self.key_bits = arrays[:4]
+        self.axis_idx = arrays[4:4 + N_AXES]
+        self.axis_val = arrays[4 + N_AXES:4 + 2 * N_AXES]
+        self.threaded = header["threaded"]
+        self.step_sec = step_sec
+        self.events_by_call = {}
+        for call, etype, attrs in header["events"]:
+            self.events_by_call.setdefault(call, []).append(pygame.event.Event(etype, attrs))
+        self.t = self.tape[0] if len(self.tape) else 0.0
+        self.diverged = False
+        self._tape_pos = self._step_pos = 0
+        self._n_events = self._n_keys = self._key_pos = 0
+        self._n_axis = [0] * N_AXES
+        self._axis_pos = [0] * N_AXES
+        self._key_cache = {}
+
+    # --------------- clock ---------------
+    def now(self):
+        if self._tape_pos < len(self.tape):
+            self.t = self.tape[self._tape_pos]
+            self._tape_pos += 1
+        else:
+            self.diverged = True
+            self.t += self.step_sec
+        if self.threaded:
+            self._apply_steps(int(self.t * 1e9))
+        return self.t
+
+    def _apply_steps(self, until_ns):
+        steps = self.steps
+        while self._step_pos < len(steps) and steps[self._step_pos] <= until_ns:
+            t_ns = steps[self._step_pos]
+            self._step_pos += 1
+            for sampler in list(InputSampler.live):
+                sampler.step(t_ns)
+
+    # --------------- inputs ---------------
+    def events(self):
+        evs = self.events_by_call.get(self._n_events, [])
+        self._n_events += 1
+        return evs
+
+    def keys(self):
+        n = self._n_keys
+        self._n_keys += 1
+        while self._key_pos + 1 < len(self.key_idx) and self.key_idx[self._key_pos + 1] <= n:
+            self._key_pos += 1
+        bits = self.key_bits[self._key_pos] if len(self.key_bits) else 0
+        keys = self._key_cache.get(bits)
+        if keys is None:
+            keys = _Keys({k: bool(bits >> i & 1) for i, k in enumerate(RECORD_KEYS)})
+            self._key_cache[bits] = keys
+        return keys
+
+    def axis(self, side, k):
+        a = side * 2 + k
+        n = self._n_axis[a]
+        self._n_axis[a] += 1
+        idx, pos = self.axis_idx[a], self._axis_pos[a]
+        while pos + 1 < len(idx) and idx[pos + 1] <= n:
+            pos += 1
+        self._axis_pos[a] = pos
+        return self.axis_val[a][pos] if len(idx) else 0.0
+
+    def install(self):
+        version, internal, gauss = self.header["random_state"]
+        random.setstate((version, tuple(internal), gauss))
+        timebase.set_source(self.now)
+        inputs.install(self)
+        InputSampler.driven = self.threaded
+
+
+# ---------- shared instance (main.py) ----------
+RECORDER = None
+
+def start_recording(state, screen_size, threaded):
+    """Begin recording (after reconcile, before the first trio). No-op unless INPUT_RECORDING."""
+    global RECORDER
+    if INPUT_RECORDING and RECORDER is None:
+        RECORDER = InputRecorder().start(state, screen_size, threaded)
+    return RECORDER
+
+
+def note_trio(km_start_dt, row):
+    if RECORDER is not None:
+        RECORDER.note_trio(km_start_dt, row)
+
+
+def stop_recording(path=None):
+    """Restore the live seams and write the recording. Returns its path (None if not recording)."""
+    global RECORDER
+    rec, RECORDER = RECORDER, None
+    if rec is None:
+        return None
+    rec.stop()
+    if path is None:
+        out_dir = RECORDINGS_DIR or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "recordings")
+        uid = rec.meta["state"].get("uid", "session")
+        path = os.path.join(out_dir, f"{uid}_{datetime.now():%Y%m%d_%H%M%S}.kmrec")
+    try:
+        rec.save(path)
+    except OSError as e:
+        print("[REPLAY] could not save recording:", e)
+        return None
+    print(f"[REPLAY] recorded {len(rec.trios)} trios -> {path}")
+    return path
+
+
+def row_matches(recorded, replayed):
+    """Compare a recorded CSV row with a replayed one (as they would be written)."""
+    return [str(v) for v in recorded] == [str(v) for v in replayed]
@@ -0,0 +1,176 @@
+# shared/schedule.py
+import random
+
+from shared.sequence import make_rng, block_sequence, counterbalanced_pair
+
+# Whole-session trial schedule, compiled once when a session starts and stored
+# in state["progress"]["schedule"] as short strings (one char per trio), so the
+# scenes only index into it:
+#   km_leader / km_follower : "K" = K box on the left spot, "M" = M box on the left
+#   jbt_left  / jbt_right   : one code per trio from JBT_CODES
+#   seed                    : the generator seed, so a schedule can be reproduced
+#   legacy_until            : (only for sessions begun by the old per-trio schedulers)
+#                             first compiled trio; earlier ones were drawn the old way
+TRIOS_PER_SESSION = 28
+TRIOS_PER_BLOCK   = 7
+KM_MAX_RUN        = 2      # same K/M placement at most twice in a row (per half)
+
+JBT_BLOCK_TEMPLATE = ["S+", "S+", "S-", "S-", "NP", "NN", "INT"]
+JBT_CODES  = {"S+": "+", "S-": "-", "NP": "P", "NN": "N", "INT": "I"}
+JBT_LABELS = {c: lbl for lbl, c in JBT_CODES.items()}
+
+_KM_KEYS  = {"leader": "km_leader", "follower": "km_follower"}
+_JBT_KEYS = {"left": "jbt_left", "right": "jbt_right"}
+
+# per-trio randomisation state from the old lazy schedulers; the schedule replaces it
+_LEGACY_KEYS = ("km_history_leader_half", "km_history_follower_half",
+                "jbt_decks_sides", "_stim_blocks", "jbt_block", "jbt_index")
+
+
+# ---------- compile ----------
+def compile_session(session_index, previous=None, seed=None, legacy=None):
+    """
+    All 28 trios of one session, built directly under the constraints
+    (shared/sequence.py):
+      - K/M placement: per 7-trio block one half gets K on the left 4 times
+        and the other half 3 times (mirrored, alternating by block), never the
+        same placement more than KM_MAX_RUN times in a row, carried across the
+        session boundary from `previous`;
+      - JBT: each side gets its own balanced blocks of JBT_BLOCK_TEMPLATE.
+    `seed` (default: drawn from `random`) makes the schedule reproducible.
+
+    `legacy` is the progress dict of a session the old per-trio schedulers
+    started and left mid-block: the rest of its current block is drawn the old
+    way (see _legacy_prefix) and compiled blocks start at the next boundary,
+    recorded as sched["legacy_until"].
+    """
+    prev = previous or {}
+    seed = random.getrandbits(32) if seed is None else int(seed)
+    rng = make_rng(seed)
+    start = 0
+    if legacy is not None:
+        done = max(0, min(TRIOS_PER_SESSION, int(legacy.get("completed_trios", 0))))
+        start = -(-done // TRIOS_PER_BLOCK) * TRIOS_PER_BLOCK
+        prefix = _legacy_prefix(legacy, done, start, rng)
+        prev = {key: prefix[key] for key in _KM_KEYS.values()}
+    else:
+        prefix = {key: "" for key in (*_KM_KEYS.values(), *_JBT_KEYS.values())}
+    blocks = (TRIOS_PER_SESSION - start) // TRIOS_PER_BLOCK
+    km_leader, km_follower = counterbalanced_pair(
+        blocks, TRIOS_PER_BLOCK, ("K", "M"), KM_MAX_RUN, rng,
+        prev.get("km_leader", ""), prev.get("km_follower", ""))
+    jbt = [JBT_CODES[lbl] for lbl in JBT_BLOCK_TEMPLATE]
+    sched = {
+        "session": int(session_index),
+        "seed": seed,
+        "km_leader":   prefix["km_leader"] + "".join(km_leader),
+        "km_follower": prefix["km_follower"] + "".join(km_follower),
+        "jbt_left":  prefix["jbt_left"] + "".join(block_sequence(jbt, blocks, rng=rng)),
+        "jbt_right": prefix["jbt_right"] + "".join(block_sequence(jbt, blocks, rng=rng)),
+    }
+    if start:
+        sched["legacy_until"] = start
+    validate(sched, previous)
+    return sched
+
+
+def _legacy_prefix(prog, done, end, rng):
+    """
+    Codes for trios [0, end) of a session started by the old per-trio
+    schedulers. Trios done..end-1 continue its saved per-half K/M histories
+    (random, at most KM_MAX_RUN in a row) and per-side JBT decks (the labels
+    left in the current 7-trial block), exactly as the old scenes drew them,
+    so the block already under way keeps its balance. Trios before `done`
+    ran unrecorded; they get fresh draws from the same generator, only so a
+    re-run after a launcher edit still finds valid codes.
+    """
+    def km_draws(hist, n):
+        out = []
+        for _ in range(n):
+            options = ["K", "M"]
+            if len(hist) >= KM_MAX_RUN and len(set(hist[-KM_MAX_RUN:])) == 1:
+                options.remove(hist[-1])
+            hist.append(rng.choice(options))
+            out.append(hist[-1])
+        return "".join(out)
+
+    def jbt_draws(deck, n):
+        out = []
+        while len(out) < n:
+            if not deck:
+                deck[:] = JBT_BLOCK_TEMPLATE
+                rng.shuffle(deck)
+            code = JBT_CODES.get(str(deck.pop()).upper())
+            if code is not None:
+                out.append(code)
+        return "".join(out)
+
+    decks = prog.get("jbt_decks_sides") or {}
+    prefix = {}
+    for role, key in _KM_KEYS.items():
+        saved = ["K" if h == "K_left" else "M" for h in prog.get(f"km_history_{role}_half", [])]
+        prefix[key] = km_draws([], done) + km_draws(saved, end - done)
+    for side, key in _JBT_KEYS.items():
+        prefix[key] = jbt_draws([], done) + jbt_draws(list(decks.get(side, [])), end - done)
+    return prefix
+
+
+def validate(sched, previous=None):
+    """Raise ValueError if a compiled schedule breaks a constraint (from legacy_until on)."""
+    start = int(sched.get("legacy_until", 0))
+    template = sorted(JBT_CODES[lbl] for lbl in JBT_BLOCK_TEMPLATE)
+    for key in _KM_KEYS.values():
+        seq = sched[key]
+        if len(seq) != TRIOS_PER_SESSION or set(seq) - set("KM"):
+            raise ValueError(f"{key}: bad layout string {seq!r}")
+        carry = seq[:start][-KM_MAX_RUN:] if start else (previous or {}).get(key, "")[-KM_MAX_RUN:]
+        full = carry + seq[start:]
+        for i in range(len(full) - KM_MAX_RUN):
+            if len(set(full[i:i + KM_MAX_RUN + 1])) == 1:
+                raise ValueError(f"{key}: run longer than {KM_MAX_RUN} at trio {start + i + 1 - len(carry)}")
+    for b in range(start, TRIOS_PER_SESSION, TRIOS_PER_BLOCK):
+        k_lead = sched["km_leader"][b:b + TRIOS_PER_BLOCK].count("K")
+        k_foll = sched["km_follower"][b:b + TRIOS_PER_BLOCK].count("K")
+        if k_lead + k_foll != TRIOS_PER_BLOCK or abs(k_lead - k_foll) != TRIOS_PER_BLOCK % 2:
+            raise ValueError(f"KM block {b // TRIOS_PER_BLOCK + 1} is not counterbalanced ({k_lead}/{k_foll})")
+    for key in _JBT_KEYS.values():
+        seq = sched[key]
+        if len(seq) != TRIOS_PER_SESSION or set(seq) - set(JBT_LABELS):
+            raise ValueError(f"{key}: expected {TRIOS_PER_SESSION} labels, got {seq!r}")
+        for b in range(start, TRIOS_PER_SESSION, TRIOS_PER_BLOCK):
+            if sorted(seq[b:b + TRIOS_PER_BLOCK]) != template:
+                raise ValueError(f"{key}: block {b // TRIOS_PER_BLOCK + 1} is not balanced")
+
+
+# ---------- state ----------
+def ensure_schedule(state):
+    """Compile the current session's schedule into state if it is missing or stale."""
+    prog = state.setdefault("progress", {})
+    sess = int(prog.get("session_index", 1))
+    sched = prog.get("schedule")
+    if sched is None or sched.get("session") != sess:
+        legacy = None
+        if sched is None and int(prog.get("completed_trios", 0)) > 0:
+            # saved mid-session before schedules existed: finish its block the old way
+            legacy = prog
+        prog["schedule"] = compile_session(sess, previous=sched, legacy=legacy)
+        for key in _LEGACY_KEYS:
+            prog.pop(key, None)
+    return prog["schedule"]
+
+
+def _trio_index(state):
+    done = int(state["progress"].get("completed_trios", 0))
+    return max(0, min(TRIOS_PER_SESSION - 1, done))
+
+
+def km_layout(state, role):
+    """'K_left' or 'M_left' for `role` ('leader' | 'follower') in the current trio."""
+    sched = ensure_schedule(state)
+    return "K_left" if sched[_KM_KEYS[role]][_trio_index(state)] == "K" else "M_left"
+
+
+def jbt_label(state, side_key):
+    """JBT stimulus label ('S+', 'S-', 'NP', 'NN', 'INT') for `side_key` in the current trio."""
+    sched = ensure_schedule(state)
+    return JBT_LABELS[sched[_JBT_KEYS[side_key]][_trio_index(state)]]
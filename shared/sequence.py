@@ -0,0 +1,164 @@
+# shared/sequence.py
+import random
+
+# Constrained sequence generator.
+#
+# Sequences are built left to right. At every position each allowed next
+# symbol is weighted by the number of valid ways to finish the sequence after
+# it (counted once per (remaining counts, last symbol, run length) state and
+# memoised), which makes every valid arrangement exactly equally likely --
+# the same distribution as reshuffling until the rule holds, without the
+# retry loop. An impossible constraint set is reported up front.
+
+
+def make_rng(seed=None):
+    """Seeded generator for reproducible sequences (None = fresh OS entropy)."""
+    return random.Random(seed)
+
+
+def _run_tail(tail):
+    """(last symbol, length of its trailing run) of `tail`."""
+    last, run = None, 0
+    for x in reversed(tail):
+        if last is None:
+            last, run = x, 1
+        elif x == last:
+            run += 1
+        else:
+            break
+    return last, run
+
+
+def _completions(counts, max_run, last, run, memo):
+    """
+    Number of arrangements of `counts` (tuple, one entry per symbol index)
+    with no run > max_run, given the sequence so far ends in `run` copies of
+    symbol index `last` (None at the start).
+    """
+    if not any(counts):
+        return 1
+    key = (counts, last, run)
+    n = memo.get(key)
+    if n is None:
+        n = 0
+        for i, c in enumerate(counts):
+            if not c or (i == last and run >= max_run):
+                continue
+            rest = counts[:i] + (c - 1,) + counts[i + 1:]
+            n += _completions(rest, max_run, i, run + 1 if i == last else 1, memo)
+        memo[key] = n
+    return n
+
+
+def constrained_sequence(counts, max_run=None, rng=random, history=()):
+    """
+    A uniformly random arrangement of the multiset `counts` ({symbol: n})
+    with no symbol repeated more than `max_run` times in a row (None = no
+    limit), continuing the runs at the end of `history`. Raises ValueError if
+    no arrangement exists.
+    """
+    counts = {x: int(c) for x, c in counts.items() if int(c) > 0}
+    if max_run is None:
+        seq = [x for x, c in counts.items() for _ in range(c)]
+        rng.shuffle(seq)
+        return seq
+    symbols = list(counts)
+    left = tuple(counts[x] for x in symbols)
+    last_sym, run = _run_tail(history[-max_run:])
+    last = symbols.index(last_sym) if last_sym in counts else None
+    if last is None:
+        run = 0   # the history ends in a symbol this multiset does not use
+    memo = {}
+    if not _completions(left, max_run, last, run, memo):
+        raise ValueError(f"no arrangement of {counts} with max run {max_run}")
+
+    seq = []
+    for _ in range(sum(left)):
+        options, weights = [], []
+        for i, c in enumerate(left):
+            if not c or (i == last and run >= max_run):
+                continue
+            rest = left[:i] + (c - 1,) + left[i + 1:]
+            n = _completions(rest, max_run, i, run + 1 if i == last else 1, memo)
+            if n:
+                options.append(i)
+                weights.append(n)
+        i = rng.choices(options, weights)[0]
+        left = left[:i] + (left[i] - 1,) + left[i + 1:]
+        run = run + 1 if i == last else 1
+        last = i
+        seq.append(symbols[i])
+    return seq
+
+
+def shuffle_max_run(items, max_run, rng=random, history=()):
+    """Uniformly random permutation of `items` with no run longer than `max_run`."""
+    counts = {}
+    for x in items:
+        counts[x] = counts.get(x, 0) + 1
+    return constrained_sequence(counts, max_run, rng, history)
+
+
+def block_sequence(block, n_blocks, max_run=None, rng=random, history=()):
+    """
+    `n_blocks` consecutive permutations of `block` (per-block balance), with
+    the max-run rule also holding across block boundaries.
+    """
+    seq = list(history[-max_run:]) if max_run else []
+    start = len(seq)
+    for _ in range(n_blocks):
+        seq.extend(shuffle_max_run(block, max_run, rng, seq[-max_run:] if max_run else ()))
+    return seq[start:]
+
+
+def counterbalanced_pair(n_blocks, block_len, symbols=("K", "M"), max_run=None,
+                         rng=random, history_a=(), history_b=()):
+    """
+    Two binary sequences (e.g. the K/M placement on each half) of n_blocks
+    blocks. In each block one side gets the majority split (4/3 for 7 trials)
+    of symbols[0] and the other side the mirror split (3/4); which side leads
+    alternates from block to block, starting from a random side.
+    """
+    a_sym, b_sym = symbols
+    hi, lo = (block_len + 1) // 2, block_len // 2
+    flip = rng.random() < 0.5
+    keep = max_run or 0
+    seq_a, seq_b = list(history_a[-keep:]) if keep else [], list(history_b[-keep:]) if keep else []
+    start_a, start_b = len(seq_a), len(seq_b)
+    for blk in range(n_blocks):
+        a_major = (blk % 2 == 0) != flip
+        split_a = {a_sym: hi, b_sym: lo} if a_major else {a_sym: lo, b_sym: hi}
+        split_b = {a_sym: split_a[b_sym], b_sym: split_a[a_sym]}
+        seq_a.extend(constrained_sequence(split_a, max_run, rng, seq_a[-keep:] if keep else ()))
+        seq_b.extend(constrained_sequence(split_b, max_run, rng, seq_b[-keep:] if keep else ()))
+    return seq_a[start_a:], seq_b[start_b:]
+
+
+# ---------- self-check ----------
+def _distribution_check(items="KKKMMM", max_run=2, draws=20000, tolerance=0.10):
+    """
+    Draw `draws` seeded shuffles and require every valid arrangement to come
+    up within `tolerance` of uniform (python -m shared.sequence).
+    """
+    from itertools import permutations
+    valid = {p for p in permutations(items)
+             if all(len(set(p[i:i + max_run + 1])) > 1 for i in range(len(p) - max_run))}
+    seen = {}
+    for seed in range(draws):
+        seq = tuple(shuffle_max_run(list(items), max_run, make_rng(seed)))
+        if seq not in valid:
+            raise AssertionError(f"invalid arrangement {''.join(seq)}")
+        seen[seq] = seen.get(seq, 0) + 1
+    expected = draws / len(valid)
+    worst = max(abs(seen.get(p, 0) - expected) / expected for p in valid)
+    print(f"[SEQUENCE] {items} max run {max_run}: {len(valid)} arrangements, "
+          f"{min(seen.get(p, 0) for p in valid)}-{max(seen.values())} per {draws} draws "
+          f"(expected {expected:.0f}, worst {worst:.1%})")
+    if worst > tolerance:
+        raise AssertionError(f"not uniform: worst deviation {worst:.1%} > {tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    _distribution_check("KKKMMM", 2)
+    _distribution_check("KKKKMMM", 2, draws=40000)
+    _distribution_check("KKKKMMMM", 2, draws=80000)
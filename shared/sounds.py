@@ -0,0 +1,170 @@
+# shared/sounds.py
+import os
+import time
+import hashlib
+
+import pygame
+
+# Sound bank: assets are decoded once to raw PCM in the mixer's format and
+# cached on disk, keyed by a hash of the asset file + that format, so later
+# runs load them with pygame.mixer.Sound(buffer=...) and no MP3 decode.
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+SOUND_CACHE_DIR = None   # None -> assets/.pcm_cache
+
+# mixer format; MIXER_BUFFER (samples per channel) sets playback latency:
+# smaller = lower latency, but too small underruns (crackles) on slow machines
+MIXER_FREQ     = 44100
+MIXER_SIZE     = -16
+MIXER_CHANNELS = 2
+MIXER_BUFFER   = 512
+
+
+# ---------- mixer ----------
+def init_mixer():
+    """Open the mixer once with the configured format. Returns pygame.mixer.get_init() (None if no audio)."""
+    if not pygame.mixer.get_init():
+        pygame.mixer.pre_init(MIXER_FREQ, MIXER_SIZE, MIXER_CHANNELS, MIXER_BUFFER)
+        pygame.mixer.init()
+        fmt = pygame.mixer.get_init()
+        if fmt:
+            print(f"[SOUND] mixer {fmt[0]} Hz, {fmt[2]} ch, buffer {MIXER_BUFFER} "
+                  f"(~{buffer_latency_ms():.1f} ms)")
+    return pygame.mixer.get_init()
+
+
+def buffer_latency_ms():
+    """Output latency contributed by one mixer buffer at the current (or configured) rate."""
+    fmt = pygame.mixer.get_init()
+    freq = fmt[0] if fmt else MIXER_FREQ
+    return MIXER_BUFFER * 1000.0 / freq
+
+
+# ---------- bank ----------
+def _cache_dir():
+    return SOUND_CACHE_DIR or os.path.join(ASSETS_DIR, ".pcm_cache")
+
+
+def _asset_key(path, fmt):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read())
+    h.update(repr(fmt).encode())
+    return h.hexdigest()[:20]
+
+
+class SoundBank:
+    """
+    Named sounds decoded to PCM at the mixer rate.
+
+    load() reads <cache>/<name>-<key>.pcm if present (or takes the bytes
+    prefetch() already read), otherwise decodes the asset, writes the PCM
+    (atomic tmp + os.replace) and uses it. Sound objects are only built on
+    the main thread. `stats`
+    keeps (source, ms) per sound: "cache" or "decode"; play_ms the worst
+    play() call seen per sound.
+    """
+    def __init__(self):
+        self.sounds = {}
+        self.stats = {}
+        self.play_ms = {}
+        self._prefetched = {}   # name -> (cache path, PCM bytes or None), from prefetch()
+
+    def _cache_path(self, name, filename, fmt):
+        path = filename if os.path.isabs(filename) else os.path.join(ASSETS_DIR, filename)
+        return path, os.path.join(_cache_dir(), f"{name}-{_asset_key(path, fmt)}.pcm")
+
+    def prefetch(self, name, filename, fmt):
+        """
+        Hash the asset and read its cached PCM ahead of load(). Plain file I/O,
+        no SDL calls, so it may run on a worker thread; `fmt` is init_mixer()'s
+        result (taken on the main thread).
+        """
+        _, cache = self._cache_path(name, filename, fmt)
+        try:
+            with open(cache, "rb") as f:
+                raw = f.read()
+        except OSError:
+            raw = None
+        self._prefetched[name] = (cache, raw)
+
+    def load(self, name, filename):
+        t = time.perf_counter()
+        fmt = init_mixer()
+        path, cache = self._cache_path(name, filename, fmt)
+        prefetched_cache, raw = self._prefetched.pop(name, (None, None))
+        if prefetched_cache != cache:
+            raw = None   # mixer format changed since prefetch()
+        source = "cache"
+        try:
+            if raw is None:
+                with open(cache, "rb") as f:
+                    raw = f.read()
+            snd = pygame.mixer.Sound(buffer=raw)
+        except OSError:
+            source = "decode"
+            raw = pygame.mixer.Sound(path).get_raw()
+            snd = pygame.mixer.Sound(buffer=raw)
+            self._store(cache, raw)
+        self.sounds[name] = snd
+        self.stats[name] = (source, (time.perf_counter() - t) * 1000.0)
+        return snd
+
+    def _store(self, cache, raw):
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            tmp = cache + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, cache)
+        except OSError as e:
+            print(f"[SOUND] could not cache {os.path.basename(cache)}: {e}")
+
+    def __getitem__(self, name):
+        return self.sounds[name]
+
+    def get(self, name, default=None):
+        return self.sounds.get(name, default)
+
+    def play(self, name):
+        """Start `name`; returns how long the play() call took (ms), or None if it is not loaded."""
+        snd = self.sounds.get(name)
+        if snd is None:
+            return None
+        t = time.perf_counter()
+        snd.play()
+        ms = (time.perf_counter() - t) * 1000.0
+        self.play_ms[name] = max(ms, self.play_ms.get(name, 0.0))
+        return ms
+
+    def report(self):
+        parts = ", ".join(f"{n} {src} {ms:.1f} ms" for n, (src, ms) in self.stats.items())
+        plays = ", ".join(f"{n} {ms:.2f}" for n, ms in self.play_ms.items())
+        print(f"[SOUND] bank: {parts}; output latency ~{buffer_latency_ms():.1f} ms"
+              + (f"; worst play() ms: {plays}" if plays else ""))
+
+
+# ---------- shared instance ----------
+_BANK = None
+
+def get_bank():
+    global _BANK
+    if _BANK is None:
+        _BANK = SoundBank()
+    return _BANK
+
+
+def load_bank(files):
+    """Load {name: asset filename} into the shared bank (already-loaded names are skipped)."""
+    bank = get_bank()
+    for name, filename in files.items():
+        if name not in bank.sounds:
+            bank.load(name, filename)
+    return bank
+
+
+def prefetch_bank(files, fmt):
+    """Worker-safe part of load_bank(): read the cached PCM of names not loaded yet."""
+    bank = get_bank()
+    for name, filename in files.items():
+        if name not in bank.sounds:
+            bank.prefetch(name, filename, fmt)
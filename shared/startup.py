@@ -0,0 +1,129 @@
+# shared/startup.py
+import time
+import threading
+import importlib
+
+import pygame
+
+from shared import sounds
+
+# Startup pipeline: main() brings up only the display + fonts, shows the
+# launcher, and everything a trial needs (audio, scene modules, decoded
+# sounds, atlas surfaces) is prepared behind the launcher form.
+STARTUP_BUDGET_MS = 1500   # launcher's first frame should be on screen within this
+
+# scene modules warmed behind the launcher; each may expose prefetch(fmt)
+# (worker thread, file I/O only) and preload_steps(screen) (main thread)
+PRELOAD_SCENES = ("scenes.km_game", "scenes.jbt_game")
+
+
+# ---------- timing ----------
+class StartupTimer:
+    """Milestones (ms since process start) printed as one [STARTUP] line against the budget."""
+    def __init__(self, t0=None, budget_ms=STARTUP_BUDGET_MS):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.budget_ms = budget_ms
+        self.marks = []   # (name, ms since t0)
+
+    def mark(self, name):
+        ms = (time.perf_counter() - self.t0) * 1000.0
+        self.marks.append((name, ms))
+        return ms
+
+    def report(self, name="launcher ready"):
+        total = self.mark(name)
+        steps = ", ".join(f"{n} {ms:.0f}" for n, ms in self.marks[:-1])
+        verdict = "ok" if total <= self.budget_ms else "OVER BUDGET"
+        print(f"[STARTUP] {name} in {total:.0f} ms (budget {self.budget_ms} ms, {verdict})"
+              + (f" [{steps}]" if steps else ""))
+        return total
+
+
+# ---------- background preload ----------
+PRELOAD_BUDGET_MS = 4.0   # main-thread preload work per idle launcher frame
+
+
+class Preloader:
+    """
+    Prepares the scenes while the launcher is up, without touching pygame
+    surfaces or SDL off the main thread:
+      - start() (main thread): opens the mixer and imports the scene modules;
+      - a worker thread runs each module's prefetch(fmt), plain file I/O only
+        (e.g. reading cached PCM);
+      - step() (main thread, once per launcher frame) then runs the modules'
+        preload_steps(screen) -- atlas surfaces, Sound objects -- a few at a
+        time within PRELOAD_BUDGET_MS.
+
+    Call wait() before the first trial: it finishes the prefetch and any steps
+    left, and returns at once if everything is already done.
+    """
+    def __init__(self, screen, modules=PRELOAD_SCENES, budget_ms=PRELOAD_BUDGET_MS):
+        self.screen = screen
+        self.modules = modules
+        self.budget_ms = budget_ms
+        self.timings = {}   # step -> ms
+        self._thread = None
+        self._steps = []    # (module name, callable), run in order on the main thread
+
+    def start(self):
+        try:
+            fmt = sounds.init_mixer()
+        except pygame.error as e:
+            print(f"[STARTUP] audio unavailable: {e}")
+            fmt = None
+        prefetch = []
+        for name in self.modules:
+            t = time.perf_counter()
+            try:
+                mod = importlib.import_module(name)
+                if fmt and getattr(mod, "prefetch", None) is not None:
+                    prefetch.append((name, mod.prefetch))
+                steps = getattr(mod, "preload_steps", None)
+                if steps is not None:
+                    self._steps.extend((name, step) for step in steps(self.screen))
+            except Exception as e:
+                print(f"[STARTUP] preload {name} failed: {e}")
+            self._add_time(name, t)
+        self._thread = threading.Thread(target=self._prefetch, args=(prefetch, fmt),
+                                        name="preload", daemon=True)
+        self._thread.start()
+        return self
+
+    def _prefetch(self, prefetch, fmt):
+        for name, fn in prefetch:
+            t = time.perf_counter()
+            try:
+                fn(fmt)
+            except Exception as e:
+                print(f"[STARTUP] prefetch {name} failed: {e}")
+            self._add_time(f"{name} prefetch", t)
+
+    def _add_time(self, key, t):
+        self.timings[key] = self.timings.get(key, 0.0) + (time.perf_counter() - t) * 1000.0
+
+    def step(self, budget_ms=None):
+        """Main thread, once per idle frame: run preload steps for up to `budget_ms`. True when all done."""
+        if self._thread is not None and self._thread.is_alive():
+            return False   # steps use what the prefetch reads
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        t0 = time.perf_counter()
+        while self._steps and time.perf_counter() - t0 < budget:
+            name, fn = self._steps.pop(0)
+            t = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                print(f"[STARTUP] preload {name} failed: {e}")
+            self._add_time(name, t)
+        return not self._steps
+
+    def wait(self, timeout=None):
+        t = time.perf_counter()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._thread is None or not self._thread.is_alive():
+            self.step(budget_ms=float("inf"))
+        waited = (time.perf_counter() - t) * 1000.0
+        if waited >= 1.0:
+            print(f"[STARTUP] waited {waited:.0f} ms for preload")
+        return dict(self.timings)
@@ -0,0 +1,169 @@
+# shared/store.py
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+from shared import persistence
+from shared.csv_logger import CSV_HEADER, write_session_csv
+
+# Optional single-file backend: pairs, sessions, progress and trio rows in one
+# SQLite database. Off by default (state JSON + per-session CSVs); enable()
+# routes persistence through it, and the CSV layout is still exported at
+# session end so downstream analysis keeps working.
+SQLITE_STORE = False
+DB_NAME = "kmjbt.sqlite3"
+
+_TRIO_COLS = ["uid"] + CSV_HEADER
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS pairs (
+        uid TEXT PRIMARY KEY, leader TEXT, follower TEXT, stimuli TEXT,
+        sessions_total INTEGER, left_name TEXT, right_name TEXT, created_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS progress (
+        uid TEXT PRIMARY KEY REFERENCES pairs(uid), status TEXT,
+        session_index INTEGER, completed_trios INTEGER,
+        state_json TEXT NOT NULL, updated_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS sessions (
+        uid TEXT REFERENCES pairs(uid), session_index INTEGER,
+        started_at TEXT, completed_at TEXT,
+        PRIMARY KEY (uid, session_index))""",
+    "CREATE TABLE IF NOT EXISTS trios (%s, PRIMARY KEY (uid, session, trial))"
+        % ", ".join(f'"{c}"' for c in _TRIO_COLS),
+    "CREATE INDEX IF NOT EXISTS trios_by_pair ON trios (leader, follower, session)",
+]
+
+# fixed statement text, so sqlite3's statement cache keeps them prepared
+_SQL_PAIR = """INSERT INTO pairs
+    (uid, leader, follower, stimuli, sessions_total, left_name, right_name, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (uid) DO UPDATE SET leader = excluded.leader, follower = excluded.follower,
+        stimuli = excluded.stimuli, sessions_total = excluded.sessions_total,
+        left_name = excluded.left_name, right_name = excluded.right_name"""
+_SQL_PROGRESS = """INSERT OR REPLACE INTO progress
+    (uid, status, session_index, completed_trios, state_json, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+_SQL_SESSION_START = """INSERT OR IGNORE INTO sessions (uid, session_index, started_at)
+    VALUES (?, ?, ?)"""
+_SQL_SESSION_DONE = """UPDATE sessions SET completed_at = ?
+    WHERE uid = ? AND session_index = ?"""
+_SQL_TRIO = "INSERT OR REPLACE INTO trios (%s) VALUES (%s)" % (
+    ", ".join(f'"{c}"' for c in _TRIO_COLS), ", ".join("?" * len(_TRIO_COLS)))
+_SQL_TRIO_COUNT = "SELECT COUNT(*) FROM trios WHERE uid = ? AND session = ?"
+_SQL_TRIO_ROWS = 'SELECT %s FROM trios WHERE uid = ? AND session = ? ORDER BY trial' % (
+    ", ".join(f'"{c}"' for c in CSV_HEADER))
+
+
+def _now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class ExperimentStore:
+    """
+    SQLite (WAL) experiment store.
+
+    record_trio() inserts the trio row and the advanced progress in ONE
+    transaction, so progress and trial data can never disagree and the
+    CSV-vs-JSON reconciliation at launch is not needed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            for sql in _SCHEMA:
+                self.conn.execute(sql)
+
+    # --------------- progress ---------------
+    def _put_state(self, state):
+        cfg = state["config"]
+        prog = state["progress"]
+        self.conn.execute(_SQL_PAIR, (
+            state["uid"], cfg["leader"], cfg["follower"], cfg.get("stimuli", ""),
+            int(cfg.get("sessions_total", 0)), cfg.get("left_name", ""), cfg.get("right_name", ""),
+            state.get("created_at", ""),
+        ))
+        self.conn.execute(_SQL_PROGRESS, (
+            state["uid"], state.get("status", "incomplete"),
+            int(prog.get("session_index", 1)), int(prog.get("completed_trios", 0)),
+            json.dumps(state, separators=(",", ":")), _now_iso(),
+        ))
+
+    def save_state(self, state):
+        with self.conn:
+            self._put_state(state)
+
+    def load_state(self, uid):
+        row = self.conn.execute("SELECT state_json FROM progress WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_state(self, uid):
+        with self.conn:
+            self.conn.execute("DELETE FROM progress WHERE uid = ?", (uid,))
+
+    def summaries(self):
+        """Catalog-shaped summaries (see persistence._summarize) for every pair with progress."""
+        out = {}
+        rows = self.conn.execute(
+            """SELECT p.uid, p.leader, p.follower, p.stimuli, p.sessions_total, p.left_name,
+                      p.right_name, g.status, g.session_index, g.completed_trios,
+                      json_extract(g.state_json, '$.stats.summary')
+               FROM pairs p JOIN progress g ON g.uid = p.uid""")
+        for uid, leader, follower, stim, total, lname, rname, status, sess, done, stats in rows:
+            out[uid] = {
+                "uid": uid, "file": None, "status": status,
+                "config": {"leader": leader, "follower": follower, "stimuli": stim,
+                           "sessions_total": total, "left_name": lname, "right_name": rname},
+                "progress": {"session_index": sess, "completed_trios": done},
+                "stats": json.loads(stats) if stats else None,
+            }
+        return out
+
+    # --------------- trios ---------------
+    def record_trio(self, state, row):
+        """
+        Insert `row` (csv_logger.build_trio_row, built BEFORE progress advanced)
+        and save the already-advanced `state`, in a single commit.
+        """
+        session = row[CSV_HEADER.index("session")]
+        trial = row[CSV_HEADER.index("trial")]
+        with self.conn:
+            self._put_state(state)
+            self.conn.execute(_SQL_SESSION_START, (state["uid"], session, _now_iso()))
+            self.conn.execute(_SQL_TRIO, [state["uid"]] + list(row))
+            if int(trial) >= 28:
+                self.conn.execute(_SQL_SESSION_DONE, (_now_iso(), state["uid"], session))
+
+    def completed_trios(self, uid, session_index):
+        return self.conn.execute(_SQL_TRIO_COUNT, (uid, int(session_index))).fetchone()[0]
+
+    def session_rows(self, uid, session_index):
+        return self.conn.execute(_SQL_TRIO_ROWS, (uid, int(session_index))).fetchall()
+
+    def export_csv(self, state, session_index=None):
+        """Write the classic KM-JBT_<pair>_S<n>.csv for one session from the database."""
+        sess = int(session_index or state["progress"]["session_index"])
+        view = {"config": state["config"], "progress": {"session_index": sess}}
+        return write_session_csv(view, self.session_rows(state["uid"], sess))
+
+    def close(self):
+        self.conn.close()
+
+
+# ---------- shared instance ----------
+def enable(path=None):
+    """Open the store (default: <STATE_DIR>/kmjbt.sqlite3) and route persistence through it."""
+    if persistence.STORE is None:
+        persistence.STORE = ExperimentStore(path or os.path.join(persistence.STATE_DIR, DB_NAME))
+    return persistence.STORE
+
+def get_store():
+    """The active store, or None when running on JSON + CSV files."""
+    return persistence.STORE
+
+def disable():
+    if persistence.STORE is not None:
+        persistence.STORE.close()
+        persistence.STORE = None
@@ -0,0 +1,167 @@
+# shared/summaries.py
+import os
+import csv
+import glob
+import json
+import threading
+
+# Per-session summaries of every KM-JBT_<pair>_S<n>.csv for the launcher
+# dashboard, persisted in one cache file next to the CSVs and keyed by CSV
+# name + size + mtime, so a refresh is one stat pass and only new or changed
+# CSVs are parsed again. Refreshes run on a worker thread; the UI only reads
+# the finished result (swapped in whole) and per-pair revision counters.
+SUMMARY_NAME    = ".kmjbt_summaries.json"
+SUMMARY_VERSION = 1
+REFRESH_SEC     = 2.0    # dashboard re-stats the CSVs this often while it is open
+SIDES           = ("leader", "follower")
+
+
+def _num(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(num, den):
+    return round(num / den, 3) if den else None
+
+
+def _median(values):
+    if not values:
+        return None
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def summarize_csv(path):
+    """
+    One session CSV -> {"pair", "session", "trios", "coop", "hit"/"fa"/"disc": {side: rate},
+    "p99_ms" (median trio p99), "p99_max_ms", "dropped"}.
+    disc = S+ go rate - S- go rate (1 = perfect discrimination, 0 = none).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if r.get("trial")]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pair, sess = stem[len("KM-JBT_"):].rsplit("_S", 1)
+    kk = sum(1 for r in rows if r.get("km_leader_choice") == "K" and r.get("km_follower_choice") == "K")
+    out = {"pair": pair, "session": int(sess), "trios": len(rows), "coop": _rate(kk, len(rows)),
+           "hit": {}, "fa": {}, "disc": {}}
+    for side in SIDES:
+        shown = {"S+": 0, "S-": 0}
+        went = {"S+": 0, "S-": 0}
+        for r in rows:
+            label = r.get(f"jbt_{side}_stimuli")
+            if label in shown:
+                shown[label] += 1
+                went[label] += r.get(f"jbt_{side}_choice") == "1"
+        hit, fa = _rate(went["S+"], shown["S+"]), _rate(went["S-"], shown["S-"])
+        out["hit"][side], out["fa"][side] = hit, fa
+        out["disc"][side] = round(hit - fa, 3) if hit is not None and fa is not None else None
+    p99 = [v for v in (_num(r.get("frame_p99_ms")) for r in rows) if v is not None]
+    dropped = [v for v in (_num(r.get("dropped_frames")) for r in rows) if v is not None]
+    out["p99_ms"] = _median(p99)
+    out["p99_max_ms"] = max(p99) if p99 else None
+    out["dropped"] = int(sum(dropped)) if dropped else None
+    return out
+
+
+class SummaryCache:
+    """
+    sessions: CSV file name -> summary (+ "sig"), as of the last finished refresh
+    rev[pair]: bumped whenever one of the pair's sessions changed (chart caches key on it;
+               a pair that is not in it yet counts as 0)
+    """
+    def __init__(self, csv_dir):
+        self.csv_dir = csv_dir
+        self.path = os.path.join(csv_dir, SUMMARY_NAME)
+        self.sessions = {}
+        self.rev = {}
+        self.loaded = False
+        self._thread = None
+
+    # --------------- worker side ---------------
+    def _read_file(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == SUMMARY_VERSION:
+                return data.get("sessions", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def _write_file(self, sessions):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": SUMMARY_VERSION, "sessions": sessions}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[SUMMARY] cache write failed: {e}")
+
+    def refresh(self):
+        """Stat every session CSV, reparse new/changed ones, drop vanished ones. Returns pairs changed."""
+        old = self.sessions if self.loaded else self._read_file()
+        sessions = {}
+        changed = set()
+        for path in glob.glob(os.path.join(glob.escape(self.csv_dir), "KM-JBT_*_S*.csv")):
+            fn = os.path.basename(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            sig = [st.st_size, st.st_mtime_ns]
+            summ = old.get(fn)
+            if summ is None or summ.get("sig") != sig:
+                try:
+                    summ = dict(summarize_csv(path), sig=sig)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[SUMMARY] {fn}: {e}")
+                    continue
+                changed.add(summ["pair"])
+            sessions[fn] = summ
+        changed.update(s["pair"] for fn, s in old.items() if fn not in sessions)
+        if changed:
+            self._write_file(sessions)
+        # one reference swap (the UI never sees a half-built dict), then the revisions
+        self.sessions = sessions
+        # first load: charts drawn before any data was in must be redrawn too
+        bump = changed if self.loaded else changed | {s["pair"] for s in sessions.values()}
+        for pair in bump:
+            self.rev[pair] = self.rev.get(pair, 0) + 1
+        self.loaded = True
+        return changed
+
+    def start_refresh(self):
+        """Refresh on a worker thread (no-op while one is still running)."""
+        if self.busy():
+            return False
+        self._thread = threading.Thread(target=self._run, name="summaries", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[SUMMARY] refresh failed: {e}")
+
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # --------------- UI side ---------------
+    def pair_sessions(self, pair):
+        """The pair's session summaries, ordered by session."""
+        return sorted((s for s in self.sessions.values() if s["pair"] == pair), key=lambda s: s["session"])
+
+
+# ---------- shared instance ----------
+_CACHE = None
+
+def get_cache(csv_dir):
+    global _CACHE
+    if _CACHE is None or _CACHE.csv_dir != csv_dir:
+        _CACHE = SummaryCache(csv_dir)
+    return _CACHE
@@ -0,0 +1,74 @@
+# shared/text_cache.py
+from collections import OrderedDict
+
+# Rendered text surfaces keyed by (font, text, colour, max_width), so UI code
+# that redraws the same labels every frame pays for font.render (and, for
+# elided labels, the font.size search) once instead of per frame. Entries are
+# evicted least-recently-used beyond TEXT_CACHE_SIZE; fonts are part of the
+# key, so fonts rebuilt after a resize simply miss and push the old ones out.
+TEXT_CACHE_SIZE = 512
+ELLIPSIS = "…"
+
+
+def elide(text, font, max_width):
+    """`text` cut to fit `max_width` px in `font`, ending in an ellipsis if it had to be cut."""
+    if font.size(text)[0] <= max_width:
+        return text
+    if max_width <= font.size(ELLIPSIS)[0]:
+        return ELLIPSIS
+    left, right = 0, len(text)
+    while left < right:
+        mid = (left + right) // 2
+        if font.size(text[:mid] + ELLIPSIS)[0] <= max_width:
+            left = mid + 1
+        else:
+            right = mid
+    return text[:max(0, right - 1)] + ELLIPSIS
+
+
+class TextCache:
+    """
+    LRU of antialiased font.render() surfaces. Surfaces are shared between
+    callers: blit them, never draw into them.
+    """
+    def __init__(self, max_items=TEXT_CACHE_SIZE):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, max_width=None):
+        key = (font, text, tuple(color), max_width)
+        surf = self._items.get(key)
+        if surf is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        shown = text if max_width is None else elide(text, font, max_width)
+        surf = font.render(shown, True, color)
+        self._items[key] = surf
+        if len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+# ---------- shared instance ----------
+_CACHE = None
+
+def get_text_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = TextCache()
+    return _CACHE
+
+
+def render(font, text, color, max_width=None):
+    """get_text_cache().render(...) -- drop-in for font.render(text, True, color)."""
+    return get_text_cache().render(font, text, color, max_width)
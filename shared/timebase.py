@@ -0,0 +1,27 @@
+# shared/timebase.py
+import time
+
+# Single monotonic clock for everything that timestamps trial data
+# (phase deadlines, input samples, frame timing, pellet times).
+# The headless runner swaps in a virtual clock via set_source().
+_source = time.perf_counter
+
+
+def now():
+    """Seconds on the experiment clock (monotonic)."""
+    return _source()
+
+
+def now_ns():
+    """Integer nanoseconds on the experiment clock."""
+    if _source is time.perf_counter:
+        return time.perf_counter_ns()
+    return int(_source() * 1e9)
+
+
+def set_source(fn=None):
+    """Install `fn` (returns seconds) as the clock; None restores perf_counter. Returns the old source."""
+    global _source
+    old = _source
+    _source = fn or time.perf_counter
+    return old
@@ -0,0 +1,166 @@
+# shared/trajectory.py
+import os
+import sys
+import json
+import struct
+from array import array
+
+from shared.csv_logger import _csv_path_for_state
+
+# Opt-in cursor trajectory recorder.
+#
+# Cursors hand every integrated position to the recorder from the input
+# sampler thread (Cursor.trace), so the render loop does no extra work. Samples
+# go into preallocated arrays (no allocation per sample) and are written as ONE
+# binary file per trio next to the session CSV:
+#
+#   KM-JBT_<pair>_S<n>_traj/T<trial>.traj
+#       header  "<4sHI"  magic b"KMTR", version, n
+#       t_ns    int64[n]     timebase.now_ns of the sample
+#       x, y    float32[n]   cursor centre (px)
+#       phase   uint8[n]     code into the index line's "phases" list
+#       side    uint8[n]     0 = left half cursor, 1 = right half cursor
+#   KM-JBT_<pair>_S<n>_traj/index.jsonl
+#       one line per trio: {"session", "trial", "file", "samples", "dropped", "phases"}
+#       (session, trial) is the CSV row's key; a re-run trio appends a newer line.
+#
+# Only movement is stored (plus the position after every reset), so still
+# periods cost nothing; all arrays are little-endian.
+TRAJECTORY_RECORDING = False
+TRAJ_CAPACITY = 1 << 17   # samples per trio (~2 min of continuous 1 kHz motion on both cursors)
+
+MAGIC = b"KMTR"
+VERSION = 1
+_HEADER = struct.Struct("<4sHI")
+_SIDES = {"left": 0, "right": 1}
+
+
+class TrajectoryRecorder:
+    def __init__(self, capacity=TRAJ_CAPACITY):
+        self.capacity = int(capacity)
+        self.t_ns  = array("q", bytes(8 * self.capacity))
+        self.x     = array("f", bytes(4 * self.capacity))
+        self.y     = array("f", bytes(4 * self.capacity))
+        self.phase = array("B", bytes(self.capacity))
+        self.side  = array("B", bytes(self.capacity))
+        self.n = 0
+        self.dropped = 0
+        self.phases = []      # code -> "scene:phase"
+        self._codes = {}      # scene tag -> {phase name -> code}
+
+    def reset(self):
+        """Start a new trio (phase codes are kept, they are written per trio)."""
+        self.n = 0
+        self.dropped = 0
+
+    # --------------- recording ---------------
+    def _code(self, tag, name):
+        label = f"{tag}:{name}"
+        if label not in self.phases:
+            if len(self.phases) >= 255:
+                return 255
+            self.phases.append(label)
+        code = self.phases.index(label)
+        self._codes.setdefault(tag, {})[name] = code
+        return code
+
+    def attach(self, sampler, phase, tag):
+        """Record every cursor of `sampler`, labelled with `phase.name` (a PhaseMachine) under `tag`."""
+        codes = self._codes.setdefault(tag, {})
+        for cursor in sampler.cursors:
+            side = _SIDES.get(cursor.side, 0)
+
+            def record(t_ns, x, y, side=side):
+                i = self.n
+                if i >= self.capacity:
+                    self.dropped += 1
+                    return
+                code = codes.get(phase.name)
+                if code is None:
+                    code = self._code(tag, phase.name)
+                self.t_ns[i] = t_ns
+                self.x[i] = x
+                self.y[i] = y
+                self.phase[i] = code
+                self.side[i] = side
+                self.n = i + 1
+
+            cursor.trace = record
+
+    # --------------- output ---------------
+    def _payload(self):
+        n = self.n
+        parts = [self.t_ns[:n], self.x[:n], self.y[:n], self.phase[:n], self.side[:n]]
+        if sys.byteorder != "little":
+            for a in parts:
+                a.byteswap()
+        return [_HEADER.pack(MAGIC, VERSION, n)] + [a.tobytes() for a in parts]
+
+    def flush(self, state):
+        """Write the current trio next to the session CSV (call before progress advances). Returns the path."""
+        prog = state["progress"]
+        session = int(prog.get("session_index", 1))
+        trial = int(prog.get("completed_trios", 0)) + 1   # same numbering as the CSV row
+        out_dir = trajectory_dir(state)
+        os.makedirs(out_dir, exist_ok=True)
+        name = f"T{trial:02d}.traj"
+        path = os.path.join(out_dir, name)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            for chunk in self._payload():
+                f.write(chunk)
+        os.replace(tmp, path)
+        line = {"session": session, "trial": trial, "file": name, "samples": self.n,
+                "dropped": self.dropped, "phases": list(self.phases)}
+        with open(os.path.join(out_dir, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+        if self.dropped:
+            print(f"[TRAJ] trial {trial}: buffer full, {self.dropped} samples dropped")
+        return path
+
+
+def trajectory_dir(state):
+    return os.path.splitext(_csv_path_for_state(state))[0] + "_traj"
+
+
+def read_trajectory(path):
+    """Load one .traj file -> dict of arrays (t_ns, x, y, phase, side)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, n = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a v{VERSION} trajectory file")
+    out, off = {}, _HEADER.size
+    for key, code in (("t_ns", "q"), ("x", "f"), ("y", "f"), ("phase", "B"), ("side", "B")):
+        a = array(code)
+        size = a.itemsize * n
+        a.frombytes(data[off:off + size])
+        if sys.byteorder != "little":
+            a.byteswap()
+        out[key] = a
+        off += size
+    return out
+
+
+# ---------- shared instance ----------
+_RECORDER = None
+
+def begin_trio():
+    """The shared recorder, reset for a new trio, or None when recording is off."""
+    global _RECORDER
+    if not TRAJECTORY_RECORDING:
+        return None
+    if _RECORDER is None:
+        _RECORDER = TrajectoryRecorder()
+    _RECORDER.reset()
+    return _RECORDER
+
+
+def flush_trio(state):
+    """Write the finished trio's samples (no-op when recording is off)."""
+    if TRAJECTORY_RECORDING and _RECORDER is not None:
+        try:
+            return _RECORDER.flush(state)
+        except OSError as e:
+            print("[TRAJ] write error:", e)
+    return None
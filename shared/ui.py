@@ -2,6 +2,8 @@
 import pygame
 from pygame.locals import *
 
+from shared import text_cache
+
 def s(H, x): return int((x / 800) * H)
 
 class Button:
@@ -12,7 +14,7 @@ class Button:
     def draw(self, surface):
         pygame.draw.rect(surface, self.BTN_BG_HOVER if self.hover else self.BTN_BG, self.rect, border_radius=self.s(10))
         pygame.draw.rect(surface, self.BTN_BORDER, self.rect, self.s(2), border_radius=self.s(10))
-        txt = self.FONT.render(self.label, True, self.FG)
+        txt = text_cache.render(self.FONT, self.label, self.FG)
         surface.blit(txt, txt.get_rect(center=self.rect.center))
     def handle(self, event):
         if event.type == MOUSEMOTION: self.hover = self.rect.collidepoint(event.pos)
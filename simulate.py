@@ -0,0 +1,103 @@
+# simulate.py
+"""
+Headless KM + JBT run for regression-testing the session flow offline.
+
+Pushes a full sessions_total x 28-trio run through the real scenes and the
+same bookkeeping main.py uses (append_trio_row, _advance_progress_after_trio,
+save_state, session roll-over) with scripted agents on both sides, a virtual
+clock and no pellet hardware. State JSON and CSVs go to --out (a temp folder
+by default), never to the live state/ folder.
+
+    python simulate.py --sessions 6 --seed 1
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from shared import headless
+
+
+def simulate(out_dir, sessions=6, seed=0, size=(800, 600), step_ms=1000.0 / 60,
+             p_k=0.5, p_go=0.7, leader="SimL", follower="SimR", stimuli="Dark S+", sqlite=False,
+             trajectories=False, record=None, parquet=False):
+    """Run one simulated pair to completion. Returns the number of trios recorded."""
+    screen, clock, dispenser = headless.setup(size=size, seed=seed, step_sec=step_ms / 1000.0,
+                                              p_k=p_k, p_go=p_go)
+
+    # scenes + bookkeeping are imported after setup so they see the dummy display
+    from shared import persistence, csv_logger, store, trajectory, replay
+    import main
+    from analysis import columnar
+
+    persistence.STATE_DIR = os.path.join(out_dir, "state")
+    persistence.ARCHIVE_DIR = os.path.join(persistence.STATE_DIR, "archive")
+    os.makedirs(persistence.ARCHIVE_DIR, exist_ok=True)
+    csv_logger.CSV_DIR = out_dir
+    if sqlite:
+        store.enable(os.path.join(out_dir, store.DB_NAME))
+    trajectory.TRAJECTORY_RECORDING = trajectories
+    if parquet:
+        columnar.PARQUET_EXPORT = True
+        columnar.PARQUET_DIR = os.path.join(out_dir, "trios_parquet")
+
+    config = {"leader": leader, "follower": follower, "stimuli": stimuli,
+              "sessions_total": sessions, "left_name": leader, "right_name": follower}
+    uid = persistence.make_uid(leader, follower, stimuli, sessions)
+    state, _ = persistence.new_or_resume_state(uid, config)
+
+    trios = 0
+    t0 = time.perf_counter()
+    if main.reconcile_progress(state):
+        if record:
+            replay.INPUT_RECORDING = True
+            replay.start_recording(state, size, threaded=False)
+        while True:
+            trio = main.run_trio(screen, clock, state)
+            if trio is None:
+                print(f"[SIM] trio aborted at session {state['progress']['session_index']}, "
+                      f"trio {int(state['progress']['completed_trios']) + 1}")
+                break
+            trios += 1
+            if not main.record_trio(state, trio):
+                break
+            clock.tick(60)
+    if record:
+        replay.stop_recording(record)
+    csv_logger.close_trial_writer()
+    store.disable()
+
+    wall = time.perf_counter() - t0
+    print(f"[SIM] {trios} trios, {clock.frames} frames, "
+          f"{clock.now() / 3600:.2f} h simulated in {wall:.1f} s wall; "
+          f"pellets L/R = {dispenser.delivered[0]}/{dispenser.delivered[1]}; out: {out_dir}")
+    return trios
+
+
+def _parse_args(argv):
+    ap = argparse.ArgumentParser(description="Headless KM + JBT simulation")
+    ap.add_argument("--sessions", type=int, default=6, help="sessions_total for the simulated pair")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="output folder for state JSON + CSV (default: temp dir)")
+    ap.add_argument("--size", default="800x600", help="virtual screen WxH")
+    ap.add_argument("--step-ms", type=float, default=1000.0 / 60,
+                    help="virtual time per frame (larger = fewer frames, coarser cursor steps)")
+    ap.add_argument("--p-k", type=float, default=0.5, help="probability an agent picks K")
+    ap.add_argument("--p-go", type=float, default=0.7, help="probability an agent touches a JBT stimulus")
+    ap.add_argument("--sqlite", action="store_true", help="use the SQLite experiment store")
+    ap.add_argument("--trajectories", action="store_true", help="record cursor trajectories per trio")
+    ap.add_argument("--parquet", action="store_true", help="keep a Parquet copy of the trios per session")
+    ap.add_argument("--record", default=None, metavar="PATH", help="write an input recording for replay.py")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args(sys.argv[1:])
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    out = args.out or tempfile.mkdtemp(prefix="kmjbt_sim_")
+    done = simulate(out, sessions=args.sessions, seed=args.seed, size=(w, h),
+                    step_ms=args.step_ms, p_k=args.p_k, p_go=args.p_go, sqlite=args.sqlite,
+                    trajectories=args.trajectories, record=args.record,
+                    parquet=args.parquet)
+    sys.exit(0 if done == args.sessions * 28 else 1)